@@ -3,42 +3,132 @@ Example analysis script for Strava running data.
 This script demonstrates how to analyze the data retrieved from Strava.
 """
 
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 import seaborn as sns
 from datetime import datetime, timedelta
 import numpy as np
 
 
-def load_strava_data(csv_file: str) -> pd.DataFrame:
-    """Load Strava data from CSV file."""
-    df = pd.read_csv(csv_file)
-    df['start_date'] = pd.to_datetime(df['start_date'])
-    df['date'] = pd.to_datetime(df['date'])
-    return df
+# Columns read by the analysis functions below. The exported CSV carries many
+# more (names, descriptions, flags, ...), which are skipped at parse time.
+ANALYSIS_COLUMNS = [
+    'start_date', 'date', 'distance', 'moving_time', 'average_speed',
+    'total_elevation_gain', 'average_heartrate', 'max_heartrate'
+]
 
+# Explicit dtypes for the numeric columns, so the parser does not have to infer
+# them and integer-looking columns (e.g. moving_time) come back as float64.
+ANALYSIS_DTYPES = {
+    'distance': 'float64',
+    'moving_time': 'float64',
+    'average_speed': 'float64',
+    'total_elevation_gain': 'float64',
+    'average_heartrate': 'float64',
+    'max_heartrate': 'float64'
+}
 
-def analyze_running_trends(df: pd.DataFrame):
-    """Analyze running trends over time."""
-    print("=== RUNNING TRENDS ANALYSIS ===\n")
+# Version of the prepared frame layout, part of the cache file name (<csv_file>.v<N>.pkl).
+# Bump it whenever the columns, dtypes or derived columns built by _read_strava_csv change,
+# so caches written by an older loader are not reused.
+ANALYSIS_CACHE_VERSION = 2
+
+
+def load_strava_data(csv_file: str, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load Strava data from CSV file.
+
+    The prepared frame is cached next to the CSV (<csv_file>.v<ANALYSIS_CACHE_VERSION>.pkl)
+    and reused while the cache is at least as new as the CSV, so repeat runs skip the CSV parse.
+    """
+    cache_file = f"{csv_file}.v{ANALYSIS_CACHE_VERSION}.pkl"
+    if use_cache and os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(csv_file):
+        try:
+            return pd.read_pickle(cache_file)
+        except Exception as e:
+            print(f"Could not read cached data from {cache_file}: {e}")
     
-    # Monthly summary
-    df['year_month'] = df['start_date'].dt.to_period('M')
-    monthly_stats = df.groupby('year_month').agg({
+    df = _read_strava_csv(csv_file)
+    if use_cache:
+        try:
+            df.to_pickle(cache_file)
+        except OSError as e:
+            print(f"Could not write cached data to {cache_file}: {e}")
+    return df
+
+
+def _read_strava_csv(csv_file: str) -> pd.DataFrame:
+    """Parse the CSV with fixed column dtypes and parsed dates, then add derived columns."""
+    df = pd.read_csv(
+        csv_file,
+        usecols=lambda column: column in ANALYSIS_COLUMNS,
+        dtype=ANALYSIS_DTYPES,
+        parse_dates=['start_date', 'date'],
+        date_format='ISO8601'
+    )
+    df = add_pace_columns(df)
+    return add_date_columns(df)
+
+
+def add_pace_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the derived pace columns shared by the analysis functions.
+
+    - pace: moving pace in min/km (NaN where it is undefined)
+    - valid: True for activities with positive distance and moving time
+    """
+    moving_time = df['moving_time'].to_numpy(dtype=np.float64)
+    distance = df['distance'].to_numpy(dtype=np.float64)
+    # Divide only where distance > 0; every other row keeps the NaN fill, so no inf is produced
+    df['pace'] = np.divide(moving_time, distance * 60.0,
+                           out=np.full(distance.size, np.nan), where=distance > 0)
+    df['valid'] = (distance > 0) & (moving_time > 0)
+    return df
+
+
+def add_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the calendar columns derived from start_date.
+
+    - year_month: monthly period (Strava timestamps are UTC; the period uses UTC dates)
+    - weekday: day of week as a nullable integer (Monday = 0, <NA> where start_date is missing)
+    - day_of_week: day name as a categorical
+    """
+    start_date = df['start_date']
+    if start_date.dt.tz is not None:
+        start_date = start_date.dt.tz_localize(None)
+    df['year_month'] = start_date.dt.to_period('M')
+    df['weekday'] = start_date.dt.dayofweek.astype('Int8')
+    df['day_of_week'] = start_date.dt.day_name().astype('category')
+    return df
+
+
+def compute_monthly_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate activities per month (shared by the trends and records analyses)."""
+    return df.groupby('year_month').agg({
         'distance': ['count', 'sum', 'mean'],
         'moving_time': 'sum',
         'average_speed': 'mean',
         'total_elevation_gain': 'sum'
-    }).round(2)
+    })
+
+
+def analyze_running_trends(df: pd.DataFrame, monthly_stats: pd.DataFrame = None):
+    """Analyze running trends over time."""
+    print("=== RUNNING TRENDS ANALYSIS ===\n")
+    
+    # Monthly summary
+    if monthly_stats is None:
+        monthly_stats = compute_monthly_stats(df)
     
     print("Monthly Running Statistics:")
-    print(monthly_stats)
+    print(monthly_stats.round(2))
     print()
     
     # Weekly patterns
-    df['day_of_week'] = df['start_date'].dt.day_name()
-    df['weekday'] = df['start_date'].dt.dayofweek
-    weekly_patterns = df.groupby('day_of_week').agg({
+    weekly_patterns = df.groupby('day_of_week', observed=True).agg({
         'distance': ['count', 'mean'],
         'average_speed': 'mean'
     }).round(2)
@@ -47,19 +137,40 @@ def analyze_running_trends(df: pd.DataFrame):
     print(weekly_patterns)
     print()
     
-    # Distance distribution
+    # Distance distribution (bucket every run in one pass, then count per bucket)
+    bucket_edges = [5, 15, 30]
+    distances = df['distance'].dropna().to_numpy()
+    bucket_counts = np.bincount(np.searchsorted(bucket_edges, distances, side='right'),
+                                minlength=len(bucket_edges) + 1)
     print("Distance Distribution:")
-    print(f"Short runs (< 5km): {len(df[df['distance'] < 5])} activities")
-    print(f"Medium runs (5-15km): {len(df[(df['distance'] >= 5) & (df['distance'] < 15)])} activities")
-    print(f"Long runs (15-30km): {len(df[(df['distance'] >= 15) & (df['distance'] < 30)])} activities")
-    print(f"Very long runs (30km+): {len(df[df['distance'] >= 30])} activities")
+    print(f"Short runs (< 5km): {bucket_counts[0]} activities")
+    print(f"Medium runs (5-15km): {bucket_counts[1]} activities")
+    print(f"Long runs (15-30km): {bucket_counts[2]} activities")
+    print(f"Very long runs (30km+): {bucket_counts[3]} activities")
     print()
 
 
+# Above this many points the scatter panels are drawn as hexbin density plots,
+# which render as one aggregated image instead of a marker per activity.
+DENSE_PLOT_THRESHOLD = 5000
+
+
+def _plot_points(ax, x, y, dates: bool = False):
+    """Scatter x against y, switching to a hexbin density plot for large inputs."""
+    if len(x) <= DENSE_PLOT_THRESHOLD:
+        ax.scatter(x, y, alpha=0.6, s=20, rasterized=True)
+        return
+    if dates:
+        ax.hexbin(mdates.date2num(x), y, gridsize=50, mincnt=1, cmap='Blues')
+        ax.xaxis_date()
+    else:
+        ax.hexbin(x, y, gridsize=50, mincnt=1, cmap='Blues')
+
+
 def create_visualizations(df: pd.DataFrame):
     """Create visualizations of running data."""
-    # Filter out invalid data (distance > 0, moving_time > 0)
-    valid_df = df[(df['distance'] > 0) & (df['moving_time'] > 0)].copy()
+    # Filter out invalid data (distance > 0, moving_time > 0), keeping only the plotted columns
+    valid_df = df.loc[df['valid'], ['start_date', 'distance', 'pace', 'weekday']]
     
     if len(valid_df) == 0:
         print("No valid data for visualization (all activities have zero distance or time).")
@@ -69,17 +180,16 @@ def create_visualizations(df: pd.DataFrame):
     fig, axes = plt.subplots(2, 2, figsize=(15, 12))
     fig.suptitle('Strava Running Data Analysis', fontsize=16, fontweight='bold')
     
-    # 1. Distance over time
-    axes[0, 0].scatter(valid_df['start_date'], valid_df['distance'], alpha=0.6, s=20)
+    # 1. Distance over time (activities without a start date cannot be placed on the axis)
+    dated = valid_df['start_date'].notna()
+    _plot_points(axes[0, 0], valid_df.loc[dated, 'start_date'], valid_df.loc[dated, 'distance'], dates=True)
     axes[0, 0].set_title('Distance Over Time')
     axes[0, 0].set_xlabel('Date')
     axes[0, 0].set_ylabel('Distance (km)')
     axes[0, 0].tick_params(axis='x', rotation=45)
     
     # 2. Pace distribution
-    pace_min_per_km = (valid_df['moving_time'] / 60) / valid_df['distance']
-    # Remove any inf or NaN values
-    pace_min_per_km = pace_min_per_km.replace([np.inf, -np.inf], np.nan).dropna()
+    pace_min_per_km = valid_df['pace']
     
     if len(pace_min_per_km) > 0:
         axes[0, 1].hist(pace_min_per_km, bins=30, alpha=0.7, edgecolor='black')
@@ -97,9 +207,7 @@ def create_visualizations(df: pd.DataFrame):
     
     # 3. Distance vs Pace
     if len(pace_min_per_km) > 0:
-        valid_indices = pace_min_per_km.index
-        axes[1, 0].scatter(valid_df.loc[valid_indices, 'distance'], pace_min_per_km, 
-                          alpha=0.6, s=20)
+        _plot_points(axes[1, 0], valid_df['distance'], pace_min_per_km)
         axes[1, 0].set_title('Distance vs Pace')
         axes[1, 0].set_xlabel('Distance (km)')
         axes[1, 0].set_ylabel('Pace (min/km)')
@@ -109,11 +217,9 @@ def create_visualizations(df: pd.DataFrame):
         axes[1, 0].set_title('Distance vs Pace')
     
     # 4. Weekly running pattern
-    valid_df['day_of_week'] = valid_df['start_date'].dt.day_name()
     day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    weekly_counts = valid_df['day_of_week'].value_counts().reindex(day_order)
-    weekly_counts = weekly_counts.fillna(0)  # Fill missing days with 0
-    axes[1, 1].bar(range(len(weekly_counts)), weekly_counts.values)
+    weekly_counts = np.bincount(valid_df['weekday'].dropna().to_numpy(dtype=np.int64), minlength=7)  # Monday = 0, missing days count 0
+    axes[1, 1].bar(range(len(weekly_counts)), weekly_counts)
     axes[1, 1].set_title('Running Frequency by Day of Week')
     axes[1, 1].set_xlabel('Day of Week')
     axes[1, 1].set_ylabel('Number of Runs')
@@ -128,39 +234,40 @@ def create_visualizations(df: pd.DataFrame):
     plt.show()
 
 
-def find_personal_records(df: pd.DataFrame):
+def find_personal_records(df: pd.DataFrame, monthly_stats: pd.DataFrame = None):
     """Find personal records and notable achievements."""
     print("=== PERSONAL RECORDS & ACHIEVEMENTS ===\n")
     
+    # Locate every record on the raw arrays, then materialize only those rows
+    distance = df['distance'].to_numpy(dtype=np.float64)
+    elevation = df['total_elevation_gain'].to_numpy(dtype=np.float64)
+    valid_pace = np.where(df['valid'].to_numpy(), df['pace'].to_numpy(), np.nan)
+    
     # Longest run
-    longest_run = df.loc[df['distance'].idxmax()]
+    longest_run = df.iloc[np.nanargmax(distance)]
     print(f"Longest Run: {longest_run['distance']:.2f} km on {longest_run['date']}")
     print(f"  Time: {longest_run['moving_time']/60:.1f} minutes")
-    print(f"  Pace: {(longest_run['moving_time']/60)/longest_run['distance']:.2f} min/km")
+    print(f"  Pace: {longest_run['pace']:.2f} min/km")
     print()
     
     # Fastest average pace
-    valid_pace_df = df[(df['distance'] > 0) & (df['moving_time'] > 0)].copy()
-    if len(valid_pace_df) > 0:
-        pace_min_per_km = (valid_pace_df['moving_time'] / 60) / valid_pace_df['distance']
-        pace_min_per_km = pace_min_per_km.replace([np.inf, -np.inf], np.nan).dropna()
-        if len(pace_min_per_km) > 0:
-            fastest_pace_idx = pace_min_per_km.idxmin()
-            fastest_run = valid_pace_df.loc[fastest_pace_idx]
-            print(f"Fastest Pace: {(fastest_run['moving_time']/60)/fastest_run['distance']:.2f} min/km")
-            print(f"  Distance: {fastest_run['distance']:.2f} km on {fastest_run['date']}")
-            print()
+    if not np.isnan(valid_pace).all():
+        fastest_run = df.iloc[np.nanargmin(valid_pace)]
+        print(f"Fastest Pace: {fastest_run['pace']:.2f} min/km")
+        print(f"  Distance: {fastest_run['distance']:.2f} km on {fastest_run['date']}")
+        print()
     
     # Most elevation gain
-    if df['total_elevation_gain'].max() > 0:
-        most_elevation = df.loc[df['total_elevation_gain'].idxmax()]
+    if np.nanmax(elevation, initial=0) > 0:
+        most_elevation = df.iloc[np.nanargmax(elevation)]
         print(f"Most Elevation Gain: {most_elevation['total_elevation_gain']:.0f} m")
         print(f"  Distance: {most_elevation['distance']:.2f} km on {most_elevation['date']}")
         print()
     
     # Monthly totals
-    df['year_month'] = df['start_date'].dt.to_period('M')
-    monthly_distance = df.groupby('year_month')['distance'].sum()
+    if monthly_stats is None:
+        monthly_stats = compute_monthly_stats(df)
+    monthly_distance = monthly_stats[('distance', 'sum')]
     best_month = monthly_distance.idxmax()
     print(f"Best Month: {best_month} with {monthly_distance[best_month]:.2f} km")
     print()
@@ -168,29 +275,31 @@ def find_personal_records(df: pd.DataFrame):
 
 def analyze_heart_rate_data(df: pd.DataFrame):
     """Analyze heart rate data if available."""
-    if 'average_heartrate' in df.columns and df['average_heartrate'].notna().any():
-        print("=== HEART RATE ANALYSIS ===\n")
-        
-        hr_data = df[df['average_heartrate'].notna()]
-        if len(hr_data) > 0:
-            print(f"Activities with heart rate data: {len(hr_data)}")
-            print(f"Average heart rate: {hr_data['average_heartrate'].mean():.1f} bpm")
-            print(f"Maximum heart rate: {hr_data['max_heartrate'].max():.1f} bpm")
-            print(f"Minimum average heart rate: {hr_data['average_heartrate'].min():.1f} bpm")
-            print()
-            
-            # Heart rate vs pace correlation
-            valid_hr_data = hr_data[(hr_data['distance'] > 0) & (hr_data['moving_time'] > 0)].copy()
-            if len(valid_hr_data) > 0:
-                pace_min_per_km = (valid_hr_data['moving_time'] / 60) / valid_hr_data['distance']
-                pace_min_per_km = pace_min_per_km.replace([np.inf, -np.inf], np.nan).dropna()
-                if len(pace_min_per_km) > 0 and len(pace_min_per_km) == len(valid_hr_data.loc[pace_min_per_km.index]):
-                    correlation = np.corrcoef(pace_min_per_km, valid_hr_data.loc[pace_min_per_km.index, 'average_heartrate'])[0, 1]
-                    if np.isfinite(correlation):
-                        print(f"Heart rate vs pace correlation: {correlation:.3f}")
-                        print()
-    else:
+    if 'average_heartrate' not in df.columns:
+        print("No heart rate data available in the dataset.\n")
+        return
+    
+    hr_data = df.dropna(subset=['average_heartrate'])
+    if hr_data.empty:
         print("No heart rate data available in the dataset.\n")
+        return
+    
+    print("=== HEART RATE ANALYSIS ===\n")
+    print(f"Activities with heart rate data: {len(hr_data)}")
+    print(f"Average heart rate: {hr_data['average_heartrate'].mean():.1f} bpm")
+    print(f"Maximum heart rate: {hr_data['max_heartrate'].max():.1f} bpm")
+    print(f"Minimum average heart rate: {hr_data['average_heartrate'].min():.1f} bpm")
+    print()
+    
+    # Heart rate vs pace correlation
+    pace = hr_data['pace'].to_numpy()
+    heart_rate = hr_data['average_heartrate'].to_numpy(dtype=np.float64)
+    mask = hr_data['valid'].to_numpy() & np.isfinite(pace)
+    if mask.sum() > 1:
+        correlation = np.corrcoef(pace[mask], heart_rate[mask])[0, 1]
+        if np.isfinite(correlation):
+            print(f"Heart rate vs pace correlation: {correlation:.3f}")
+            print()
 
 
 def generate_training_insights(df: pd.DataFrame):
@@ -198,49 +307,55 @@ def generate_training_insights(df: pd.DataFrame):
     print("=== TRAINING INSIGHTS ===\n")
     
     # Recent vs older performance
-    valid_df = df[(df['distance'] > 0) & (df['moving_time'] > 0)].copy()
+    valid_df = df.loc[df['valid'], ['start_date', 'pace']]
     if len(valid_df) == 0:
         print("No valid data for pace analysis.\n")
         return
     
-    recent_cutoff = valid_df['start_date'].max() - timedelta(days=30)
-    recent_runs = valid_df[valid_df['start_date'] >= recent_cutoff]
-    older_runs = valid_df[valid_df['start_date'] < recent_cutoff]
+    # Split into older (0) and recent (1) runs and accumulate both pace sums in one pass
+    start_date = valid_df['start_date']
+    recent_cutoff = start_date.max() - timedelta(days=30)
+    is_recent = (start_date >= recent_cutoff).to_numpy()
+    has_date = is_recent | (start_date < recent_cutoff).to_numpy()
+    period = is_recent.astype(np.intp)
+    pace_sums = np.bincount(period, weights=np.where(has_date, valid_df['pace'].to_numpy(), 0.0), minlength=2)
+    run_counts = np.bincount(period, weights=has_date, minlength=2)
     
-    if len(recent_runs) > 0 and len(older_runs) > 0:
-        recent_pace = (recent_runs['moving_time'] / 60) / recent_runs['distance']
-        recent_pace = recent_pace.replace([np.inf, -np.inf], np.nan).dropna()
-        older_pace = (older_runs['moving_time'] / 60) / older_runs['distance']
-        older_pace = older_pace.replace([np.inf, -np.inf], np.nan).dropna()
+    if run_counts[0] > 0 and run_counts[1] > 0:
+        older_avg_pace, recent_avg_pace = pace_sums / run_counts
         
-        if len(recent_pace) > 0 and len(older_pace) > 0:
-            recent_avg_pace = recent_pace.mean()
-            older_avg_pace = older_pace.mean()
-            
-            if np.isfinite(recent_avg_pace) and np.isfinite(older_avg_pace):
-                pace_improvement = older_avg_pace - recent_avg_pace
-                print(f"Recent 30 days average pace: {recent_avg_pace:.2f} min/km")
-                print(f"Previous period average pace: {older_avg_pace:.2f} min/km")
-                if pace_improvement > 0:
-                    print(f"Pace improvement: {pace_improvement:.2f} min/km faster! 🎉")
-                else:
-                    print(f"Pace change: {abs(pace_improvement):.2f} min/km slower")
-                print()
+        if np.isfinite(recent_avg_pace) and np.isfinite(older_avg_pace):
+            pace_improvement = older_avg_pace - recent_avg_pace
+            print(f"Recent 30 days average pace: {recent_avg_pace:.2f} min/km")
+            print(f"Previous period average pace: {older_avg_pace:.2f} min/km")
+            if pace_improvement > 0:
+                print(f"Pace improvement: {pace_improvement:.2f} min/km faster! 🎉")
+            else:
+                print(f"Pace change: {abs(pace_improvement):.2f} min/km slower")
+            print()
     
     # Consistency analysis
-    weekly_runs = df.groupby(df['start_date'].dt.isocalendar().week).size()
-    avg_runs_per_week = weekly_runs.mean()
-    consistency_score = 1 - (weekly_runs.std() / weekly_runs.mean()) if weekly_runs.mean() > 0 else 0
+    # (count runs per ISO week in one pass; weeks without runs are left out)
+    iso_weeks = df['start_date'].dt.isocalendar().week.dropna().to_numpy(dtype=np.int64)
+    weekly_runs = np.bincount(iso_weeks)
+    weekly_runs = weekly_runs[weekly_runs > 0]
+    avg_runs_per_week = weekly_runs.mean() if len(weekly_runs) > 0 else 0
+    if avg_runs_per_week > 0:
+        weekly_std = weekly_runs.std(ddof=1) if len(weekly_runs) > 1 else np.nan
+        consistency_score = 1 - (weekly_std / avg_runs_per_week)
+    else:
+        consistency_score = 0
     
     print(f"Average runs per week: {avg_runs_per_week:.1f}")
     print(f"Consistency score: {consistency_score:.2f} (1.0 = perfectly consistent)")
     print()
     
     # Distance progression
-    df_sorted = df.sort_values('start_date')
-    if len(df_sorted) >= 10:
-        first_10_avg = df_sorted.head(10)['distance'].mean()
-        last_10_avg = df_sorted.tail(10)['distance'].mean()
+    if len(df) >= 10:
+        # Order only the distances by date instead of sorting the whole frame
+        sorted_distance = df['distance'].loc[df['start_date'].sort_values().index]
+        first_10_avg = sorted_distance.head(10).mean()
+        last_10_avg = sorted_distance.tail(10).mean()
         distance_progression = last_10_avg - first_10_avg
         
         print(f"First 10 runs average distance: {first_10_avg:.2f} km")
@@ -257,15 +372,20 @@ def main():
     # You can modify this to point to your specific CSV file
     # Look in parent directory (project root) for CSV files
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    csv_files = [f for f in os.listdir(project_root) if f.startswith('strava_running_data_') and f.endswith('.csv')]
-    csv_files = [os.path.join(project_root, f) for f in csv_files]
+    # Track the most recent export while scanning (names end in a sortable timestamp)
+    latest_name = None
+    with os.scandir(project_root) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith('strava_running_data_') and name.endswith('.csv') and (latest_name is None or name > latest_name):
+                latest_name = name
     
-    if not csv_files:
+    if latest_name is None:
         print("No Strava data CSV files found. Please run strava_data_puller.py first.")
         return
     
     # Use the most recent file
-    latest_file = max(csv_files)
+    latest_file = os.path.join(project_root, latest_name)
     print(f"Analyzing data from: {latest_file}\n")
     
     # Load data
@@ -275,9 +395,10 @@ def main():
         print("No data found in the CSV file.")
         return
     
-    # Run analyses
-    analyze_running_trends(df)
-    find_personal_records(df)
+    # Run analyses (the monthly aggregation is shared by trends and records)
+    monthly_stats = compute_monthly_stats(df)
+    analyze_running_trends(df, monthly_stats)
+    find_personal_records(df, monthly_stats)
     analyze_heart_rate_data(df)
     generate_training_insights(df)
     
@@ -292,5 +413,4 @@ def main():
 
 
 if __name__ == "__main__":
-    import os
     main()
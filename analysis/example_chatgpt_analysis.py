@@ -2,30 +2,75 @@
 Example script showing how to use ChatGPTConnector with Strava data.
 """
 
-import sys
 import os
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Project root (parent of this directory), resolved once at import
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 from connectors.chatgpt_connector import ChatGPTConnector, analyze_strava_activity, analyze_strava_dataframe
-from strava.strava_data_puller import StravaAPI, StravaConfig, setup_strava_config
+from connectors import compact_jsonl, format_rows
+from strava.strava_data_puller import get_default_api
 from strava.strava_data_processing import StravaDataProcessor
-import os
+from strava.heart_rate_zones import format_hr_zone_summary
+from strava.stream_jsonl_processor import sample_jsonl_lines, summarize_jsonl_by_group
 import json
+import pandas as pd
+
+# Default data files (absolute, so the examples work from any working directory)
+ACTIVITIES_CSV_FILE = os.path.join(PROJECT_ROOT, 'strava_person_a_data_20251011_010454.csv')
+PERSON_CSV_FILE = os.path.join(PROJECT_ROOT, 'strava_person_a_data_20250907_163239.csv')
+STREAMS_JSONL_FILE = os.path.join(PROJECT_ROOT, 'streams', 'person_An_streams_5s_abnormal.jsonl')
+
+# Athlete's maximum heart rate, used to precompute heart rate zones
+MAX_HEARTRATE = 195
+
+# Largest number of activities the JSONL example sends with detail='raw' (a random sample of larger files)
+JSONL_SAMPLE_SIZE = 100
+
+# What the JSONL example sends: 'summary' = per activity group aggregates of the file,
+# 'raw' = the activities themselves
+JSONL_DETAIL = 'summary'
+
+
+# Columns of the exported activity CSV that the CSV example sends to ChatGPT.
+# The rest (ids, kudos, flags, descriptions, ...) only add upload bytes and tokens.
+CSV_PROMPT_COLUMNS = [
+    'name', 'type', 'start_date', 'distance', 'moving_time', 'elapsed_time',
+    'total_elevation_gain', 'average_speed', 'max_speed',
+    'average_heartrate', 'max_heartrate', 'suffer_score'
+]
+
+
+# Model per kind of analysis: quick summaries use the smaller 'preview' model,
+# the detailed single-activity analysis asks for the larger 'deep' one
+MODEL_TIERS = {'preview': 'gpt-4o-mini', 'deep': 'gpt-4o'}
+
+
+# Connectors shared by all examples, one per model tier, created on first use.
+# They share one OpenAI client (and its connection pool) for every request made
+# while the script runs.
+_connectors = {}
+
+
+def _get_connector(tier: str = 'preview') -> ChatGPTConnector:
+    """Return the shared ChatGPT connector for a MODEL_TIERS tier, creating it on first use."""
+    if tier not in _connectors:
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            print("OPENAI_API_KEY is not set; falling back to the placeholder key in the script.")
+            api_key = 'ENTER-YOUR-OPENAI-API-KEY-HERE'
+        _connectors[tier] = ChatGPTConnector(api_key, model=MODEL_TIERS[tier])
+    return _connectors[tier]
 
 
 def example_analyze_csv_file():
     """Example: Analyze a CSV file that was saved from Strava data."""
     
-    # Set your OpenAI API key (or set OPENAI_API_KEY environment variable)
-    api_key = os.getenv('OPENAI_API_KEY') or 'ENTER-YOUR-OPENAI-API-KEY-HERE'
-    print(api_key)
-    # Path to your CSV file (relative to project root or absolute path)
-    csv_file = os.path.join('..', 'strava_person_a_data_20251011_010454.csv')  # Change to your file name
+    # Path to your CSV file (see the data file constants at the top of this script)
+    csv_file = ACTIVITIES_CSV_FILE
     
-    # Create connector
-    connector = ChatGPTConnector(api_key)
+    # Create connector (set your OpenAI API key via the OPENAI_API_KEY environment variable)
+    connector = _get_connector()
     
     # System message to set context
     system_message = """You are a sports scientist and running coach expert. 
@@ -48,9 +93,12 @@ def example_analyze_csv_file():
 
 Be specific and data-driven."""
     
-    # Send file and prompt to ChatGPT
+    # Keep only the columns relevant to the analysis before sending
+    df = pd.read_csv(csv_file, usecols=lambda column: column in CSV_PROMPT_COLUMNS)
+    
+    # Send data and prompt to ChatGPT
     print("Sending data to ChatGPT for analysis...")
-    response = connector.send_file_with_prompt(csv_file, prompt, system_message)
+    response = connector.send_dataframe_with_prompt(df, prompt, system_message)
     
     print("\n" + "="*80)
     print("CHATGPT ANALYSIS:")
@@ -64,8 +112,7 @@ def example_analyze_live_data():
     """Example: Fetch Strava data and analyze it with ChatGPT."""
     
     # Setup Strava
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     # Get activities for a specific person
     person_initial = 'A'
@@ -80,8 +127,7 @@ def example_analyze_live_data():
     df = processor.activities_to_dataframe()
     
     # Setup ChatGPT
-    api_key = os.getenv('OPENAI_API_KEY') or 'ENTER-YOUR-OPENAI-API-KEY-HERE'
-    connector = ChatGPTConnector(api_key)
+    connector = _get_connector()
     
     # Analyze with ChatGPT
     system_message = """You are a sports scientist and running coach expert. 
@@ -117,8 +163,7 @@ def example_analyze_specific_activity():
     """Example: Get a specific activity's details and analyze with ChatGPT."""
     
     # Setup Strava
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     # Get specific activity details
     activity_id = 15093834011  # Change to your activity ID
@@ -132,9 +177,12 @@ def example_analyze_specific_activity():
     processor = StravaDataProcessor(activity_details)
     df = processor.activity_details_to_dataframe()
     
-    # Setup ChatGPT
-    api_key = os.getenv('OPENAI_API_KEY') or 'ENTER-YOUR-OPENAI-API-KEY-HERE'
-    connector = ChatGPTConnector(api_key)
+    # Compute heart rate zones locally so the LLM does not have to estimate them
+    streams = api.get_activity_streams(activity_id, types=['time', 'heartrate'])
+    zone_summary = format_hr_zone_summary(processor.streams_to_dataframe(streams), MAX_HEARTRATE)
+    
+    # Setup ChatGPT (detailed analysis: use the larger model)
+    connector = _get_connector('deep')
     
     # Create detailed analysis prompt
     system_message = """You are an expert sports scientist specializing in endurance training. 
@@ -158,31 +206,38 @@ def example_analyze_specific_activity():
 
 Use the data to make specific, measurable observations."""
     
+    if zone_summary:
+        prompt = f"{prompt}\n\n{zone_summary}"
+    
     print(f"\nAnalyzing activity {activity_id}...")
-    response = connector.send_dataframe_with_prompt(df, prompt, system_message)
+    # One activity row: summary statistics would only repeat it, so send none
+    full_prompt = connector.format_dataframe_prompt(df, prompt, precomputed_stats={})
     
     print("\n" + "="*80)
     print("CHATGPT ANALYSIS:")
     print("="*80)
-    print(response)
     
-    # Optionally save the response
+    # Stream the response: print and save each chunk as it arrives
     output_file = f"chatgpt_analysis_{activity_id}.txt"
+    chunks = []
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(response)
+        for chunk in connector.stream_prompt(full_prompt, system_message):
+            print(chunk, end='', flush=True)
+            f.write(chunk)
+            chunks.append(chunk)
+    print()
     print(f"\nAnalysis saved to: {output_file}")
     
-    return response
+    return ''.join(chunks)
 
 
 def example_custom_prompt():
     """Example: Use a completely custom prompt with your own file."""
     
-    api_key = os.getenv('OPENAI_API_KEY') or 'ENTER-YOUR-OPENAI-API-KEY-HERE'
-    connector = ChatGPTConnector(api_key)
+    connector = _get_connector()
     
-    # Your file path (relative to project root or absolute path)
-    file_path = os.path.join('..', 'strava_person_a_data_20250907_163239.csv')
+    # Your file path (see the data file constants at the top of this script)
+    file_path = PERSON_CSV_FILE
     
     # Your custom system message
     system_message = "You are a data analyst specializing in fitness and health metrics."
@@ -206,8 +261,7 @@ def example_custom_prompt():
 def example_multi_turn_conversation():
     """Example: Have a multi-turn conversation about the data."""
     
-    api_key = os.getenv('OPENAI_API_KEY') or 'ENTER-YOUR-OPENAI-API-KEY-HERE'
-    connector = ChatGPTConnector(api_key)
+    connector = _get_connector()
     
     # Build a conversation
     messages = [
@@ -228,26 +282,55 @@ def example_multi_turn_conversation():
     return response2
 
 
-def example_analyze_jsonl_file():
-    """Example: Send a JSONL file (e.g., output from stream_jsonl_processor) to ChatGPT."""
+def example_analyze_jsonl_file(detail: str = JSONL_DETAIL):
+    """Example: Send a JSONL file (e.g., output from stream_jsonl_processor) to ChatGPT.
+
+    detail='summary' sends per activity group aggregates of the file, detail='raw' the activities themselves.
+    """
 
     # Setup ChatGPT connector
-    api_key = os.getenv('OPENAI_API_KEY') or 'ENTER-YOUR-OPENAI-API-KEY-HERE'
-    connector = ChatGPTConnector(api_key)
+    connector = _get_connector()
 
     # Path to the JSONL file (update with your generated file)
-    jsonl_file = os.path.join('..', 'streams', 'person_An_streams_5s_abnormal.jsonl')
+    jsonl_file = STREAMS_JSONL_FILE
 
     if not os.path.exists(jsonl_file):
         print(f"JSONL file not found: {jsonl_file}\nGenerate one using example_stream_jsonl.py first.")
         return
 
-    # Read JSONL content
-    with open(jsonl_file, 'r', encoding='utf-8') as f:
-        jsonl_lines = f.readlines()
-
-    # Build prompt and system instructions
-    system_message = """You are a sports scientist and data analyst. Analyze the provided JSONL activity stream data.
+    if detail == 'raw':
+        # Count the activities and sample at most JSONL_SAMPLE_SIZE of them in one pass
+        activity_count, sampled_lines = sample_jsonl_lines(jsonl_file, JSONL_SAMPLE_SIZE, seed=0)
+        sample_note = ""
+        if activity_count > len(sampled_lines):
+            sample_note = f" A random sample of {len(sampled_lines)} of them (in file order) is attached."
+    else:
+        # Parse the file once and send only the per group aggregates
+        summary = summarize_jsonl_by_group(jsonl_file)
+        if summary.empty:
+            print(f"No activities found in {jsonl_file}.")
+            return
+        activity_count = int(summary['activities'].sum())
+        sample_note = (" They are attached aggregated per activity group"
+                       " (means of the metadata and of the 5/50/95% stream quantiles).")
+
+    # Build prompt and system instructions (the summary table has other columns than the raw lines)
+    if detail != 'raw':
+        system_message = """You are a sports scientist and data analyst. Analyze the provided per activity group summary table.
+All the activities were performed by a single person, using multiple wearable devices.
+Each row aggregates the activities of one group, named in the "activity_group" column:
+"Running (lower pace)" (odd numbered runs), "Running (higher pace)" (even numbered runs), "Treppe" (stair climbing), "Rest" (idle resting) or "Other".
+The "activities" column is the number of activities in the group.
+The metadata columns (distance_m, moving_time_s, elapsed_time_s, total_elevation_gain_m, average_speed_ms, max_speed_ms,
+average_heartrate_bpm, max_heartrate_bpm) are the means over the activities of the group.
+The <stream>_p5, <stream>_p50 and <stream>_p95 columns (e.g. hr_bpm_p50) are the means of the activities' 5%, 50% and 95% stream quantiles.
+Columns without data for a group are empty.
+The running activities were performed in successive rounds, with each round starting with a lower paced running activity followed by a higher paced running activity and ending with a rest activity.
+The stair climbing activities were performed seperately, a bit before the running activities.
+The running activities streams are filtered to include only the points where movement was detected, and only they include pace and velocity data.
+Identify patterns, compare activity types (Running, Treppe, Rest), and give insights."""
+    else:
+        system_message = """You are a sports scientist and data analyst. Analyze the provided JSONL activity stream data.
 Each JSON line represents one activity with metadata (distance, time, etc.), sampled streams (at ~5s intervals),
 and pre-computed quantiles. All the activities were performed by a single person, using multiple wearable devices.
 There are in total 3 types of activities: Running, Stair Climbing and Idle Resting.
@@ -263,7 +346,7 @@ The running activities streams are filtered before sampling to include only the
 Furthermore, the running activities JSONs include pace and velocity data, unlike the stair climbing and the rest activities.
 Identify patterns, compare activity types (Running, Treppe, Rest), and give insights."""
 
-    prompt = f"""The attached JSONL file contains {len(jsonl_lines)} activities.
+    prompt = f"""The JSONL file contains {activity_count} activities.{sample_note}
 Please summarize:
 1. Overall trends (distance, heart rate, cadence, altitude).
 2. Differences between activity types (Running vs. Treppe vs. Rest).
@@ -275,11 +358,18 @@ If present, use quantiles to describe distributions."""
 
     print(f"Sending JSONL data to ChatGPT for analysis ({jsonl_file})...")
 
-    response = connector.send_file_with_prompt(
-        jsonl_file,
-        prompt,
-        system_message
-    )
+    if detail != 'raw':
+        response = connector.send_prompt(f"{prompt}\n\n{format_rows(summary)}", system_message)
+    elif not sample_note:
+        response = connector.send_file_with_prompt(jsonl_file, prompt, system_message)
+    else:
+        # Send the sample as text, compacted like a .jsonl file; the seeded sample and the
+        # real file name keep the prompt (and its response cache entry) the same across runs
+        sample_text = compact_jsonl(''.join(sampled_lines))
+        response = connector.send_prompt(
+            f"File: {jsonl_file} (sampled activities)\n\n{sample_text}\n\n{'='*50}\n\n{prompt}",
+            system_message
+        )
 
     print("\n" + "=" * 80)
     print("CHATGPT ANALYSIS (JSONL):")
@@ -5,39 +5,77 @@ Example script showing how to use DeepSeekConnector with Strava data.
 import os
 import json
 
-import sys
-import os
-
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Project root (parent of this directory), resolved once at import
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 from connectors.deepseek_connector import DeepSeekConnector
-from strava.strava_data_puller import StravaAPI, StravaConfig, setup_strava_config
+from connectors import compact_jsonl, format_rows
+from strava.strava_data_puller import get_default_api
 from strava.strava_data_processing import StravaDataProcessor
+from strava.heart_rate_zones import format_hr_zone_summary
+from strava.stream_jsonl_processor import sample_jsonl_lines, summarize_jsonl_by_group
 
+# Default data files (absolute, so the examples work from any working directory)
+ACTIVITIES_CSV_FILE = os.path.join(PROJECT_ROOT, 'strava_person_a_data_20251011_010454.csv')
+PERSON_CSV_FILE = os.path.join(PROJECT_ROOT, 'strava_person_a_data_20250907_163239.csv')
+STREAMS_JSONL_FILE = os.path.join(PROJECT_ROOT, 'streams', 'person_An_streams_5s_abnormal.jsonl')
 
-DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY') or 'ENTER-YOUR-DEEPSEEK-API-KEY-HERE'
-DEEPSEEK_BASE_URL = 'ENTER-YOUR-DEEPSEEK-BASE-URL-HERE'
-
+# Athlete's maximum heart rate, used to precompute heart rate zones
+MAX_HEARTRATE = 195
 
-def example_analyze_csv_file():
-    """Example: Analyze a CSV file using DeepSeek."""
+# Largest number of activities the JSONL example sends with detail='raw' (a random sample of larger files)
+JSONL_SAMPLE_SIZE = 100
 
-    api_key = DEEPSEEK_API_KEY
-    base_url = DEEPSEEK_BASE_URL
+# What the JSONL example sends: 'summary' = per activity group aggregates of the file,
+# 'raw' = the activities themselves
+JSONL_DETAIL = 'summary'
 
-    csv_file = os.path.join('..', 'strava_person_a_data_20251011_010454.csv')
-    connector = DeepSeekConnector(api_key=api_key, base_url=base_url)
 
-    system_message = """You are a sports scientist and running coach expert.
+# System messages and prompts of the examples, built once at import.
+# Prompts with placeholders are filled in with str.format by the example.
+_SYSTEM_MESSAGES = {
+    'activities': """You are a sports scientist and running coach expert.
 You are provided a csv file with activities performed by a single person.
 The activities are of 3 different types: Running, Stair Climbing and Idle Resting.
 Running has 2 further subtypes: Higher paced running and Lower paced running. These activities all have "Running" in their name.
 Stair Climbing activities have "Treppe" in their name.
 Idle Resting activities have "Rest" in their name.
-Analyze the provided Strava activity data and provide insights about the athlete's fitness."""
+Analyze the provided Strava activity data and provide insights about the athlete's fitness.""",
+    'specific_activity': """You are an expert sports scientist specializing in endurance training.
+Analyze activity data with scientific rigor and provide evidence-based recommendations.""",
+    'custom': "You are a data analyst specializing in fitness and health metrics.",
+    'jsonl': """You are a sports scientist and data analyst. Analyze the provided JSONL activity stream data.
+Each JSON line represents one activity with metadata (distance, time, etc.), sampled streams (at ~5s intervals),
+and pre-computed quantiles. All the activities were performed by a single person, using multiple wearable devices.
+There are in total 3 types of activities: Running, Stair Climbing and Idle Resting.
+The running activities have 2 further subtypes: Higher paced running, and Lower paced running. These activities all have "Running" in their name.
+Lower paced running activities have an odd number in their name, right after the "Running" in their name.
+Higher paced running activities have an even number in their name, right after the "Running" in their name.
+Stair Climbing activities have "Treppe" in their name.
+Idle Resting activities have "Rest" in their name.
+The running activities were performed in successive rounds, with each round starting with a lower paced running activity followed by a higher paced running activity and ending with a rest activity.
+The stair climbing activities were performed seperately, a bit before the running activities.
+All activities have a JSON object with the key "streams_compact" that contains the sampled streams.
+The running activities streams are filtered before sampling to include only the points where movement was detected.
+Furthermore, the running activities JSONs include pace and velocity data, unlike the stair climbing and the rest activities.
+Identify patterns, compare activity types (Running, Treppe, Rest), and give insights.""",
+    'jsonl_summary': """You are a sports scientist and data analyst. Analyze the provided per activity group summary table.
+All the activities were performed by a single person, using multiple wearable devices.
+Each row aggregates the activities of one group, named in the "activity_group" column:
+"Running (lower pace)" (odd numbered runs), "Running (higher pace)" (even numbered runs), "Treppe" (stair climbing), "Rest" (idle resting) or "Other".
+The "activities" column is the number of activities in the group.
+The metadata columns (distance_m, moving_time_s, elapsed_time_s, total_elevation_gain_m, average_speed_ms, max_speed_ms,
+average_heartrate_bpm, max_heartrate_bpm) are the means over the activities of the group.
+The <stream>_p5, <stream>_p50 and <stream>_p95 columns (e.g. hr_bpm_p50) are the means of the activities' 5%, 50% and 95% stream quantiles.
+Columns without data for a group are empty.
+The running activities were performed in successive rounds, with each round starting with a lower paced running activity followed by a higher paced running activity and ending with a rest activity.
+The stair climbing activities were performed seperately, a bit before the running activities.
+The running activities streams are filtered to include only the points where movement was detected, and only they include pace and velocity data.
+Identify patterns, compare activity types (Running, Treppe, Rest), and give insights."""
+}
 
-    prompt = """Please analyze this Strava running activity and provide:
+_PROMPTS = {
+    'csv_analysis': """Please analyze this Strava running activity and provide:
 
 1. Activity Summary (distance, time, pace, elevation, HR)
 2. Performance Assessment and fitness level
@@ -46,7 +84,65 @@ Analyze the provided Strava activity data and provide insights about the athlete
 5. Fitness grade (A-F)
 6. Three specific training recommendations
 
-Be specific and data-driven."""
+Be specific and data-driven.""",
+    'live_data': """Analyze the last 180 days of running activities for athlete {person_initial}:
+
+1. Training volume summary
+2. Consistency and frequency patterns
+3. Performance trends
+4. Key insights and observations
+5. Training recommendations for the next month
+
+Be specific and actionable.""",
+    'specific_activity': """Analyze this specific running activity in detail:
+
+1. **Session Overview**: Summarize key metrics
+2. **Aerobic Fitness Assessment**:
+   - Calculate and analyze pace vs heart rate relationship
+   - Estimate aerobic efficiency (min/km per 10 bpm)
+3. **Intensity Distribution**:
+   - Estimate time in different HR zones
+   - Assess if intensity was appropriate for the session
+4. **Performance Indicators**:
+   - Pace sustainability
+   - Cadence analysis
+   - Elevation/terrain impact
+5. **Fitness Grade**: Provide A-F grade with detailed justification
+6. **Specific Recommendations**: 3 actionable next steps
+
+Use the data to make specific, measurable observations.""",
+    'custom': """Look at this data and tell me:
+1. What patterns do you see?
+2. Is this person improving over time?
+3. What should they focus on next?""",
+    'jsonl': """The JSONL file contains {activity_count} activities.{sample_note}
+Please summarize:
+1. Overall trends (distance, heart rate, cadence, altitude).
+2. Differences between activity types (Running vs. Treppe vs. Rest).
+3. Any outliers or unusual sessions.
+4. Your assessment of the person's fitness.
+5. Recommendations for training focus to improve the person's fitness.
+
+If present, use quantiles to describe distributions."""
+}
+
+
+DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY') or 'ENTER-YOUR-DEEPSEEK-API-KEY-HERE'
+DEEPSEEK_BASE_URL = 'ENTER-YOUR-DEEPSEEK-BASE-URL-HERE'
+
+
+def example_analyze_csv_file():
+    """Example: Analyze a CSV file using DeepSeek."""
+
+    api_key = DEEPSEEK_API_KEY
+    base_url = DEEPSEEK_BASE_URL
+
+    csv_file = ACTIVITIES_CSV_FILE
+    connector = DeepSeekConnector(api_key=api_key, base_url=base_url)
+
+    system_message = _SYSTEM_MESSAGES['activities']
+
+    prompt = _PROMPTS['csv_analysis']
 
     print("Sending data to DeepSeek for analysis...")
     response = connector.send_file_with_prompt(csv_file, prompt, system_message)
@@ -62,8 +158,7 @@ Be specific and data-driven."""
 def example_analyze_live_data():
     """Example: Fetch Strava data and analyze it with DeepSeek."""
 
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
 
     person_initial = 'A'
     activities = api.get_activities_by_person(person_initial, days_back=180)
@@ -79,23 +174,9 @@ def example_analyze_live_data():
     base_url = DEEPSEEK_BASE_URL
     connector = DeepSeekConnector(api_key=api_key, base_url=base_url)
 
-    system_message = """You are a sports scientist and running coach expert.
-You are provided a csv file with activities performed by a single person.
-The activities are of 3 different types: Running, Stair Climbing and Idle Resting.
-Running has 2 further subtypes: Higher paced running and Lower paced running. These activities all have "Running" in their name.
-Stair Climbing activities have "Treppe" in their name.
-Idle Resting activities have "Rest" in their name.
-Analyze the provided Strava activity data and provide insights about the athlete's fitness."""
-
-    prompt = f"""Analyze the last 180 days of running activities for athlete {person_initial}:
-
-1. Training volume summary
-2. Consistency and frequency patterns
-3. Performance trends
-4. Key insights and observations
-5. Training recommendations for the next month
+    system_message = _SYSTEM_MESSAGES['activities']
 
-Be specific and actionable."""
+    prompt = _PROMPTS['live_data'].format(person_initial=person_initial)
 
     print(f"\nAnalyzing {len(activities)} activities for person {person_initial}...")
     response = connector.send_dataframe_with_prompt(df, prompt, system_message)
@@ -111,8 +192,7 @@ Be specific and actionable."""
 def example_analyze_specific_activity():
     """Example: Analyze a specific activity with DeepSeek."""
 
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
 
     activity_id = 15093834011
     activity_details = api.get_activity_details(activity_id)
@@ -124,33 +204,24 @@ def example_analyze_specific_activity():
     processor = StravaDataProcessor(activity_details)
     df = processor.activity_details_to_dataframe()
 
+    # Compute heart rate zones locally so the LLM does not have to estimate them
+    streams = api.get_activity_streams(activity_id, types=['time', 'heartrate'])
+    zone_summary = format_hr_zone_summary(processor.streams_to_dataframe(streams), MAX_HEARTRATE)
+
     api_key = DEEPSEEK_API_KEY
     base_url = DEEPSEEK_BASE_URL
     connector = DeepSeekConnector(api_key=api_key, base_url=base_url)
 
-    system_message = """You are an expert sports scientist specializing in endurance training.
-Analyze activity data with scientific rigor and provide evidence-based recommendations."""
+    system_message = _SYSTEM_MESSAGES['specific_activity']
 
-    prompt = """Analyze this specific running activity in detail:
+    prompt = _PROMPTS['specific_activity']
 
-1. **Session Overview**: Summarize key metrics
-2. **Aerobic Fitness Assessment**:
-   - Calculate and analyze pace vs heart rate relationship
-   - Estimate aerobic efficiency (min/km per 10 bpm)
-3. **Intensity Distribution**:
-   - Estimate time in different HR zones
-   - Assess if intensity was appropriate for the session
-4. **Performance Indicators**:
-   - Pace sustainability
-   - Cadence analysis
-   - Elevation/terrain impact
-5. **Fitness Grade**: Provide A-F grade with detailed justification
-6. **Specific Recommendations**: 3 actionable next steps
-
-Use the data to make specific, measurable observations."""
+    if zone_summary:
+        prompt = f"{prompt}\n\n{zone_summary}"
 
     print(f"\nAnalyzing activity {activity_id}...")
-    response = connector.send_dataframe_with_prompt(df, prompt, system_message)
+    # One activity row: summary statistics would only repeat it, so send none
+    response = connector.send_dataframe_with_prompt(df, prompt, system_message, precomputed_stats={})
 
     print("\n" + "=" * 80)
     print("DEEPSEEK ANALYSIS:")
@@ -172,14 +243,11 @@ def example_custom_prompt():
     base_url = DEEPSEEK_BASE_URL
     connector = DeepSeekConnector(api_key=api_key, base_url=base_url)
 
-    file_path = os.path.join('..', 'strava_person_a_data_20250907_163239.csv')
+    file_path = PERSON_CSV_FILE
 
-    system_message = "You are a data analyst specializing in fitness and health metrics."
+    system_message = _SYSTEM_MESSAGES['custom']
 
-    prompt = """Look at this data and tell me:
-1. What patterns do you see?
-2. Is this person improving over time?
-3. What should they focus on next?"""
+    prompt = _PROMPTS['custom']
 
     response = connector.send_file_with_prompt(file_path, prompt, system_message)
 
@@ -215,55 +283,53 @@ def example_multi_turn_conversation():
     return response2
 
 
-def example_analyze_jsonl_file():
-    """Example: Send a JSONL file to DeepSeek for analysis."""
+def example_analyze_jsonl_file(detail: str = JSONL_DETAIL):
+    """Example: Send a JSONL file (aggregated per activity group, or raw with detail='raw') to DeepSeek."""
 
     api_key = DEEPSEEK_API_KEY
     base_url = DEEPSEEK_BASE_URL
     connector = DeepSeekConnector(api_key=api_key, base_url=base_url)
 
-    jsonl_file = os.path.join('..', 'streams', 'person_An_streams_5s_abnormal.jsonl')
+    jsonl_file = STREAMS_JSONL_FILE
 
     if not os.path.exists(jsonl_file):
         print(f"JSONL file not found: {jsonl_file}\nGenerate one using example_stream_jsonl.py first.")
         return
 
-    with open(jsonl_file, 'r', encoding='utf-8') as f:
-        jsonl_lines = f.readlines()
-
-    system_message = """You are a sports scientist and data analyst. Analyze the provided JSONL activity stream data.
-Each JSON line represents one activity with metadata (distance, time, etc.), sampled streams (at ~5s intervals),
-and pre-computed quantiles. All the activities were performed by a single person, using multiple wearable devices.
-There are in total 3 types of activities: Running, Stair Climbing and Idle Resting.
-The running activities have 2 further subtypes: Higher paced running, and Lower paced running. These activities all have "Running" in their name.
-Lower paced running activities have an odd number in their name, right after the "Running" in their name.
-Higher paced running activities have an even number in their name, right after the "Running" in their name.
-Stair Climbing activities have "Treppe" in their name.
-Idle Resting activities have "Rest" in their name.
-The running activities were performed in successive rounds, with each round starting with a lower paced running activity followed by a higher paced running activity and ending with a rest activity.
-The stair climbing activities were performed seperately, a bit before the running activities.
-All activities have a JSON object with the key "streams_compact" that contains the sampled streams.
-The running activities streams are filtered before sampling to include only the points where movement was detected.
-Furthermore, the running activities JSONs include pace and velocity data, unlike the stair climbing and the rest activities.
-Identify patterns, compare activity types (Running, Treppe, Rest), and give insights."""
-
-    prompt = f"""The attached JSONL file contains {len(jsonl_lines)} activities.
-Please summarize:
-1. Overall trends (distance, heart rate, cadence, altitude).
-2. Differences between activity types (Running vs. Treppe vs. Rest).
-3. Any outliers or unusual sessions.
-4. Your assessment of the person's fitness.
-5. Recommendations for training focus to improve the person's fitness.
-
-If present, use quantiles to describe distributions."""
+    if detail == 'raw':
+        # Count the activities and sample at most JSONL_SAMPLE_SIZE of them in one pass
+        activity_count, sampled_lines = sample_jsonl_lines(jsonl_file, JSONL_SAMPLE_SIZE, seed=0)
+        sample_note = ""
+        if activity_count > len(sampled_lines):
+            sample_note = f" A random sample of {len(sampled_lines)} of them (in file order) is attached."
+    else:
+        # Parse the file once and send only the per group aggregates
+        summary = summarize_jsonl_by_group(jsonl_file)
+        if summary.empty:
+            print(f"No activities found in {jsonl_file}.")
+            return
+        activity_count = int(summary['activities'].sum())
+        sample_note = (" They are attached aggregated per activity group"
+                       " (means of the metadata and of the 5/50/95% stream quantiles).")
+
+    system_message = _SYSTEM_MESSAGES['jsonl' if detail == 'raw' else 'jsonl_summary']
+
+    prompt = _PROMPTS['jsonl'].format(activity_count=activity_count, sample_note=sample_note)
 
     print(f"Sending JSONL data to DeepSeek for analysis ({jsonl_file})...")
 
-    response = connector.send_file_with_prompt(
-        jsonl_file,
-        prompt,
-        system_message
-    )
+    if detail != 'raw':
+        response = connector.send_prompt(f"{prompt}\n\n{format_rows(summary)}", system_message)
+    elif not sample_note:
+        response = connector.send_file_with_prompt(jsonl_file, prompt, system_message)
+    else:
+        # Send the sample as text, compacted like a .jsonl file; the seeded sample and the
+        # real file name keep the prompt (and its response cache entry) the same across runs
+        sample_text = compact_jsonl(''.join(sampled_lines))
+        response = connector.send_prompt(
+            f"File: {jsonl_file} (sampled activities)\n\n{sample_text}\n\n{'='*60}\n\n{prompt}",
+            system_message
+        )
 
     print("\n" + "=" * 80)
     print("DEEPSEEK ANALYSIS (JSONL):")
@@ -2,16 +2,85 @@
 Example script showing how to use GeminiConnector with Strava data.
 """
 
-import sys
 import os
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Project root (parent of this directory), resolved once at import
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 from connectors.gemini_connector import GeminiConnector, analyze_strava_activity, analyze_strava_dataframe
-from strava.strava_data_puller import StravaAPI, StravaConfig, setup_strava_config
+from connectors import format_csv_as_prompt
+from strava.strava_data_puller import get_default_api
 from strava.strava_data_processing import StravaDataProcessor
-import os
+from strava.heart_rate_zones import format_hr_zone_summary
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Default data files (absolute, so the examples work from any working directory)
+DETAILS_CSV_FILE = os.path.join(PROJECT_ROOT, 'strava_details_data_20250907_193806.csv')
+PERSON_CSV_FILE = os.path.join(PROJECT_ROOT, 'strava_person_a_data_20250907_163239.csv')
+
+# Athlete's maximum heart rate, used to precompute heart rate zones
+MAX_HEARTRATE = 195
+
+# System messages and prompts of the examples, built once at import.
+# Prompts with placeholders are filled in with str.format by the example.
+_SYSTEM_MESSAGES = {
+    'csv_analysis': """You are a sports scientist and running coach expert. 
+    Analyze the provided Strava activity data and provide insights about the athlete's fitness.""",
+    'live_data': """You are a sports scientist analyzing training data. 
+    Provide insights about training patterns, volume, and recommendations.""",
+    'specific_activity': """You are an expert sports scientist specializing in endurance training. 
+    Analyze activity data with scientific rigor and provide evidence-based recommendations.""",
+    'custom': "You are a data analyst specializing in fitness and health metrics.",
+    'compare': "You are a sports scientist."
+}
+
+_PROMPTS = {
+    'csv_analysis': """Please analyze this Strava running activity and provide:
+
+1. Activity Summary (distance, time, pace, elevation, HR)
+2. Performance Assessment and fitness level
+3. Aerobic efficiency analysis
+4. Heart rate zone distribution estimates
+5. Fitness grade (A-F)
+6. Three specific training recommendations
+
+Be specific and data-driven.""",
+    'live_data': """Analyze the last 30 days of running activities for athlete {person_initial}:
+
+1. Training volume summary
+2. Consistency and frequency patterns
+3. Performance trends
+4. Key insights and observations
+5. Training recommendations for the next month
+
+Be specific and actionable.""",
+    'specific_activity': """Analyze this specific running activity in detail:
+
+1. **Session Overview**: Summarize key metrics
+2. **Aerobic Fitness Assessment**: 
+   - Calculate and analyze pace vs heart rate relationship
+   - Estimate aerobic efficiency (min/km per 10 bpm)
+3. **Intensity Distribution**: 
+   - Estimate time in different HR zones
+   - Assess if intensity was appropriate for the session
+4. **Performance Indicators**:
+   - Pace sustainability
+   - Cadence analysis
+   - Elevation/terrain impact
+5. **Fitness Grade**: Provide A-F grade with detailed justification
+6. **Specific Recommendations**: 3 actionable next steps
+
+Use the data to make specific, measurable observations.""",
+    'custom': """Look at this data and tell me:
+    1. What patterns do you see?
+    2. Is this person improving over time?
+    3. What should they focus on next?""",
+    'compare': """Analyze this running activity and provide:
+    1. Activity summary
+    2. Fitness assessment (A-F grade)
+    3. Top 3 recommendations"""
+}
 
 
 def example_analyze_csv_file():
@@ -20,27 +89,17 @@ def example_analyze_csv_file():
     # Set your Gemini API key (or set GEMINI_API_KEY environment variable)
     api_key = os.getenv('GEMINI_API_KEY') or 'ENTER-YOUR-GEMINI-API-KEY-HERE'
     
-    # Path to your CSV file (relative to project root or absolute path)
-    csv_file = os.path.join('..', 'strava_details_data_20250907_193806.csv')  # Change to your file name
+    # Path to your CSV file (see the data file constants at the top of this script)
+    csv_file = DETAILS_CSV_FILE
     
     # Create connector
     connector = GeminiConnector(api_key)
     
     # System message to set context
-    system_message = """You are a sports scientist and running coach expert. 
-    Analyze the provided Strava activity data and provide insights about the athlete's fitness."""
+    system_message = _SYSTEM_MESSAGES['csv_analysis']
     
     # Your custom prompt
-    prompt = """Please analyze this Strava running activity and provide:
-
-1. Activity Summary (distance, time, pace, elevation, HR)
-2. Performance Assessment and fitness level
-3. Aerobic efficiency analysis
-4. Heart rate zone distribution estimates
-5. Fitness grade (A-F)
-6. Three specific training recommendations
-
-Be specific and data-driven."""
+    prompt = _PROMPTS['csv_analysis']
     
     # Send file and prompt to Gemini
     print("Sending data to Gemini AI for analysis...")
@@ -58,8 +117,7 @@ def example_analyze_live_data():
     """Example: Fetch Strava data and analyze it with Gemini."""
     
     # Setup Strava
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     # Get activities for a specific person
     person_initial = 'A'
@@ -78,18 +136,9 @@ def example_analyze_live_data():
     connector = GeminiConnector(api_key)
     
     # Analyze with Gemini
-    system_message = """You are a sports scientist analyzing training data. 
-    Provide insights about training patterns, volume, and recommendations."""
+    system_message = _SYSTEM_MESSAGES['live_data']
     
-    prompt = f"""Analyze the last 30 days of running activities for athlete {person_initial}:
-
-1. Training volume summary
-2. Consistency and frequency patterns
-3. Performance trends
-4. Key insights and observations
-5. Training recommendations for the next month
-
-Be specific and actionable."""
+    prompt = _PROMPTS['live_data'].format(person_initial=person_initial)
     
     print(f"\nAnalyzing {len(activities)} activities for person {person_initial}...")
     response = connector.send_dataframe_with_prompt(df, prompt, system_message)
@@ -106,8 +155,7 @@ def example_analyze_specific_activity():
     """Example: Get a specific activity's details and analyze with Gemini."""
     
     # Setup Strava
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     # Get specific activity details
     activity_id = 15093834011  # Change to your activity ID
@@ -121,34 +169,25 @@ def example_analyze_specific_activity():
     processor = StravaDataProcessor(activity_details)
     df = processor.activity_details_to_dataframe()
     
+    # Compute heart rate zones locally so the LLM does not have to estimate them
+    streams = api.get_activity_streams(activity_id, types=['time', 'heartrate'])
+    zone_summary = format_hr_zone_summary(processor.streams_to_dataframe(streams), MAX_HEARTRATE)
+    
     # Setup Gemini
     api_key = os.getenv('GEMINI_API_KEY') or 'ENTER-YOUR-GEMINI-API-KEY-HERE'
     connector = GeminiConnector(api_key)
     
     # Create detailed analysis prompt
-    system_message = """You are an expert sports scientist specializing in endurance training. 
-    Analyze activity data with scientific rigor and provide evidence-based recommendations."""
+    system_message = _SYSTEM_MESSAGES['specific_activity']
     
-    prompt = """Analyze this specific running activity in detail:
-
-1. **Session Overview**: Summarize key metrics
-2. **Aerobic Fitness Assessment**: 
-   - Calculate and analyze pace vs heart rate relationship
-   - Estimate aerobic efficiency (min/km per 10 bpm)
-3. **Intensity Distribution**: 
-   - Estimate time in different HR zones
-   - Assess if intensity was appropriate for the session
-4. **Performance Indicators**:
-   - Pace sustainability
-   - Cadence analysis
-   - Elevation/terrain impact
-5. **Fitness Grade**: Provide A-F grade with detailed justification
-6. **Specific Recommendations**: 3 actionable next steps
-
-Use the data to make specific, measurable observations."""
+    prompt = _PROMPTS['specific_activity']
+    
+    if zone_summary:
+        prompt = f"{prompt}\n\n{zone_summary}"
     
     print(f"\nAnalyzing activity {activity_id}...")
-    response = connector.send_dataframe_with_prompt(df, prompt, system_message)
+    # One activity row: summary statistics would only repeat it, so send none
+    response = connector.send_dataframe_with_prompt(df, prompt, system_message, precomputed_stats={})
     
     print("\n" + "="*80)
     print("GEMINI AI ANALYSIS:")
@@ -157,8 +196,7 @@ Use the data to make specific, measurable observations."""
     
     # Optionally save the response
     output_file = f"gemini_analysis_{activity_id}.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(response)
+    Path(output_file).write_text(response, encoding='utf-8')
     print(f"\nAnalysis saved to: {output_file}")
     
     return response
@@ -170,17 +208,14 @@ def example_custom_prompt():
     api_key = os.getenv('GEMINI_API_KEY') or 'ENTER-YOUR-GEMINI-API-KEY-HERE'
     connector = GeminiConnector(api_key)
     
-    # Your file path (relative to project root or absolute path)
-    file_path = os.path.join('..', 'strava_person_a_data_20250907_163239.csv')
+    # Your file path (see the data file constants at the top of this script)
+    file_path = PERSON_CSV_FILE
     
     # Your custom system message
-    system_message = "You are a data analyst specializing in fitness and health metrics."
+    system_message = _SYSTEM_MESSAGES['custom']
     
     # Your custom prompt
-    prompt = """Look at this data and tell me:
-    1. What patterns do you see?
-    2. Is this person improving over time?
-    3. What should they focus on next?"""
+    prompt = _PROMPTS['custom']
     
     response = connector.send_file_with_prompt(file_path, prompt, system_message)
     
@@ -204,14 +239,14 @@ def example_multi_turn_conversation():
         {"role": "user", "content": "I ran 10km in 55 minutes with average HR of 165. Is this good?"},
     ]
     
-    response1 = connector.create_conversation(messages)
+    response1 = connector.create_conversation(messages, conversation_id='coach')
     print("Assistant:", response1)
     
-    # Continue conversation
+    # Continue conversation (the session keeps the history; only the new message is sent)
     messages.append({"role": "assistant", "content": response1})
     messages.append({"role": "user", "content": "My max HR is 195. What zone was I in?"})
     
-    response2 = connector.create_conversation(messages)
+    response2 = connector.create_conversation(messages, conversation_id='coach')
     print("\nAssistant:", response2)
     
     return response2
@@ -227,24 +262,34 @@ def example_compare_with_chatgpt():
     except:
         has_chatgpt = False
     
-    # File path (relative to project root or absolute path)
-    csv_file = os.path.join('..', 'strava_details_data_20250907_193806.csv')
+    # File path (see the data file constants at the top of this script)
+    csv_file = DETAILS_CSV_FILE
     
     # Prompt
-    prompt = """Analyze this running activity and provide:
-    1. Activity summary
-    2. Fitness assessment (A-F grade)
-    3. Top 3 recommendations"""
+    prompt = _PROMPTS['compare']
+    
+    system_msg = _SYSTEM_MESSAGES['compare']
+    
+    # Format the file once and send the same prompt text to both models
+    csv_content = format_csv_as_prompt(csv_file, os.path.getmtime(csv_file))
+    full_prompt = f"{csv_content}\n\n{'='*50}\n\n{prompt}"
     
-    system_msg = "You are a sports scientist."
+    gemini_key = os.getenv('GEMINI_API_KEY') or 'ENTER-YOUR-GEMINI-API-KEY-HERE'
+    gemini = GeminiConnector(gemini_key)
+    
+    # The two requests are independent, so send them concurrently and wait for both
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        gemini_future = executor.submit(gemini.send_prompt, full_prompt, system_msg)
+        if has_chatgpt:
+            chatgpt_key = os.getenv('OPENAI_API_KEY') or 'ENTER-YOUR-OPENAI-API-KEY-HERE'
+            chatgpt = ChatGPTConnector(chatgpt_key)
+            chatgpt_future = executor.submit(chatgpt.send_prompt, full_prompt, system_msg)
     
     # Gemini Analysis
     print("=" * 80)
     print("GEMINI AI ANALYSIS:")
     print("=" * 80)
-    gemini_key = os.getenv('GEMINI_API_KEY') or 'ENTER-YOUR-GEMINI-API-KEY-HERE'
-    gemini = GeminiConnector(gemini_key)
-    gemini_response = gemini.send_file_with_prompt(csv_file, prompt, system_msg)
+    gemini_response = gemini_future.result()
     print(gemini_response)
     
     # ChatGPT Analysis (if available)
@@ -252,21 +297,21 @@ def example_compare_with_chatgpt():
         print("\n" + "=" * 80)
         print("CHATGPT ANALYSIS:")
         print("=" * 80)
-        chatgpt_key = os.getenv('OPENAI_API_KEY') or 'ENTER-YOUR-OPENAI-API-KEY-HERE'
-        chatgpt = ChatGPTConnector(chatgpt_key)
-        chatgpt_response = chatgpt.send_file_with_prompt(csv_file, prompt, system_msg)
+        chatgpt_response = chatgpt_future.result()
         print(chatgpt_response)
         
         # Save comparison
-        with open('ai_comparison.txt', 'w', encoding='utf-8') as f:
-            f.write("=" * 80 + "\n")
-            f.write("GEMINI AI ANALYSIS:\n")
-            f.write("=" * 80 + "\n")
-            f.write(gemini_response + "\n\n")
-            f.write("=" * 80 + "\n")
-            f.write("CHATGPT ANALYSIS:\n")
-            f.write("=" * 80 + "\n")
-            f.write(chatgpt_response + "\n")
+        comparison = "\n".join([
+            "=" * 80,
+            "GEMINI AI ANALYSIS:",
+            "=" * 80,
+            gemini_response + "\n",
+            "=" * 80,
+            "CHATGPT ANALYSIS:",
+            "=" * 80,
+            chatgpt_response + "\n",
+        ])
+        Path('ai_comparison.txt').write_text(comparison, encoding='utf-8')
         
         print("\n\nComparison saved to: ai_comparison.txt")
     
@@ -5,11 +5,15 @@ LLM connector package for ChatGPT, Gemini, and DeepSeek.
 from .chatgpt_connector import ChatGPTConnector, analyze_strava_activity, analyze_strava_dataframe
 from .gemini_connector import GeminiConnector
 from .deepseek_connector import DeepSeekConnector
+from ._format import compact_jsonl, format_csv_as_prompt, format_rows
 
 __all__ = [
     'ChatGPTConnector',
     'analyze_strava_activity',
     'analyze_strava_dataframe',
     'GeminiConnector',
-    'DeepSeekConnector'
+    'DeepSeekConnector',
+    'compact_jsonl',
+    'format_csv_as_prompt',
+    'format_rows'
 ]
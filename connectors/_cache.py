@@ -0,0 +1,65 @@
+"""
+On-disk cache of LLM responses.
+Responses are stored one file per request under LLM_CACHE_DIR, keyed by a hash of
+(model, system message, prompt), so re-running an example with the same data and
+prompt does not call the API again. Set LLM_CACHE=0 to disable the cache, and
+LLM_CACHE_TTL to a number of seconds to let cached responses expire.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from typing import Optional
+
+
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR') or '.llm_cache'
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL') or 0)  # seconds, 0 = never expire
+
+
+def cache_enabled() -> bool:
+    """Return False when caching is switched off with LLM_CACHE=0."""
+    return os.getenv('LLM_CACHE', '1') != '0'
+
+
+def response_cache_key(model: str, system_message: Optional[str], prompt: str) -> str:
+    """
+    Build the cache key of a request.
+
+    Args:
+        model: Model name
+        system_message: Optional system message
+        prompt: User prompt
+
+    Returns:
+        Hex digest identifying the request
+    """
+    digest = hashlib.sha256()
+    for part in (model, system_message or '', prompt):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[str]:
+    """Return the cached response for key, or None if there is none (or it has expired)."""
+    path = os.path.join(LLM_CACHE_DIR, key + '.txt')
+    try:
+        if LLM_CACHE_TTL and time.time() - os.path.getmtime(path) > LLM_CACHE_TTL:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def store_response(key: str, response: str):
+    """Store a response under key (written atomically; failures are reported, not raised)."""
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=LLM_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(response)
+        os.replace(tmp_path, os.path.join(LLM_CACHE_DIR, key + '.txt'))
+    except OSError as e:
+        print(f"Could not write response cache: {e}")
@@ -0,0 +1,41 @@
+"""
+Shared OpenAI-compatible clients for the connectors.
+Each OpenAI client owns an HTTP connection pool, so connectors that talk to the
+same endpoint with the same key reuse one client instead of opening new ones.
+"""
+
+import atexit
+from typing import Dict, Optional, Tuple
+from openai import OpenAI
+
+
+_CLIENT_CACHE: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+
+
+def get_openai_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """
+    Return the shared OpenAI client for (api_key, base_url), creating it on first use.
+
+    Args:
+        api_key: API key for the endpoint
+        base_url: Optional base URL of an OpenAI-compatible API (None = OpenAI)
+
+    Returns:
+        OpenAI client
+    """
+    key = (api_key, base_url)
+    client = _CLIENT_CACHE.get(key)
+    if client is None:
+        client = OpenAI(api_key=api_key, base_url=base_url)
+        _CLIENT_CACHE[key] = client
+    return client
+
+
+def _close_clients():
+    """Close all cached clients and their connection pools."""
+    for client in _CLIENT_CACHE.values():
+        client.close()
+    _CLIENT_CACHE.clear()
+
+
+atexit.register(_close_clients)
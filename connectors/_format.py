@@ -0,0 +1,505 @@
+"""
+Prompt formatting shared by the connectors.
+"""
+
+import json
+import os
+import warnings
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON serialization
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:  # optional: exact token counts for prompt trimming
+    tiktoken = None
+
+try:
+    import ijson
+except ImportError:  # optional: streamed previews of large JSON files
+    ijson = None
+
+
+# Context window sizes (tokens) of known models; others use DEFAULT_CONTEXT_TOKENS
+MODEL_CONTEXT_TOKENS = {
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 16385,
+}
+DEFAULT_CONTEXT_TOKENS = 128000
+
+# Tokens kept free for the response and message framing
+PROMPT_SAFETY_TOKENS = 1024
+
+# Rough characters-per-token ratio used when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+# JSON files above this size are previewed by streaming (needs ijson) instead of parsed whole
+JSON_STREAM_MIN_SIZE = 1 << 20
+JSON_PREVIEW_MAX_CHARS = 256 << 10
+
+# CSV files above this size are read in chunks for the summary statistics instead of whole;
+# quartiles are then computed on a uniform sample of CSV_QUANTILE_SAMPLE_ROWS rows
+CSV_STREAM_MIN_SIZE = 1 << 20
+CSV_STATS_CHUNK_ROWS = 50_000
+CSV_QUANTILE_SAMPLE_ROWS = 50_000
+
+TRUNCATION_NOTE = "\n\n[... content truncated to fit the model's context window ...]"
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Return the tiktoken encoding for a model (None without tiktoken)."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')  # non-OpenAI models: close enough
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count (or, without tiktoken, estimate) the tokens of text for a model."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def trim_to_context(content: str, model: str, *reserved_texts: Optional[str],
+                    context_tokens: Optional[int] = None) -> str:
+    """
+    Trim content so that it fits the model's context window together with the other prompt parts.
+    
+    Content that fits is returned unchanged; otherwise it is cut at a token
+    boundary and ends with TRUNCATION_NOTE.
+    
+    Args:
+        content: Text to trim (e.g. formatted file content)
+        model: Model name, used for the context size and tokenizer
+        reserved_texts: Other texts sent in the same request (prompt, system message)
+        context_tokens: Input token limit to fit (default: the model's MODEL_CONTEXT_TOKENS entry)
+    
+    Returns:
+        The content, trimmed if needed
+    """
+    if context_tokens is None:
+        context_tokens = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+    budget = context_tokens - PROMPT_SAFETY_TOKENS
+    budget -= sum(count_tokens(text, model) for text in reserved_texts if text)
+    budget -= count_tokens(TRUNCATION_NOTE, model)
+    if budget <= 0:
+        return TRUNCATION_NOTE.lstrip()
+    
+    encoding = _get_encoding(model)
+    if encoding is None:
+        max_chars = budget * CHARS_PER_TOKEN
+        if len(content) <= max_chars:
+            return content
+        return content[:max_chars] + TRUNCATION_NOTE
+    
+    tokens = encoding.encode(content, disallowed_special=())
+    if len(tokens) <= budget:
+        return content
+    return encoding.decode(tokens[:budget]) + TRUNCATION_NOTE
+
+
+def format_json_file(file_path: str) -> str:
+    """
+    Format a JSON file as prompt text.
+    
+    Small files are parsed and written whole (see format_json_data). Files above JSON_STREAM_MIN_SIZE
+    are streamed with ijson (when installed) into a preview of their leading
+    top-level entries, bounded by JSON_PREVIEW_MAX_CHARS.
+    
+    Args:
+        file_path: Path to the JSON file
+    
+    Returns:
+        Formatted file content
+    """
+    if ijson is not None and os.path.getsize(file_path) > JSON_STREAM_MIN_SIZE:
+        preview = _stream_json_preview(file_path, JSON_PREVIEW_MAX_CHARS)
+        return f"JSON File (preview of leading entries): {file_path}\n\n{preview}"
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        json_data = json.load(f)
+    return f"JSON File: {file_path}\n\n" + format_json_data(json_data)
+
+
+def _stream_json_preview(file_path: str, max_chars: int) -> str:
+    """Render the leading top-level entries of a JSON object/array until max_chars is reached."""
+    with open(file_path, 'rb') as f:
+        head = f.read(64).lstrip()
+        f.seek(0)
+        if head.startswith(b'{'):
+            opening, closing = '{', '}'
+            entries = (
+                f"{json.dumps(key)}:{dumps_json(value)}"
+                for key, value in ijson.kvitems(f, '', use_float=True)
+            )
+        elif head.startswith(b'['):
+            opening, closing = '[', ']'
+            entries = (
+                dumps_json(value)
+                for value in ijson.items(f, 'item', use_float=True)
+            )
+        else:
+            return f.read(max_chars).decode('utf-8', errors='replace')
+        
+        parts = []
+        size = 0
+        for entry in entries:
+            if size + len(entry) > max_chars:
+                parts.append('... (remaining entries omitted)')
+                break
+            parts.append(entry)
+            size += len(entry)
+    return opening + '\n' + ',\n'.join(parts) + '\n' + closing
+
+
+def dumps_json(data: Any) -> str:
+    """
+    Serialize data as compact JSON text for a prompt (no indentation or spaces).
+    
+    Uses orjson when it is installed and falls back to the standard library.
+    Values JSON cannot represent are converted with str() in both cases.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                data,
+                default=str,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            ).decode('utf-8')
+        except TypeError:
+            pass  # e.g. integers beyond 64 bit; the standard library handles these
+    return json.dumps(data, separators=(',', ':'), default=str, ensure_ascii=False)
+
+
+
+def _is_record_list(data: Any) -> bool:
+    """True for a non-empty list of flat dicts (no nested lists/dicts as values)."""
+    return (
+        isinstance(data, list) and bool(data)
+        and all(isinstance(item, dict) for item in data)
+        and not any(isinstance(value, (dict, list)) for item in data for value in item.values())
+    )
+
+
+def format_json_data(data: Any) -> str:
+    """
+    Format JSON-like data for a prompt.
+    
+    Lists of flat records are written as a header-once table (see encode_table),
+    which repeats no keys; everything else is compact JSON.
+    
+    Args:
+        data: Parsed JSON data (dict, list, ...)
+    
+    Returns:
+        Prompt text
+    """
+    if _is_record_list(data):
+        return encode_table(pd.DataFrame.from_records(data))
+    return dumps_json(data)
+
+
+
+def compact_jsonl(text: str) -> str:
+    """
+    Re-serialize JSONL text without the optional whitespace between tokens.
+    
+    Lines that are not valid JSON are kept unchanged, so the result is always
+    a faithful copy of the input data.
+    
+    Args:
+        text: JSONL content (one JSON value per line)
+    
+    Returns:
+        Compact JSONL content
+    """
+    lines = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            lines.append(line)
+            continue
+        lines.append(dumps_json(value))
+    return "\n".join(lines) + "\n"
+
+
+# Row labels of the summary table (same layout as DataFrame.describe())
+SUMMARY_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+# Table formats for DataFrames in prompts:
+# 'toon'   - header once, then one pipe-delimited line per row (compact, no padding)
+# 'string' - pandas' aligned to_string() tables
+TABLE_FORMATS = ('toon', 'string')
+
+
+def _format_cell(value: Any) -> str:
+    """Format one table cell for the 'toon' encoding (NaN/None as empty)."""
+    if value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and value != value):
+        return ''
+    if isinstance(value, (float, np.floating)):
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))  # ids and counts stored as float keep all digits
+        return format(value, '.6g')  # same precision as to_string()
+    return str(value).replace('|', '/').replace('\n', ' ')
+
+
+def encode_table(df: pd.DataFrame, index_name: Optional[str] = None) -> str:
+    """
+    Encode a DataFrame as a header line followed by pipe-delimited rows.
+    
+    Args:
+        df: DataFrame to encode
+        index_name: If given, the index is written as the first column under this name
+    
+    Returns:
+        Text such as "cols: a|b\n1|2\n3|4"
+    """
+    columns = [str(column) for column in df.columns]
+    if index_name is not None:
+        columns.insert(0, index_name)
+        rows = df.itertuples(index=True, name=None)
+    else:
+        rows = df.itertuples(index=False, name=None)
+    lines = ["cols: " + "|".join(columns)]
+    lines.extend("|".join(_format_cell(value) for value in row) for row in rows)
+    return "\n".join(lines)
+
+
+def format_rows(df: pd.DataFrame, table_format: str = 'toon') -> str:
+    """Format DataFrame rows (without index) as a prompt table in the given TABLE_FORMATS format."""
+    if table_format == 'string':
+        return df.to_string(index=False)
+    return encode_table(df)
+
+
+def _format_summary(summary: pd.DataFrame, table_format: str) -> str:
+    """Format a describe_numeric() table; 'toon' puts one statistic per line."""
+    if table_format == 'string':
+        return summary.to_string()
+    return encode_table(summary, index_name='stat')
+
+
+def format_stats(stats: Dict[str, Any], table_format: str = 'toon') -> str:
+    """
+    Format summary statistics supplied by the caller like the computed ones.
+    
+    Args:
+        stats: Either {column: {statistic: value}} or a flat {statistic: value}
+        table_format: Table format, one of TABLE_FORMATS
+    
+    Returns:
+        Statistics table text ('' if stats is empty)
+    """
+    if not stats:
+        return ''
+    if all(isinstance(value, dict) for value in stats.values()):
+        return _format_summary(pd.DataFrame(stats), table_format)
+    return format_rows(pd.DataFrame([stats]), table_format)
+
+
+def describe_numeric(df: pd.DataFrame, numeric_cols: List[str]) -> pd.DataFrame:
+    """
+    Summary statistics of the numeric columns, equivalent to df[numeric_cols].describe().
+    
+    All columns are reduced together on one float64 array (NaN-aware), instead of
+    pandas' per-column aggregation; the numeric columns are selected once by the caller.
+    
+    Args:
+        df: DataFrame to summarize
+        numeric_cols: Names of the numeric columns
+    
+    Returns:
+        DataFrame with the SUMMARY_INDEX rows and one column per numeric column
+    """
+    values = df[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan, copy=False)
+    with warnings.catch_warnings():
+        # All-NaN (or single-value) columns yield NaN statistics, like describe()
+        warnings.simplefilter('ignore', RuntimeWarning)
+        # One NaN mask shared by count, mean and std (nanmean/nanstd would each rebuild it)
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        deviations = np.where(valid, values, 0.0)
+        mean = deviations.sum(axis=0) / count
+        deviations -= mean
+        deviations[~valid] = 0.0
+        std = np.sqrt(np.einsum('ij,ij->j', deviations, deviations) / (count - 1))
+        std[count < 2] = np.nan
+        quantiles = np.nanpercentile(values, [0, 25, 50, 75, 100], axis=0)
+    stats = np.vstack([count, mean, std, quantiles])
+    return pd.DataFrame(stats, index=SUMMARY_INDEX, columns=numeric_cols)
+
+
+# Summary tables of recently summarized DataFrames, keyed by
+# (table_format, numeric column names, row count, content fingerprint)
+_SUMMARY_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_SUMMARY_CACHE_SIZE = 8
+
+
+def summarize_numeric(df: pd.DataFrame, table_format: str = 'toon') -> str:
+    """
+    Summary statistics table of the numeric columns as text ('' if there are none).
+    
+    The text is memoized by a hash of the numeric columns' contents (cheaper
+    than computing the statistics), so sending the same data to several models
+    or retrying a call does not recompute it, while a DataFrame modified in
+    place gets a new summary.
+    
+    Args:
+        df: DataFrame to summarize
+        table_format: Table format, one of TABLE_FORMATS
+    
+    Returns:
+        Summary table text
+    """
+    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    if not numeric_cols:
+        return ''
+    
+    fingerprint = int(pd.util.hash_pandas_object(df[numeric_cols], index=False).sum())
+    key = (table_format, tuple(numeric_cols), len(df), fingerprint)
+    summary = _SUMMARY_CACHE.get(key)
+    if summary is None:
+        summary = _format_summary(describe_numeric(df, numeric_cols), table_format)
+        _SUMMARY_CACHE[key] = summary
+        while len(_SUMMARY_CACHE) > _SUMMARY_CACHE_SIZE:
+            _SUMMARY_CACHE.popitem(last=False)
+    _SUMMARY_CACHE.move_to_end(key)
+    return summary
+
+
+def _describe_csv_chunks(file_path: str, numeric_cols: List[str]) -> tuple:
+    """
+    Row count and describe_numeric()-style statistics of a CSV file, read in chunks.
+    
+    Count, mean, std, min and max are exact (chunk results are merged with the
+    parallel variance formula); quartiles come from a uniform row sample of at
+    most CSV_QUANTILE_SAMPLE_ROWS rows, so they are exact for smaller files.
+    
+    Args:
+        file_path: Path to the CSV file
+        numeric_cols: Names of the numeric columns
+    
+    Returns:
+        Tuple (number of rows, statistics DataFrame or None if there are no numeric columns)
+    """
+    n_cols = len(numeric_cols)
+    count = np.zeros(n_cols)
+    mean = np.zeros(n_cols)
+    m2 = np.zeros(n_cols)
+    col_min = np.full(n_cols, np.inf)
+    col_max = np.full(n_cols, -np.inf)
+    sample, sample_keys = None, None
+    rng = np.random.default_rng(0)
+    n_rows = 0
+    
+    for chunk in pd.read_csv(file_path, usecols=numeric_cols or [0], chunksize=CSV_STATS_CHUNK_ROWS):
+        n_rows += len(chunk)
+        if not numeric_cols:
+            continue
+        values = chunk[numeric_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            chunk_count = np.sum(~np.isnan(values), axis=0)
+            chunk_mean = np.nan_to_num(np.nanmean(values, axis=0))
+            chunk_m2 = np.nansum((values - chunk_mean) ** 2, axis=0)
+        total = count + chunk_count
+        delta = np.where(chunk_count > 0, chunk_mean - mean, 0.0)
+        weight = chunk_count / np.maximum(total, 1)
+        mean = mean + delta * weight
+        m2 = m2 + chunk_m2 + delta ** 2 * count * weight
+        count = total
+        col_min = np.fmin(col_min, np.fmin.reduce(values, axis=0))
+        col_max = np.fmax(col_max, np.fmax.reduce(values, axis=0))
+        
+        # Bottom-k sampling: keep the rows with the smallest random keys
+        keys = rng.random(len(values))
+        if sample is None:
+            sample, sample_keys = values, keys
+        else:
+            sample = np.concatenate([sample, values])
+            sample_keys = np.concatenate([sample_keys, keys])
+        if len(sample) > CSV_QUANTILE_SAMPLE_ROWS:
+            keep = np.argpartition(sample_keys, CSV_QUANTILE_SAMPLE_ROWS)[:CSV_QUANTILE_SAMPLE_ROWS]
+            sample, sample_keys = sample[keep], sample_keys[keep]
+    
+    if not numeric_cols or sample is None:
+        return n_rows, None
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        std = np.sqrt(m2 / (count - 1))
+        quartiles = np.nanpercentile(sample, [25, 50, 75], axis=0)
+    empty = count == 0
+    mean[empty] = np.nan
+    std[count < 2] = np.nan
+    col_min[empty] = np.nan
+    col_max[empty] = np.nan
+    stats = np.vstack([count, mean, std, col_min, quartiles, col_max])
+    return n_rows, pd.DataFrame(stats, index=SUMMARY_INDEX, columns=numeric_cols)
+
+
+@lru_cache(maxsize=32)
+def format_csv_as_prompt(file_path: str, mtime: float, table_format: str = 'toon') -> str:
+    """
+    Format a CSV file as prompt text (shape, columns, first rows, summary statistics).
+    
+    Cached per (file_path, mtime, table_format), so the same unchanged file is parsed
+    and formatted once no matter how many connectors or prompts it is sent with.
+    Files above CSV_STREAM_MIN_SIZE are never loaded whole: the preview reads the
+    first rows only and the statistics are computed chunk by chunk.
+    
+    Args:
+        file_path: Path to the CSV file
+        mtime: Modification time of the file (os.path.getmtime), used as cache key
+        table_format: Table format, one of TABLE_FORMATS
+    
+    Returns:
+        Formatted file content
+    """
+    if os.path.getsize(file_path) < CSV_STREAM_MIN_SIZE:
+        df = pd.read_csv(file_path)
+        head = df.head(10)
+        n_rows = len(df)
+        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        summary = describe_numeric(df, numeric_cols) if numeric_cols else None
+        quartiles_sampled = False
+    else:
+        head = pd.read_csv(file_path, nrows=10)
+        numeric_cols = head.select_dtypes(include=['number']).columns.tolist()
+        n_rows, summary = _describe_csv_chunks(file_path, numeric_cols)
+        # _describe_csv_chunks only samples rows for the quartiles beyond this size
+        quartiles_sampled = n_rows > CSV_QUANTILE_SAMPLE_ROWS
+    
+    parts = [
+        f"CSV File: {file_path}\n\n",
+        f"Shape: {n_rows} rows, {head.shape[1]} columns\n\n",
+        f"Columns: {', '.join(head.columns.tolist())}\n\n",
+        "First 10 rows:\n",
+        format_rows(head, table_format),
+    ]
+    
+    # Add summary statistics if numeric columns exist
+    if summary is not None:
+        parts.append("\n\nSummary Statistics:\n")
+        if quartiles_sampled:
+            parts.append(f"(quartiles estimated from a sample of {CSV_QUANTILE_SAMPLE_ROWS} rows)\n")
+        parts.append(_format_summary(summary, table_format))
+    return ''.join(parts)
@@ -5,21 +5,27 @@ and receive responses.
 """
 
 import os
-from typing import Optional, List, Dict, Any
-from openai import OpenAI
+from typing import Optional, List, Dict, Any, Iterator
 import pandas as pd
-import json
+from ._cache import cache_enabled, response_cache_key, get_cached_response, store_response
+from ._clients import get_openai_client
+from ._format import compact_jsonl, format_csv_as_prompt, format_rows, format_json_file, format_stats, summarize_numeric, format_json_data, trim_to_context
+
+
+# Default model: fast and inexpensive, sufficient for summaries and explanations
+DEFAULT_MODEL = "gpt-4o-mini"
 
 
 class ChatGPTConnector:
     """Class to handle interactions with ChatGPT API."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
         """
         Initialize ChatGPT connector.
         
         Args:
             api_key: OpenAI API key. If not provided, will try to get from environment variable OPENAI_API_KEY
+            model: Model name. If not provided, uses OPENAI_MODEL or DEFAULT_MODEL
         """
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
         
@@ -28,20 +34,33 @@ class ChatGPTConnector:
                 "OpenAI API key is required. Either pass it as an argument or set OPENAI_API_KEY environment variable."
             )
         
-        self.client = OpenAI(api_key=self.api_key)
-        self.model = "gpt-4o"  # Can be changed to gpt-4o-mini, gpt-4-turbo, etc.
+        self.client = get_openai_client(self.api_key)
+        self.model = model or os.getenv('OPENAI_MODEL') or DEFAULT_MODEL  # e.g. gpt-4o for deeper analyses
     
-    def send_prompt(self, prompt: str, system_message: Optional[str] = None) -> str:
+    def send_prompt(self, prompt: str, system_message: Optional[str] = None,
+                    no_cache: bool = False) -> str:
         """
         Send a simple text prompt to ChatGPT.
         
+        Responses are cached on disk per (model, system message, prompt); a repeated
+        request is answered from the cache unless no_cache is set.
+        
         Args:
             prompt: The user prompt to send
             system_message: Optional system message to set context
+            no_cache: If True, always call the API (the new response is still cached)
         
         Returns:
             ChatGPT's response as a string
         """
+        use_cache = cache_enabled()
+        if use_cache:
+            cache_key = response_cache_key(self.model, system_message, prompt)
+            if not no_cache:
+                cached = get_cached_response(cache_key)
+                if cached is not None:
+                    return cached
+        
         messages = []
         
         if system_message:
@@ -55,14 +74,51 @@ class ChatGPTConnector:
                 messages=messages
             )
             
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if use_cache and content is not None:
+                store_response(cache_key, content)
+            return content
             
         except Exception as e:
             print(f"Error sending prompt to ChatGPT: {e}")
             return None
     
+    def stream_prompt(self, prompt: str, system_message: Optional[str] = None) -> Iterator[str]:
+        """
+        Send a text prompt to ChatGPT and yield the response as it is generated.
+        
+        Args:
+            prompt: The user prompt to send
+            system_message: Optional system message to set context
+        
+        Yields:
+            Chunks of ChatGPT's response text
+        """
+        messages = []
+        
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        
+        messages.append({"role": "user", "content": prompt})
+        
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=True
+            )
+            
+            for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ''
+            
+        except Exception as e:
+            print(f"Error streaming prompt to ChatGPT: {e}")
+    
     def send_file_with_prompt(self, file_path: str, prompt: str, 
-                             system_message: Optional[str] = None) -> str:
+                             system_message: Optional[str] = None,
+                             table_format: str = 'toon',
+                             compact: bool = True) -> str:
         """
         Send a file along with a prompt to ChatGPT.
         Reads the file content and includes it in the prompt.
@@ -71,6 +127,9 @@ class ChatGPTConnector:
             file_path: Path to the file to send
             prompt: The prompt/question about the file
             system_message: Optional system message to set context
+            table_format: How CSV tables are written: 'toon' (header once, pipe-delimited rows)
+                          or 'string' (aligned pandas tables)
+            compact: If True, .jsonl files are sent without insignificant JSON whitespace
         
         Returns:
             ChatGPT's response as a string
@@ -79,30 +138,21 @@ class ChatGPTConnector:
             # Read file content based on file type
             if file_path.endswith('.csv'):
                 # For CSV files, read and convert to a formatted string
-                df = pd.read_csv(file_path)
-                file_content = f"CSV File: {file_path}\n\n"
-                file_content += f"Shape: {df.shape[0]} rows, {df.shape[1]} columns\n\n"
-                file_content += f"Columns: {', '.join(df.columns.tolist())}\n\n"
-                file_content += "First 10 rows:\n"
-                file_content += df.head(10).to_string(index=False)
-                
-                # Add summary statistics if numeric columns exist
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                if numeric_cols:
-                    file_content += "\n\nSummary Statistics:\n"
-                    file_content += df[numeric_cols].describe().to_string()
+                file_content = format_csv_as_prompt(file_path, os.path.getmtime(file_path), table_format)
             
             elif file_path.endswith('.json'):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                    file_content = f"JSON File: {file_path}\n\n"
-                    file_content += json.dumps(json_data, indent=2)
+                file_content = format_json_file(file_path)
             
             else:
                 # For other text files, read as plain text
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    file_content = f"File: {file_path}\n\n"
-                    file_content += f.read()
+                    text = f.read()
+                if compact and file_path.endswith('.jsonl'):
+                    text = compact_jsonl(text)
+                file_content = f"File: {file_path}\n\n{text}"
+            
+            # Keep the file content within the model's context window
+            file_content = trim_to_context(file_content, self.model, prompt, system_message)
             
             # Combine file content with prompt
             full_prompt = f"{file_content}\n\n{'='*50}\n\n{prompt}"
@@ -114,9 +164,55 @@ class ChatGPTConnector:
             print(f"Error reading or sending file: {e}")
             return None
     
+    def format_dataframe_prompt(self, df: pd.DataFrame, prompt: str,
+                                include_full_data: bool = False,
+                                table_format: str = 'toon',
+                                precomputed_stats: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the prompt text for a DataFrame (shape, columns, rows, summary statistics).
+        
+        Args:
+            df: The pandas DataFrame to describe
+            prompt: The prompt/question about the data
+            include_full_data: If True, includes entire DataFrame. If False, summary + first 10 rows
+            table_format: How tables are written: 'toon' (header once, pipe-delimited rows)
+                          or 'string' (aligned pandas tables)
+            precomputed_stats: Summary statistics to send instead of computing them from df,
+                               {column: {statistic: value}} or {statistic: value} ({} = none)
+        
+        Returns:
+            The full prompt text
+        """
+        # Format DataFrame information (parts are joined once at the end)
+        parts = [
+            "DataFrame Information:\n\n",
+            f"Shape: {df.shape[0]} rows, {df.shape[1]} columns\n\n",
+            f"Columns: {', '.join(map(str, df.columns))}\n\n",
+        ]
+        
+        if include_full_data:
+            # CSV rather than to_string: no column-width alignment pass over every cell
+            parts += ["Full Data (CSV):\n", df.to_csv(index=False)]
+        else:
+            parts += ["First 10 rows:\n", format_rows(df.head(10), table_format)]
+        
+        # Add summary statistics (the caller's, or computed if numeric columns exist)
+        if precomputed_stats is None:
+            summary = summarize_numeric(df, table_format)
+        else:
+            summary = format_stats(precomputed_stats, table_format)
+        if summary:
+            parts += ["\n\nSummary Statistics:\n", summary]
+        
+        # Combine data with prompt
+        parts += ["\n\n", '=' * 50, "\n\n", prompt]
+        return ''.join(parts)
+    
     def send_dataframe_with_prompt(self, df: pd.DataFrame, prompt: str,
                                    system_message: Optional[str] = None,
-                                   include_full_data: bool = False) -> str:
+                                   include_full_data: bool = False,
+                                   table_format: str = 'toon',
+                                   precomputed_stats: Optional[Dict[str, Any]] = None) -> str:
         """
         Send a pandas DataFrame along with a prompt to ChatGPT.
         
@@ -125,31 +221,17 @@ class ChatGPTConnector:
             prompt: The prompt/question about the data
             system_message: Optional system message to set context
             include_full_data: If True, sends entire DataFrame. If False, sends summary + first 10 rows
+            table_format: How tables are written: 'toon' (header once, pipe-delimited rows)
+                          or 'string' (aligned pandas tables)
+            precomputed_stats: Summary statistics to send instead of computing them from df,
+                               {column: {statistic: value}} or {statistic: value} ({} = none)
         
         Returns:
             ChatGPT's response as a string
         """
         try:
-            # Format DataFrame information
-            data_content = f"DataFrame Information:\n\n"
-            data_content += f"Shape: {df.shape[0]} rows, {df.shape[1]} columns\n\n"
-            data_content += f"Columns: {', '.join(df.columns.tolist())}\n\n"
-            
-            if include_full_data:
-                data_content += "Full Data:\n"
-                data_content += df.to_string(index=False)
-            else:
-                data_content += "First 10 rows:\n"
-                data_content += df.head(10).to_string(index=False)
-            
-            # Add summary statistics if numeric columns exist
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            if numeric_cols:
-                data_content += "\n\nSummary Statistics:\n"
-                data_content += df[numeric_cols].describe().to_string()
-            
-            # Combine data with prompt
-            full_prompt = f"{data_content}\n\n{'='*50}\n\n{prompt}"
+            full_prompt = self.format_dataframe_prompt(df, prompt, include_full_data, table_format,
+                                                       precomputed_stats)
             
             # Send to ChatGPT
             return self.send_prompt(full_prompt, system_message)
@@ -172,12 +254,8 @@ class ChatGPTConnector:
             ChatGPT's response as a string
         """
         try:
-            # Format dictionary as JSON
-            data_content = "Data:\n\n"
-            data_content += json.dumps(data, indent=2, default=str)
-            
-            # Combine data with prompt
-            full_prompt = f"{data_content}\n\n{'='*50}\n\n{prompt}"
+            # Format dictionary as JSON and combine it with the prompt
+            full_prompt = f"Data:\n\n{format_json_data(data)}\n\n{'='*50}\n\n{prompt}"
             
             # Send to ChatGPT
             return self.send_prompt(full_prompt, system_message)
@@ -225,6 +303,38 @@ class ChatGPTConnector:
             return None
 
 
+# System messages and prompts of the example functions, built once at import
+_SYSTEM_MESSAGES = {
+    'activity': """You are a sports scientist and running coach expert. 
+    Analyze the provided Strava activity data and provide insights about the athlete's fitness, 
+    performance, and training recommendations.""",
+    'dataframe': """You are a sports scientist and data analyst. 
+    Analyze the provided activity data and provide insights about training patterns and performance."""
+}
+
+_PROMPTS = {
+    'activity': """Please analyze this Strava running activity data and provide:
+
+1. **Activity Summary**: Key metrics (distance, time, pace, elevation, heart rate if available)
+2. **Performance Assessment**: Evaluate the athlete's performance level
+3. **Aerobic Efficiency**: Analyze the relationship between pace and heart rate
+4. **Intensity Analysis**: Estimate time spent in different heart rate zones
+5. **Fitness Level**: Provide a fitness grade (A-F) with justification
+6. **Recommendations**: Provide 3 specific training recommendations for improvement
+
+Please be specific, data-driven, and provide actionable insights.""",
+    'dataframe': """Please analyze this activity data and provide:
+
+1. **Training Volume**: Total activities, distance, and time
+2. **Training Consistency**: Pattern analysis and frequency
+3. **Performance Trends**: Any improvements or changes over time
+4. **Key Insights**: Notable patterns or observations
+5. **Recommendations**: Suggestions for training optimization
+
+Be specific and data-driven in your analysis."""
+}
+
+
 # Example usage functions
 def analyze_strava_activity(file_path: str, api_key: Optional[str] = None) -> str:
     """
@@ -239,22 +349,7 @@ def analyze_strava_activity(file_path: str, api_key: Optional[str] = None) -> st
     """
     connector = ChatGPTConnector(api_key)
     
-    system_message = """You are a sports scientist and running coach expert. 
-    Analyze the provided Strava activity data and provide insights about the athlete's fitness, 
-    performance, and training recommendations."""
-    
-    prompt = """Please analyze this Strava running activity data and provide:
-
-1. **Activity Summary**: Key metrics (distance, time, pace, elevation, heart rate if available)
-2. **Performance Assessment**: Evaluate the athlete's performance level
-3. **Aerobic Efficiency**: Analyze the relationship between pace and heart rate
-4. **Intensity Analysis**: Estimate time spent in different heart rate zones
-5. **Fitness Level**: Provide a fitness grade (A-F) with justification
-6. **Recommendations**: Provide 3 specific training recommendations for improvement
-
-Please be specific, data-driven, and provide actionable insights."""
-    
-    response = connector.send_file_with_prompt(file_path, prompt, system_message)
+    response = connector.send_file_with_prompt(file_path, _PROMPTS['activity'], _SYSTEM_MESSAGES['activity'])
     return response
 
 
@@ -271,20 +366,7 @@ def analyze_strava_dataframe(df: pd.DataFrame, api_key: Optional[str] = None) ->
     """
     connector = ChatGPTConnector(api_key)
     
-    system_message = """You are a sports scientist and data analyst. 
-    Analyze the provided activity data and provide insights about training patterns and performance."""
-    
-    prompt = """Please analyze this activity data and provide:
-
-1. **Training Volume**: Total activities, distance, and time
-2. **Training Consistency**: Pattern analysis and frequency
-3. **Performance Trends**: Any improvements or changes over time
-4. **Key Insights**: Notable patterns or observations
-5. **Recommendations**: Suggestions for training optimization
-
-Be specific and data-driven in your analysis."""
-    
-    response = connector.send_dataframe_with_prompt(df, prompt, system_message)
+    response = connector.send_dataframe_with_prompt(df, _PROMPTS['dataframe'], _SYSTEM_MESSAGES['dataframe'])
     return response
 
 
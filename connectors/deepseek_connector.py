@@ -4,9 +4,20 @@ A Python class to interact with DeepSeek LLM API similarly to ChatGPTConnector.
 """
 
 import os
-import json
-from typing import Optional, List, Dict
-from openai import OpenAI
+import mmap
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Iterator
+from openai.types.chat import ChatCompletion
+from ._cache import cache_enabled, response_cache_key, get_cached_response, store_response
+from ._clients import get_openai_client
+from ._format import compact_jsonl, format_rows, format_stats, summarize_numeric, format_json_data, trim_to_context
+
+
+DEFAULT_MODEL = 'deepseek-v31-4bit'
+
+# Files smaller than this are read directly; mapping them costs more than it saves
+MMAP_MIN_SIZE = 64 * 1024
 
 
 class DeepSeekConnector:
@@ -18,24 +29,32 @@ class DeepSeekConnector:
             raise ValueError("DeepSeek API key is required. Set DEEPSEEK_API_KEY or pass api_key explicitly.")
 
         self.base_url = base_url or os.getenv('DEEPSEEK_BASE_URL') or 'https://llms.innkube.fim.uni-passau.de'
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.client = get_openai_client(self.api_key, self.base_url)
 
     # ------------------------------------------------------------------
     # Internal helper for POST requests
     # ------------------------------------------------------------------
-    def _post(self, payload: Dict) -> Dict:
-        response = self.client.chat.completions.create(
-            model=payload.get('model', 'deepseek-v31-4bit'),
+    def _post(self, payload: Dict) -> ChatCompletion:
+        return self.client.chat.completions.create(
+            model=payload.get('model', DEFAULT_MODEL),
             messages=payload['messages'],
             stream=payload.get('stream', False),
             temperature=payload.get('temperature', 0.7)
         )
-        return response.model_dump()
 
     # ------------------------------------------------------------------
     # Simple prompt
     # ------------------------------------------------------------------
-    def send_prompt(self, prompt: str, system_message: Optional[str] = None) -> str:
+    def send_prompt(self, prompt: str, system_message: Optional[str] = None, no_cache: bool = False) -> str:
+        # Answer repeated requests from the on-disk cache (no_cache forces an API call)
+        use_cache = cache_enabled()
+        if use_cache:
+            cache_key = response_cache_key(f"{self.base_url}|{DEFAULT_MODEL}", system_message, prompt)
+            if not no_cache:
+                cached = get_cached_response(cache_key)
+                if cached is not None:
+                    return cached
+
         messages: List[Dict[str, str]] = []
         if system_message:
             messages.append({"role": "system", "content": system_message})
@@ -46,19 +65,63 @@ class DeepSeekConnector:
             "stream": False
         }
 
-        data = self._post(payload)
-        return data.get('choices', [{}])[0].get('message', {}).get('content', '')
+        response = self._post(payload)
+        content = response.choices[0].message.content or ''
+        if use_cache:
+            store_response(cache_key, content)
+        return content
+
+    # ------------------------------------------------------------------
+    # Streamed prompt (yields the response as it is generated)
+    # ------------------------------------------------------------------
+    def stream_prompt(self, prompt: str, system_message: Optional[str] = None) -> Iterator[str]:
+        messages: List[Dict[str, str]] = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        messages.append({"role": "user", "content": prompt})
+
+        payload = {
+            "messages": messages,
+            "stream": True
+        }
+
+        for chunk in self._post(payload):
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ''
+
+    # ------------------------------------------------------------------
+    # Several independent prompts, sent concurrently
+    # ------------------------------------------------------------------
+    def send_prompts_batch(self, prompts: List[str], system_message: Optional[str] = None,
+                           max_workers: int = 4) -> List[str]:
+        """Send independent prompts in parallel and return the responses in prompt order."""
+        if not prompts:
+            return []
+        # The shared client is thread-safe, so the requests overlap their network round-trips
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as executor:
+            return list(executor.map(lambda prompt: self.send_prompt(prompt, system_message), prompts))
 
     # ------------------------------------------------------------------
     # Prompt with file (simulate by embedding file content)
     # ------------------------------------------------------------------
-    def send_file_with_prompt(self, file_path: str, prompt: str, system_message: Optional[str] = None) -> str:
+    def send_file_with_prompt(self, file_path: str, prompt: str, system_message: Optional[str] = None,
+                              compact: bool = True) -> str:
+        # compact: send .jsonl files without insignificant JSON whitespace
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                file_content = f.read()
+            with open(file_path, 'rb') as f:
+                if os.path.getsize(file_path) < MMAP_MIN_SIZE:
+                    file_content = f.read().decode('utf-8')
+                else:
+                    # Map large files and decode from the mapping itself, without copying it
+                    # into an intermediate bytes object first
+                    with contextlib.closing(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) as mm:
+                        file_content = str(mm, 'utf-8')
         except Exception as exc:
             return f"Error reading file: {exc}"
 
+        if compact and file_path.endswith('.jsonl'):
+            file_content = compact_jsonl(file_content)
+        file_content = trim_to_context(file_content, DEFAULT_MODEL, prompt, system_message)
         combined_prompt = f"File: {file_path}\n\n{file_content}\n\n{'='*60}\n\n{prompt}"
         return self.send_prompt(combined_prompt, system_message)
 
@@ -66,20 +129,27 @@ class DeepSeekConnector:
     # Prompt with pandas DataFrame
     # ------------------------------------------------------------------
     def send_dataframe_with_prompt(self, df, prompt: str, system_message: Optional[str] = None,
-                                   include_full_data: bool = False) -> str:
+                                   include_full_data: bool = False, table_format: str = 'toon',
+                                   precomputed_stats: Optional[Dict] = None) -> str:
+        # table_format: 'toon' (header once, pipe-delimited rows) or 'string' (aligned pandas tables)
+        # precomputed_stats: statistics to send instead of computing them from df ({} = none)
         info = [
             f"Shape: {df.shape[0]} rows, {df.shape[1]} columns",
-            f"Columns: {', '.join(df.columns)}",
+            f"Columns: {', '.join(map(str, df.columns))}",
         ]
 
         if include_full_data:
-            info.append("\nFull Data:\n" + df.to_string(index=False))
+            # CSV rather than to_string: no column-width alignment pass over every cell
+            info.append("\nFull Data (CSV):\n" + df.to_csv(index=False))
         else:
-            info.append("\nFirst 10 rows:\n" + df.head(10).to_string(index=False))
+            info.append("\nFirst 10 rows:\n" + format_rows(df.head(10), table_format))
 
-        numeric_cols = df.select_dtypes(include=['number']).columns
-        if len(numeric_cols) > 0:
-            info.append("\nSummary Statistics:\n" + df[numeric_cols].describe().to_string())
+        if precomputed_stats is None:
+            summary = summarize_numeric(df, table_format)
+        else:
+            summary = format_stats(precomputed_stats, table_format)
+        if summary:
+            info.append("\nSummary Statistics:\n" + summary)
 
         combined_prompt = "\n\n".join(info) + "\n\n" + ('=' * 60) + "\n\n" + prompt
         return self.send_prompt(combined_prompt, system_message)
@@ -88,7 +158,7 @@ class DeepSeekConnector:
     # Prompt with dictionary
     # ------------------------------------------------------------------
     def send_dict_with_prompt(self, data: Dict, prompt: str, system_message: Optional[str] = None) -> str:
-        data_json = json.dumps(data, indent=2, default=str)
+        data_json = format_json_data(data)
         combined_prompt = f"Data:\n{data_json}\n\n{'='*60}\n\n{prompt}"
         return self.send_prompt(combined_prompt, system_message)
 
@@ -100,5 +170,5 @@ class DeepSeekConnector:
             "messages": messages,
             "stream": False
         }
-        data = self._post(payload)
-        return data.get('choices', [{}])[0].get('message', {}).get('content', '')
+        response = self._post(payload)
+        return response.choices[0].message.content or ''
@@ -5,21 +5,97 @@ and receive responses.
 """
 
 import os
+import datetime
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Optional, List, Dict, Any
 import google.generativeai as genai
 import pandas as pd
-import json
+
+try:
+    from google.api_core.exceptions import DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable
+    # Transient API errors (429 / 500 / 503 / 504) that are worth retrying
+    RETRYABLE_ERRORS = (ResourceExhausted, InternalServerError, ServiceUnavailable, DeadlineExceeded)
+except ImportError:  # google-api-core ships with google-generativeai; guard for minimal installs
+    RETRYABLE_ERRORS = ()
+from ._cache import cache_enabled, response_cache_key, get_cached_response, store_response
+from ._format import compact_jsonl, format_csv_as_prompt, format_rows, format_json_file, format_stats, summarize_numeric, format_json_data, count_tokens, trim_to_context
+
+
+# Smallest system message worth uploading as explicit cached content (the API rejects smaller caches)
+CONTEXT_CACHE_MIN_TOKENS = 2048
+
+# Files at least this large are uploaded with the Files API instead of being inlined in the prompt
+FILE_UPLOAD_MIN_SIZE = 1_000_000
+FILE_PROCESSING_POLL_SECONDS = 2
+UPLOAD_MIME_TYPES = {'.csv': 'text/csv', '.json': 'application/json'}
+
+# Section marker that send_multi asks the model to put before each answer
+TASK_MARKER = "===TASK {}==="
+_TASK_MARKER_RE = re.compile(r'^\s*===TASK (\d+)===\s*$', re.MULTILINE)
+
+# Retries of transient errors (RETRYABLE_ERRORS), with capped exponential backoff and jitter
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 30.0  # seconds
+
+
+logger = logging.getLogger(__name__)
+
+
+# API key genai is currently configured with (genai.configure sets process-wide state)
+_configured_api_key: Optional[str] = None
+
+
+def _configure(api_key: str):
+    """Configure genai with api_key unless it already is."""
+    global _configured_api_key
+    if api_key != _configured_api_key:
+        genai.configure(api_key=api_key)
+        _configured_api_key = api_key
+
+
+@lru_cache(maxsize=8)
+def _get_model(model_name: str, api_key: str):
+    """Shared GenerativeModel per (model, API key); the key only separates models built under different keys."""
+    return genai.GenerativeModel(model_name)
+
+
+class _RateLimiter:
+    """Spaces requests evenly to stay under a requests-per-minute limit (thread-safe)."""
+    
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until the next request may be sent."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
 
 
 class GeminiConnector:
     """Class to handle interactions with Google Gemini API."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, requests_per_minute: int = 60,
+                 max_input_tokens: int = 900_000):
         """
         Initialize Gemini connector.
         
         Args:
             api_key: Google API key. If not provided, will try to get from environment variable GEMINI_API_KEY
+            requests_per_minute: Request rate limit of the API key (default: 60)
+            max_input_tokens: Largest prompt (in tokens, estimated locally) that is sent to the API
         """
         self.api_key = api_key or os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
         
@@ -28,46 +104,258 @@ class GeminiConnector:
                 "Gemini API key is required. Either pass it as an argument or set GEMINI_API_KEY environment variable."
             )
         
-        genai.configure(api_key=self.api_key)
+        _configure(self.api_key)
         self.model_name = "gemini-1.5-flash"  # Can be changed to gemini-1.5-pro, gemini-1.0-pro, etc.
-        self.model = genai.GenerativeModel(self.model_name)
+        self.model = _get_model(self.model_name, self.api_key)
+        # Explicit context caches created by create_cached_system, by cache name
+        self._cached_models: Dict[str, Any] = {}
+        self._cached_system_messages: Dict[str, str] = {}
+        self._rate_limiter = _RateLimiter(requests_per_minute)
+        self.max_input_tokens = max_input_tokens
+        # Chat sessions kept by create_conversation, by conversation id
+        self._chats: Dict[str, Any] = {}
+        # Files uploaded with the Files API, by (path, mtime, size)
+        self._uploaded_files: Dict[tuple, Any] = {}
+    
+    def _call_with_retries(self, request, *args):
+        """Call request(*args) within the rate limit, retrying transient API errors with backoff."""
+        for attempt in range(MAX_RETRIES + 1):
+            self._rate_limiter.acquire()
+            try:
+                return request(*args)
+            except RETRYABLE_ERRORS as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY)
+                delay += random.uniform(0, delay)
+                logger.warning("Gemini request failed (%s: %s); retry %d of %d in %.1f s",
+                               type(e).__name__, e, attempt + 1, MAX_RETRIES, delay)
+                time.sleep(delay)
+    
+    def _generate(self, model, full_prompt):
+        """Call generate_content within the rate limit, retrying transient errors."""
+        return self._call_with_retries(model.generate_content, full_prompt)
+    
+    def create_cached_system(self, system_message: str, ttl_seconds: int = 3600) -> Optional[str]:
+        """
+        Upload a long system message once as Gemini cached content.
+        
+        Pass the returned name as cached_content to send_prompt/send_file_with_prompt
+        so later calls reference the cached prefix instead of re-sending it.
+        
+        Args:
+            system_message: System message to cache
+            ttl_seconds: How long Gemini keeps the cache (default: 1 hour)
+        
+        Returns:
+            Name of the cached content, or None if the message is too short to be
+            cached or the cache could not be created (send it inline instead)
+        """
+        for name, cached_message in self._cached_system_messages.items():
+            if cached_message == system_message:
+                return name
+        
+        if count_tokens(system_message, self.model_name) < CONTEXT_CACHE_MIN_TOKENS:
+            return None
+        
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=self.model_name,
+                system_instruction=system_message,
+                ttl=datetime.timedelta(seconds=ttl_seconds)
+            )
+            self._cached_models[cached.name] = genai.GenerativeModel.from_cached_content(cached_content=cached)
+            self._cached_system_messages[cached.name] = system_message
+            return cached.name
+        
+        except Exception as e:
+            logger.error("Error creating Gemini context cache: %s", e)
+            return None
     
-    def send_prompt(self, prompt: str, system_message: Optional[str] = None) -> str:
+    def upload_file(self, file_path: str):
+        """
+        Upload a file with the Gemini Files API, once per file version.
+        
+        Uploads are reused while the file's modification time and size are unchanged,
+        so several prompts about the same large file send it only once. Waits until
+        Gemini has finished processing the file.
+        
+        Args:
+            file_path: Path to the file to upload
+        
+        Returns:
+            The uploaded file, to pass to send_prompt via files
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_mtime, stat.st_size)
+        uploaded = self._uploaded_files.get(key)
+        if uploaded is not None:
+            return uploaded
+        
+        extension = os.path.splitext(file_path)[1].lower()
+        uploaded = genai.upload_file(
+            path=file_path,
+            mime_type=UPLOAD_MIME_TYPES.get(extension, 'text/plain'),
+            # Stable per file version, so it can be part of the response cache key
+            display_name=f"{os.path.basename(file_path)}-{int(stat.st_mtime)}-{stat.st_size}"
+        )
+        while uploaded.state.name == 'PROCESSING':
+            time.sleep(FILE_PROCESSING_POLL_SECONDS)
+            uploaded = genai.get_file(uploaded.name)
+        if uploaded.state.name != 'ACTIVE':
+            raise ValueError(f"Upload of {file_path} failed (state: {uploaded.state.name})")
+        
+        self._uploaded_files[key] = uploaded
+        return uploaded
+    
+    def send_prompt(self, prompt: str, system_message: Optional[str] = None,
+                    no_cache: bool = False, cached_content: Optional[str] = None,
+                    files: Optional[List[Any]] = None) -> str:
         """
         Send a simple text prompt to Gemini.
         
+        Responses are cached on disk per (model, system message, prompt); a repeated
+        request is answered from the cache unless no_cache is set.
+        
         Args:
             prompt: The user prompt to send
             system_message: Optional system message to set context
+            no_cache: If True, always call the API (the new response is still cached)
+            cached_content: Optional name from create_cached_system; the cached system
+                           message is used and system_message is not sent
+            files: Optional files from upload_file, sent before the prompt
         
         Returns:
             Gemini's response as a string
         """
+        if cached_content:
+            system_message = self._cached_system_messages.get(cached_content, cached_content)
+        
+        use_cache = cache_enabled()
+        if use_cache:
+            file_names = ''.join(f"\0{uploaded.display_name}" for uploaded in files or [])
+            cache_key = response_cache_key(self.model_name, system_message, prompt + file_names)
+            if not no_cache:
+                cached = get_cached_response(cache_key)
+                if cached is not None:
+                    return cached
+        
         try:
+            model = self.model
+            if cached_content:
+                # The system message is part of the cached content
+                model = self._cached_models.get(cached_content)
+                if model is None:
+                    model = genai.GenerativeModel.from_cached_content(
+                        cached_content=genai.caching.CachedContent.get(cached_content)
+                    )
+                    self._cached_models[cached_content] = model
+                full_prompt = prompt
             # Combine system message and prompt if system message provided
-            if system_message:
+            elif system_message:
                 full_prompt = f"{system_message}\n\n{prompt}"
             else:
                 full_prompt = prompt
             
-            response = self.model.generate_content(full_prompt)
+            # Refuse oversized prompts locally instead of uploading them only to get an error back
+            n_tokens = count_tokens(full_prompt, self.model_name)
+            if n_tokens > self.max_input_tokens:
+                logger.error("Prompt too large for Gemini: about %d tokens (max_input_tokens=%d).",
+                             n_tokens, self.max_input_tokens)
+                return None
             
+            response = self._generate(model, [*files, full_prompt] if files else full_prompt)
+            
+            if use_cache:
+                store_response(cache_key, response.text)
             return response.text
             
         except Exception as e:
-            print(f"Error sending prompt to Gemini: {e}")
+            logger.error("Error sending prompt to Gemini: %s", e)
             return None
     
+    def send_batch(self, prompts: List[str], system_message: Optional[str] = None,
+                   max_concurrent: int = 4) -> List[str]:
+        """
+        Send independent prompts concurrently.
+        
+        Requests overlap their network round-trips but stay within the connector's
+        requests_per_minute limit; rate-limited requests are retried with backoff.
+        
+        Args:
+            prompts: Prompts to send
+            system_message: Optional system message used for every prompt
+            max_concurrent: Maximum number of requests in flight
+        
+        Returns:
+            Gemini's responses, in the order of the prompts
+        """
+        if not prompts:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_concurrent, len(prompts))) as executor:
+            return list(executor.map(lambda prompt: self.send_prompt(prompt, system_message), prompts))
+    
+    def send_multi(self, tasks: List[str], system_message: Optional[str] = None) -> List[str]:
+        """
+        Answer several small tasks with a single request.
+        
+        The tasks are numbered in one prompt and the model is asked to start each
+        answer with TASK_MARKER; the response is split on those markers. If the
+        response cannot be split into one answer per task, the tasks are sent
+        individually with send_batch instead.
+        
+        Args:
+            tasks: Task prompts (e.g. one short activity analysis each)
+            system_message: Optional system message used for all tasks
+        
+        Returns:
+            One answer per task, in task order
+        """
+        if len(tasks) < 2:
+            return [self.send_prompt(task, system_message) for task in tasks]
+        
+        parts = [
+            f"Answer each of the following {len(tasks)} tasks. "
+            f"Start the answer to task i with a line containing only {TASK_MARKER.format('i')}."
+        ]
+        for i, task in enumerate(tasks, start=1):
+            parts.append(f"Task {i}:\n{task}")
+        response = self.send_prompt("\n\n".join(parts), system_message)
+        
+        answers = self._split_task_answers(response, len(tasks)) if response else None
+        if answers is None:
+            logger.warning("Could not split the combined response; sending the tasks one by one.")
+            return self.send_batch(tasks, system_message)
+        return answers
+    
+    @staticmethod
+    def _split_task_answers(response: str, n_tasks: int) -> Optional[List[str]]:
+        """Split a send_multi response on its task markers (None unless tasks 1..n all appear once, in order)."""
+        matches = list(_TASK_MARKER_RE.finditer(response))
+        if [int(match.group(1)) for match in matches] != list(range(1, n_tasks + 1)):
+            return None
+        ends = [match.start() for match in matches[1:]] + [len(response)]
+        return [response[match.end():end].strip() for match, end in zip(matches, ends)]
+    
     def send_file_with_prompt(self, file_path: str, prompt: str, 
-                             system_message: Optional[str] = None) -> str:
+                             system_message: Optional[str] = None,
+                             cached_content: Optional[str] = None,
+                             table_format: str = 'toon',
+                             compact: bool = True) -> str:
         """
         Send a file along with a prompt to Gemini.
-        Reads the file content and includes it in the prompt.
+        Reads the file content and includes it in the prompt. JSON and text files of
+        FILE_UPLOAD_MIN_SIZE or more are uploaded once with the Files API and referenced
+        instead (CSV files are always sent as their compact preview and statistics).
         
         Args:
             file_path: Path to the file to send
             prompt: The prompt/question about the file
             system_message: Optional system message to set context
+            cached_content: Optional name from create_cached_system (replaces system_message)
+            table_format: How CSV tables are written: 'toon' (header once, pipe-delimited rows)
+                          or 'string' (aligned pandas tables)
+            compact: If True, .jsonl files are sent without insignificant JSON whitespace
         
         Returns:
             Gemini's response as a string
@@ -76,44 +364,45 @@ class GeminiConnector:
             # Read file content based on file type
             if file_path.endswith('.csv'):
                 # For CSV files, read and convert to a formatted string
-                df = pd.read_csv(file_path)
-                file_content = f"CSV File: {file_path}\n\n"
-                file_content += f"Shape: {df.shape[0]} rows, {df.shape[1]} columns\n\n"
-                file_content += f"Columns: {', '.join(df.columns.tolist())}\n\n"
-                file_content += "First 10 rows:\n"
-                file_content += df.head(10).to_string(index=False)
-                
-                # Add summary statistics if numeric columns exist
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                if numeric_cols:
-                    file_content += "\n\nSummary Statistics:\n"
-                    file_content += df[numeric_cols].describe().to_string()
+                file_content = format_csv_as_prompt(file_path, os.path.getmtime(file_path), table_format)
+            
+            elif os.path.getsize(file_path) >= FILE_UPLOAD_MIN_SIZE:
+                # Large files: upload once and reference them instead of inlining the text
+                uploaded = self.upload_file(file_path)
+                full_prompt = f"File: {file_path} (attached)\n\n{'='*50}\n\n{prompt}"
+                return self.send_prompt(full_prompt, system_message, cached_content=cached_content,
+                                        files=[uploaded])
             
             elif file_path.endswith('.json'):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                    file_content = f"JSON File: {file_path}\n\n"
-                    file_content += json.dumps(json_data, indent=2)
+                file_content = format_json_file(file_path)
             
             else:
                 # For other text files, read as plain text
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    file_content = f"File: {file_path}\n\n"
-                    file_content += f.read()
+                    text = f.read()
+                if compact and file_path.endswith('.jsonl'):
+                    text = compact_jsonl(text)
+                file_content = f"File: {file_path}\n\n{text}"
+            
+            # Keep the file content within max_input_tokens
+            file_content = trim_to_context(file_content, self.model_name, prompt, system_message,
+                                           context_tokens=self.max_input_tokens)
             
             # Combine file content with prompt
             full_prompt = f"{file_content}\n\n{'='*50}\n\n{prompt}"
             
             # Send to Gemini
-            return self.send_prompt(full_prompt, system_message)
+            return self.send_prompt(full_prompt, system_message, cached_content=cached_content)
             
         except Exception as e:
-            print(f"Error reading or sending file: {e}")
+            logger.error("Error reading or sending file: %s", e)
             return None
     
     def send_dataframe_with_prompt(self, df: pd.DataFrame, prompt: str,
                                    system_message: Optional[str] = None,
-                                   include_full_data: bool = False) -> str:
+                                   include_full_data: bool = False,
+                                   table_format: str = 'toon',
+                                   precomputed_stats: Optional[Dict[str, Any]] = None) -> str:
         """
         Send a pandas DataFrame along with a prompt to Gemini.
         
@@ -121,29 +410,47 @@ class GeminiConnector:
             df: The pandas DataFrame to send
             prompt: The prompt/question about the data
             system_message: Optional system message to set context
-            include_full_data: If True, sends entire DataFrame. If False, sends summary + first 10 rows
+            include_full_data: If True, sends entire DataFrame (unless it exceeds max_input_tokens).
+                               If False, sends summary + first 10 rows
+            table_format: How tables are written: 'toon' (header once, pipe-delimited rows)
+                          or 'string' (aligned pandas tables)
+            precomputed_stats: Summary statistics to send instead of computing them from df,
+                               {column: {statistic: value}} or {statistic: value} ({} = none)
         
         Returns:
             Gemini's response as a string
         """
         try:
-            # Format DataFrame information
-            data_content = f"DataFrame Information:\n\n"
-            data_content += f"Shape: {df.shape[0]} rows, {df.shape[1]} columns\n\n"
-            data_content += f"Columns: {', '.join(df.columns.tolist())}\n\n"
+            # Format DataFrame information (parts are joined once at the end)
+            parts = [
+                "DataFrame Information:\n\n",
+                f"Shape: {df.shape[0]} rows, {df.shape[1]} columns\n\n",
+                f"Columns: {', '.join(map(str, df.columns))}\n\n",
+            ]
             
+            full_csv = None
             if include_full_data:
-                data_content += "Full Data:\n"
-                data_content += df.to_string(index=False)
+                # CSV rather than to_string: no column-width alignment pass over every cell
+                full_csv = df.to_csv(index=False)
+                if count_tokens(full_csv, self.model_name) > self.max_input_tokens:
+                    logger.info("Full DataFrame exceeds max_input_tokens; sending the first rows and statistics instead.")
+                    full_csv = None
+            
+            if full_csv is not None:
+                parts += ["Full Data (CSV):\n", full_csv]
+            else:
+                parts += ["First 10 rows:\n", format_rows(df.head(10), table_format)]
+            
+            # Add summary statistics (the caller's, or computed if numeric columns exist)
+            if precomputed_stats is None:
+                summary = summarize_numeric(df, table_format)
             else:
-                data_content += "First 10 rows:\n"
-                data_content += df.head(10).to_string(index=False)
+                summary = format_stats(precomputed_stats, table_format)
+            if summary:
+                parts += ["\n\nSummary Statistics:\n", summary]
             
-            # Add summary statistics if numeric columns exist
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            if numeric_cols:
-                data_content += "\n\nSummary Statistics:\n"
-                data_content += df[numeric_cols].describe().to_string()
+            data_content = trim_to_context(''.join(parts), self.model_name, prompt, system_message,
+                                           context_tokens=self.max_input_tokens)
             
             # Combine data with prompt
             full_prompt = f"{data_content}\n\n{'='*50}\n\n{prompt}"
@@ -152,7 +459,7 @@ class GeminiConnector:
             return self.send_prompt(full_prompt, system_message)
             
         except Exception as e:
-            print(f"Error sending DataFrame: {e}")
+            logger.error("Error sending DataFrame: %s", e)
             return None
     
     def send_dict_with_prompt(self, data: Dict[str, Any], prompt: str,
@@ -169,18 +476,14 @@ class GeminiConnector:
             Gemini's response as a string
         """
         try:
-            # Format dictionary as JSON
-            data_content = "Data:\n\n"
-            data_content += json.dumps(data, indent=2, default=str)
-            
-            # Combine data with prompt
-            full_prompt = f"{data_content}\n\n{'='*50}\n\n{prompt}"
+            # Format dictionary as JSON and combine it with the prompt
+            full_prompt = f"Data:\n\n{format_json_data(data)}\n\n{'='*50}\n\n{prompt}"
             
             # Send to Gemini
             return self.send_prompt(full_prompt, system_message)
             
         except Exception as e:
-            print(f"Error sending dictionary: {e}")
+            logger.error("Error sending dictionary: %s", e)
             return None
     
     def set_model(self, model_name: str):
@@ -190,11 +493,14 @@ class GeminiConnector:
         Args:
             model_name: Model name (e.g., 'gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-1.0-pro')
         """
+        if model_name == self.model_name:
+            return
         self.model_name = model_name
-        self.model = genai.GenerativeModel(model_name)
+        self.model = _get_model(model_name, self.api_key)
         print(f"Model changed to: {model_name}")
     
-    def create_conversation(self, messages: List[Dict[str, str]]) -> str:
+    def create_conversation(self, messages: List[Dict[str, str]],
+                            conversation_id: Optional[str] = None) -> str:
         """
         Send a multi-turn conversation to Gemini.
         
@@ -206,13 +512,18 @@ class GeminiConnector:
                          {"role": "assistant", "content": "Hi! How can I help?"},
                          {"role": "user", "content": "Tell me about running."}
                      ]
+            conversation_id: Optional id to keep the chat session between calls. Later calls
+                             with the same id only send the last user message; the earlier
+                             turns are already part of the session.
         
         Returns:
             Gemini's response as a string
         """
         try:
-            # Start a chat session
-            chat = self.model.start_chat(history=[])
+            chat = self._chats.get(conversation_id) if conversation_id else None
+            if chat is not None:
+                last_message = messages[-1]['content'] if messages else ""
+                return self._call_with_retries(chat.send_message, last_message).text
             
             # Build conversation history
             # Gemini uses 'user' and 'model' roles
@@ -230,30 +541,65 @@ class GeminiConnector:
                 elif role == 'assistant':
                     conversation_history.append({'role': 'model', 'parts': [content]})
             
-            # Restart chat with history
+            # Start the chat with all but the last turn as history
             if conversation_history:
                 chat = self.model.start_chat(history=conversation_history[:-1])
                 
                 # Get the last user message
-                last_message = conversation_history[-1]['parts'][0] if conversation_history else ""
-                
-                # Prepend system message if exists
-                if system_msg:
-                    last_message = f"{system_msg}\n\n{last_message}"
-                
-                response = chat.send_message(last_message)
+                last_message = conversation_history[-1]['parts'][0]
             else:
-                # No history, just send the prompt
-                last_msg = messages[-1]['content'] if messages else ""
-                if system_msg:
-                    last_msg = f"{system_msg}\n\n{last_msg}"
-                response = self.model.generate_content(last_msg)
+                chat = self.model.start_chat(history=[])
+                last_message = messages[-1]['content'] if messages else ""
+            
+            # Prepend system message if exists
+            if system_msg:
+                last_message = f"{system_msg}\n\n{last_message}"
+            
+            response = self._call_with_retries(chat.send_message, last_message)
+            if conversation_id:
+                self._chats[conversation_id] = chat
             
             return response.text
             
         except Exception as e:
-            print(f"Error in conversation: {e}")
+            logger.error("Error in conversation: %s", e)
             return None
+    
+    def end_conversation(self, conversation_id: str):
+        """Forget the chat session kept for conversation_id."""
+        self._chats.pop(conversation_id, None)
+
+
+# System messages and prompts of the example functions, built once at import
+_SYSTEM_MESSAGES = {
+    'activity': """You are a sports scientist and running coach expert. 
+    Analyze the provided Strava activity data and provide insights about the athlete's fitness, 
+    performance, and training recommendations.""",
+    'dataframe': """You are a sports scientist and data analyst. 
+    Analyze the provided activity data and provide insights about training patterns and performance."""
+}
+
+_PROMPTS = {
+    'activity': """Please analyze this Strava running activity data and provide:
+
+1. **Activity Summary**: Key metrics (distance, time, pace, elevation, heart rate if available)
+2. **Performance Assessment**: Evaluate the athlete's performance level
+3. **Aerobic Efficiency**: Analyze the relationship between pace and heart rate
+4. **Intensity Analysis**: Estimate time spent in different heart rate zones
+5. **Fitness Level**: Provide a fitness grade (A-F) with justification
+6. **Recommendations**: Provide 3 specific training recommendations for improvement
+
+Please be specific, data-driven, and provide actionable insights.""",
+    'dataframe': """Please analyze this activity data and provide:
+
+1. **Training Volume**: Total activities, distance, and time
+2. **Training Consistency**: Pattern analysis and frequency
+3. **Performance Trends**: Any improvements or changes over time
+4. **Key Insights**: Notable patterns or observations
+5. **Recommendations**: Suggestions for training optimization
+
+Be specific and data-driven in your analysis."""
+}
 
 
 # Example usage functions
@@ -270,22 +616,7 @@ def analyze_strava_activity(file_path: str, api_key: Optional[str] = None) -> st
     """
     connector = GeminiConnector(api_key)
     
-    system_message = """You are a sports scientist and running coach expert. 
-    Analyze the provided Strava activity data and provide insights about the athlete's fitness, 
-    performance, and training recommendations."""
-    
-    prompt = """Please analyze this Strava running activity data and provide:
-
-1. **Activity Summary**: Key metrics (distance, time, pace, elevation, heart rate if available)
-2. **Performance Assessment**: Evaluate the athlete's performance level
-3. **Aerobic Efficiency**: Analyze the relationship between pace and heart rate
-4. **Intensity Analysis**: Estimate time spent in different heart rate zones
-5. **Fitness Level**: Provide a fitness grade (A-F) with justification
-6. **Recommendations**: Provide 3 specific training recommendations for improvement
-
-Please be specific, data-driven, and provide actionable insights."""
-    
-    response = connector.send_file_with_prompt(file_path, prompt, system_message)
+    response = connector.send_file_with_prompt(file_path, _PROMPTS['activity'], _SYSTEM_MESSAGES['activity'])
     return response
 
 
@@ -302,20 +633,7 @@ def analyze_strava_dataframe(df: pd.DataFrame, api_key: Optional[str] = None) ->
     """
     connector = GeminiConnector(api_key)
     
-    system_message = """You are a sports scientist and data analyst. 
-    Analyze the provided activity data and provide insights about training patterns and performance."""
-    
-    prompt = """Please analyze this activity data and provide:
-
-1. **Training Volume**: Total activities, distance, and time
-2. **Training Consistency**: Pattern analysis and frequency
-3. **Performance Trends**: Any improvements or changes over time
-4. **Key Insights**: Notable patterns or observations
-5. **Recommendations**: Suggestions for training optimization
-
-Be specific and data-driven in your analysis."""
-    
-    response = connector.send_dataframe_with_prompt(df, prompt, system_message)
+    response = connector.send_dataframe_with_prompt(df, _PROMPTS['dataframe'], _SYSTEM_MESSAGES['dataframe'])
     return response
 
 
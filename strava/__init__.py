@@ -2,7 +2,7 @@
 Strava API integration and data processing package.
 """
 
-from .strava_data_puller import StravaAPI, StravaConfig, setup_strava_config
+from .strava_data_puller import StravaAPI, StravaConfig, setup_strava_config, get_default_api
 from .strava_data_processing import StravaDataProcessor
 from .stream_jsonl_processor import (
     sample_streams_at_intervals,
@@ -11,14 +11,19 @@ from .stream_jsonl_processor import (
     create_activity_jsonl_object,
     save_jsonl_file,
     load_jsonl_file,
+    sample_jsonl_lines,
+    summarize_jsonl_by_group,
+    iter_activities_jsonl,
     combine_activities_to_jsonl,
     modify_heartrate_to_abnormal
 )
+from .heart_rate_zones import hr_zone_breakdown, format_hr_zone_summary
 
 __all__ = [
     'StravaAPI',
     'StravaConfig',
     'setup_strava_config',
+    'get_default_api',
     'StravaDataProcessor',
     'sample_streams_at_intervals',
     'sample_streams_without_moving_filter',
@@ -26,6 +31,11 @@ __all__ = [
     'create_activity_jsonl_object',
     'save_jsonl_file',
     'load_jsonl_file',
+    'sample_jsonl_lines',
+    'summarize_jsonl_by_group',
+    'iter_activities_jsonl',
     'combine_activities_to_jsonl',
-    'modify_heartrate_to_abnormal'
+    'modify_heartrate_to_abnormal',
+    'hr_zone_breakdown',
+    'format_hr_zone_summary'
 ]
@@ -0,0 +1,95 @@
+"""
+On-disk cache of Strava API responses.
+Responses of endpoints whose data does not change (activity details and streams)
+are stored gzip-compressed, one file per request under STRAVA_CACHE_DIR, keyed
+by a hash of (client id, endpoint, parameters), so re-running an example does
+not download them again. Entries expire after STRAVA_CACHE_TTL seconds; the
+response ETag is kept with each entry so an expired one can be revalidated
+with a conditional request instead of downloaded again.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+STRAVA_CACHE_DIR = os.getenv('STRAVA_CACHE_DIR') or '.strava_cache'
+STRAVA_CACHE_TTL = float(os.getenv('STRAVA_CACHE_TTL') or 36 * 3600)  # seconds
+
+
+def request_cache_key(client_id: Any, endpoint: str, params: Optional[Dict] = None) -> str:
+    """
+    Build the cache key of a GET request.
+
+    Args:
+        client_id: Strava app client ID
+        endpoint: API endpoint (e.g. "activities/123/streams")
+        params: Optional query parameters
+
+    Returns:
+        Hex digest identifying the request
+    """
+    digest = hashlib.sha256()
+    for part in (str(client_id), endpoint, json.dumps(params or {}, sort_keys=True)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_cached_body(key: str) -> Optional[bytes]:
+    """Return the cached response body for key, or None if there is none (or it has expired)."""
+    path = os.path.join(STRAVA_CACHE_DIR, key + '.json.gz')
+    try:
+        if time.time() - os.path.getmtime(path) > STRAVA_CACHE_TTL:
+            return None
+        with gzip.open(path, 'rb') as f:
+            return f.read()
+    except (OSError, EOFError):
+        return None
+
+
+def get_stale_entry(key: str) -> Optional[Tuple[str, bytes]]:
+    """Return (etag, body) of the entry for key, even if it has expired, or None if it has no ETag."""
+    try:
+        with open(os.path.join(STRAVA_CACHE_DIR, key + '.etag'), 'r', encoding='utf-8') as f:
+            etag = f.read()
+        with gzip.open(os.path.join(STRAVA_CACHE_DIR, key + '.json.gz'), 'rb') as f:
+            return etag, f.read()
+    except (OSError, EOFError):
+        return None
+
+
+def renew_entry(key: str):
+    """Restart the expiry time of the entry for key (after the API confirmed it is unchanged)."""
+    try:
+        os.utime(os.path.join(STRAVA_CACHE_DIR, key + '.json.gz'))
+    except OSError:
+        pass
+
+
+def store_body(key: str, body: bytes, etag: Optional[str] = None):
+    """Store a response body (and its ETag) under key (written atomically; failures are reported, not raised)."""
+    try:
+        os.makedirs(STRAVA_CACHE_DIR, exist_ok=True)
+        _write_atomic(key + '.json.gz', gzip.compress(body))
+        if etag:
+            _write_atomic(key + '.etag', etag.encode('utf-8'))
+        else:
+            try:
+                os.remove(os.path.join(STRAVA_CACHE_DIR, key + '.etag'))
+            except FileNotFoundError:
+                pass
+    except OSError as e:
+        print(f"Could not write Strava response cache: {e}")
+
+
+def _write_atomic(filename: str, data: bytes):
+    """Write data to filename in STRAVA_CACHE_DIR through a temporary file."""
+    fd, tmp_path = tempfile.mkstemp(dir=STRAVA_CACHE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, os.path.join(STRAVA_CACHE_DIR, filename))
@@ -3,13 +3,10 @@ Example script showing how to use get_person_activity_streams() to retrieve
 all stream data for activities belonging to a specific person.
 """
 
-import sys
 import os
+import numpy as np
 
-# Add parent directory to path for imports when running as script
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from strava.strava_data_puller import StravaAPI, setup_strava_config
+from strava.strava_data_puller import get_default_api
 from strava.strava_data_processing import StravaDataProcessor
 
 # Create streams directory if it doesn't exist (at project root)
@@ -17,6 +14,12 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STREAMS_DIR = os.path.join(PROJECT_ROOT, "streams")
 os.makedirs(STREAMS_DIR, exist_ok=True)
 
+# Formats of the saved stream files: 'feather' (fast, columnar) for the per-activity files,
+# 'parquet' (smaller, columnar) for the combined file; both fall back to CSV when
+# pyarrow is not installed
+STREAMS_FILE_FORMAT = 'feather'
+COMBINED_STREAMS_FILE_FORMAT = 'parquet'
+
 
 def example_get_person_streams():
     """
@@ -24,8 +27,7 @@ def example_get_person_streams():
     """
     # Setup Strava API
     print("Setting up Strava connection...")
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     # Test connection
     athlete_info = api.get_athlete_info()
@@ -42,12 +44,13 @@ def example_get_person_streams():
     print(f"Fetching all activity streams for person '{person_initial}'...")
     print("="*60)
     
-    # Use StravaAPI method to get streams with summary
+    # Use StravaAPI method to get streams (the per-activity report is printed
+    # once below, together with the processed data, so the API's report is skipped)
     activity_streams = api.get_person_streams_with_summary(
         person_initial=person_initial,
         days_back=days_back,
         stream_types=['time', 'distance', 'latlng', 'altitude', 'heartrate', 'velocity_smooth', 'cadence', 'grade_adjusted_speed', 'velocity', 'moving'],
-        print_summary=True
+        print_summary=False
     )
     
     if not activity_streams:
@@ -57,11 +60,12 @@ def example_get_person_streams():
     # Process and save streams using StravaDataProcessor methods
     processor = StravaDataProcessor(None)
     
-    # Save individual CSV files
+    # Save individual stream files
     processed_streams = processor.save_person_streams_to_files(
         activity_streams_dict=activity_streams,
         person_initial=person_initial,
-        output_dir=STREAMS_DIR
+        output_dir=STREAMS_DIR,
+        output_format=STREAMS_FILE_FORMAT
     )
     
     # Create and save summary JSON
@@ -99,8 +103,7 @@ def example_analyze_person_streams():
     person_initial = 'An'
     print(f"Analyzing streams for person '{person_initial}'...\n")
     
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     # Get streams for last 7 days (fewer activities for quick testing)
     activity_streams = api.get_person_activity_streams(
@@ -129,10 +132,12 @@ def example_analyze_person_streams():
             print(f"  Max Distance: {df['distance'].max():.2f} m")
         
         if 'altitude' in df.columns:
-            altitude_gain = df['altitude'].diff().clip(lower=0).sum()
+            # Reductions on the raw float64 array; NaN samples are skipped as pandas does
+            altitude = df['altitude'].to_numpy(dtype=np.float64, na_value=np.nan)
+            altitude_gain = np.nansum(np.maximum(np.diff(altitude), 0.0))
             print(f"  Total Elevation Gain: {altitude_gain:.0f} m")
-            print(f"  Max Altitude: {df['altitude'].max():.0f} m")
-            print(f"  Min Altitude: {df['altitude'].min():.0f} m")
+            print(f"  Max Altitude: {np.nanmax(altitude):.0f} m")
+            print(f"  Min Altitude: {np.nanmin(altitude):.0f} m")
         
         if 'heartrate' in df.columns:
             print(f"  Average Heart Rate: {df['heartrate'].mean():.0f} bpm")
@@ -150,8 +155,7 @@ def example_combine_person_streams():
     """
     person_initial = 'A'
     
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     print(f"Getting all streams for person '{person_initial}'...")
     activity_streams = api.get_person_activity_streams(person_initial, days_back=180)
@@ -165,7 +169,8 @@ def example_combine_person_streams():
     combined_df = processor.combine_person_streams(
         activity_streams_dict=activity_streams,
         person_initial=person_initial,
-        output_dir=STREAMS_DIR
+        output_dir=STREAMS_DIR,
+        output_format=COMBINED_STREAMS_FILE_FORMAT
     )
     
     return combined_df
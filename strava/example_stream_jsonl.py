@@ -3,19 +3,16 @@ Example script showing how to use stream_jsonl_processor functions
 to create JSONL files from Strava activity streams.
 """
 
-import sys
+import itertools
 import os
 
-# Add parent directory to path for imports when running as script
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from strava.strava_data_puller import StravaAPI, setup_strava_config
+from strava.strava_data_puller import get_default_api
 from strava.stream_jsonl_processor import (
     sample_streams_at_intervals,
     create_streams_compact_json,
     create_activity_jsonl_object,
     save_jsonl_file,
-    combine_activities_to_jsonl,
+    iter_activities_jsonl,
     modify_heartrate_to_abnormal
 )
 
@@ -25,8 +22,7 @@ def example_sample_single_activity_streams():
     Example: Sample streams from a single activity.
     """
     # Setup Strava API
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     # Get streams for a specific activity
     activity_id = 16324835978  # Change to your activity ID
@@ -78,8 +74,7 @@ def example_create_activity_jsonl():
     """
     Example: Create a complete JSONL object for an activity with streams.
     """
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     activity_id = 15093834011
     print(f"Creating JSONL object for activity {activity_id}...")
@@ -115,8 +110,7 @@ def example_create_jsonl_file():
     """
     Example: Create a JSONL file from multiple activities.
     """
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     # Get activities for a person
     person_initial = 'An'
@@ -131,26 +125,24 @@ def example_create_jsonl_file():
     print(f"Found {len(activities)} activities")
     print("Fetching streams for each activity...")
     
-    # Get streams for each activity
-    streams_dict = {}
-    for activity in activities[:5]:  # Limit to first 5 for example
-        activity_id = activity.get('id')
-        if activity_id:
-            print(f"  Fetching streams for activity {activity_id}...")
-            streams = api.get_activity_streams(
-                activity_id,
-                types=['time', 'distance', 'altitude', 'heartrate', 'velocity_smooth', 'cadence', 'moving']
-            )
-            if streams:
-                streams_dict[activity_id] = streams
-    
-    # Create JSONL objects
+    # Streams are downloaded in parallel in the background; each activity is
+    # sampled as soon as its streams arrive, while the next ones keep downloading
+    activities = [activity for activity in activities[:5] if activity.get('id')]  # Limit to first 5 for example
+    activity_streams = api.iter_activities_streams(
+        [activity['id'] for activity in activities],
+        types=['time', 'distance', 'altitude', 'heartrate', 'velocity_smooth', 'cadence', 'moving']
+    )
+    
+    # Create JSONL objects one at a time (written as they are created)
     print("\nCreating JSONL objects...")
-    jsonl_objects = combine_activities_to_jsonl(
-        activities=activities[:5],
-        streams_dict=streams_dict,
-        interval_seconds=5.0
+    jsonl_objects = (
+        create_activity_jsonl_object(activity_data=activity, streams_data=streams, interval_seconds=5.0)
+        for activity, (_, streams) in zip(activities, activity_streams)
     )
+    first_object = next(jsonl_objects, None)  # kept to show as an example below
+    if first_object is None:
+        print("No activities with an id among the first 5")
+        return
     
     # Save to JSONL file (at project root)
     PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -158,26 +150,24 @@ def example_create_jsonl_file():
     os.makedirs(output_dir, exist_ok=True)
     output_file = os.path.join(output_dir, f"activities_{person_initial}_5s.jsonl")
     
-    save_jsonl_file(jsonl_objects, output_file)
+    saved_count = save_jsonl_file(itertools.chain([first_object], jsonl_objects), output_file)
     
-    print(f"\n✓ Saved {len(jsonl_objects)} activities to: {output_file}")
+    print(f"\n✓ Saved {saved_count} activities to: {output_file}")
     
     # Show first object as example
-    if jsonl_objects:
-        print("\nFirst JSONL object (example):")
-        print("=" * 60)
-        import json
-        print(json.dumps(jsonl_objects[0], indent=2))
+    print("\nFirst JSONL object (example):")
+    print("=" * 60)
+    import json
+    print(json.dumps(first_object, indent=2))
     
-    return jsonl_objects
+    return output_file
 
 
 def example_create_person_jsonl_file():
     """
     Example: Create a JSONL file for all activities of a person with their streams.
     """
-    config = setup_strava_config()
-    api = StravaAPI(config)
+    api = get_default_api()
     
     person_initial = 'An'
     days_back = 180
@@ -211,9 +201,9 @@ def example_create_person_jsonl_file():
         activities.append(activity)
         streams_dict[activity_id] = activity_data.get('streams', [])
     
-    # Create JSONL objects
+    # Create JSONL objects one at a time (written as they are created)
     print(f"\nCreating JSONL objects for {len(activities)} activities...")
-    jsonl_objects = combine_activities_to_jsonl(
+    jsonl_objects = iter_activities_jsonl(
         activities=activities,
         streams_dict=streams_dict,
         interval_seconds=5.0
@@ -225,12 +215,12 @@ def example_create_person_jsonl_file():
     os.makedirs(output_dir, exist_ok=True)
     output_file = os.path.join(output_dir, f"person_{person_initial}_streams_5s.jsonl")
     
-    save_jsonl_file(jsonl_objects, output_file)
+    saved_count = save_jsonl_file(jsonl_objects, output_file)
     
-    print(f"\n✓ Saved {len(jsonl_objects)} activities to: {output_file}")
+    print(f"\n✓ Saved {saved_count} activities to: {output_file}")
     print(f"  File size: {os.path.getsize(output_file) / 1024:.2f} KB")
     
-    return jsonl_objects
+    return output_file
 
 
 def example_modify_heartrate_to_abnormal():
@@ -1,4 +1,6 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 client_id = "ENTER-YOUR-CLIENT-ID-HERE"
 client_secret = 'ENTER-YOUR-CLIENT-SECRET-KEY-HERE'
@@ -12,8 +14,13 @@ data = {
     'grant_type': 'authorization_code'
 }
 
-response = requests.post(url, data=data)
-token_data = response.json()
+# Retry failed connections with backoff; a POST that reached Strava is not resent,
+# which matters because the authorization code can only be used once
+with requests.Session() as session:
+    session.mount('https://', HTTPAdapter(max_retries=Retry(total=3, backoff_factor=0.5)))
+    response = session.post(url, data=data, timeout=10)
+    response.raise_for_status()
+    token_data = response.json()
 
 print("Full Token:", token_data)
 print("Access Token:", token_data['access_token'])
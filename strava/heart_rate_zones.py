@@ -0,0 +1,67 @@
+"""
+Heart Rate Zones
+Functions for computing time spent in heart rate zones from activity streams,
+so the examples can give the LLM exact numbers instead of asking it to estimate them.
+"""
+
+from typing import Any, Optional
+import numpy as np
+
+# Constants
+# Lower bounds of zones 2-5 as fractions of max heart rate (zone 1 is everything below 60%)
+HR_ZONE_BOUNDS = (0.6, 0.7, 0.8, 0.9)
+HR_ZONE_LABELS = ["Z1 (<60%)", "Z2 (60-70%)", "Z3 (70-80%)", "Z4 (80-90%)", "Z5 (>=90%)"]
+
+
+def hr_zone_breakdown(heartrate: Any, time_s: Any, max_hr: float) -> np.ndarray:
+    """
+    Compute the seconds spent in each of the five heart rate zones.
+
+    Each sample is credited with the time until the next sample; samples without
+    a heart rate value are ignored.
+
+    Args:
+        heartrate: Heart rate stream (bpm)
+        time_s: Time stream (seconds since start), same length as heartrate
+        max_hr: Athlete's maximum heart rate (bpm)
+
+    Returns:
+        Array of 5 floats with the seconds spent in zones 1-5
+    """
+    hr = np.asarray(heartrate, dtype=np.float64)
+    t = np.asarray(time_s, dtype=np.float64)
+    if hr.size < 2:
+        return np.zeros(len(HR_ZONE_LABELS))
+
+    dt = np.diff(t)
+    hr = hr[:-1]
+    valid = ~(np.isnan(hr) | np.isnan(dt))
+    zones = np.digitize(hr[valid], np.asarray(HR_ZONE_BOUNDS) * max_hr)
+    return np.bincount(zones, weights=dt[valid], minlength=len(HR_ZONE_LABELS))
+
+
+def format_hr_zone_summary(streams_df: Any, max_hr: float) -> Optional[str]:
+    """
+    Format the heart rate zone breakdown of a streams DataFrame for a prompt.
+
+    Args:
+        streams_df: DataFrame from StravaDataProcessor.streams_to_dataframe()
+        max_hr: Athlete's maximum heart rate (bpm)
+
+    Returns:
+        Summary text, or None if the streams have no heart rate or time data
+    """
+    if streams_df is None or 'heartrate' not in streams_df or 'time' not in streams_df:
+        return None
+
+    zone_seconds = hr_zone_breakdown(streams_df['heartrate'].to_numpy(dtype=np.float64, na_value=np.nan),
+                                     streams_df['time'].to_numpy(dtype=np.float64, na_value=np.nan),
+                                     max_hr)
+    total = zone_seconds.sum()
+    if total <= 0:
+        return None
+
+    lines = [f"Precomputed heart rate zones (max HR {max_hr:.0f} bpm), use these instead of estimating:"]
+    for label, seconds in zip(HR_ZONE_LABELS, zone_seconds):
+        lines.append(f"- {label}: {seconds / 60:.1f} min ({100 * seconds / total:.1f}%)")
+    return "\n".join(lines)
@@ -1,9 +1,90 @@
+import numpy as np
 import pandas as pd
 import os
 import json
+import importlib.util
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # optional: faster writing of the streams summary JSON
+    orjson = None
+
+
+# File formats the stream saving methods can write ('parquet' and 'feather' need pyarrow)
+STREAM_FILE_FORMATS = ('csv', 'parquet', 'feather')
+
+
+# Compact dtypes for stream columns, whose values are bounded (nullable integers keep missing samples)
+STREAM_DTYPES = {
+    'time': 'UInt32',
+    'heartrate': 'UInt8',
+    'cadence': 'UInt8',
+    'watts': 'UInt16',
+    'temp': 'Int8',
+    'distance': 'float32',
+    'altitude': 'float32',
+    'velocity_smooth': 'float32',
+    'grade_adjusted_speed': 'float32',
+    'grade_smooth': 'float32',
+}
+
+
+# Activity types kept by filter_running_activities()
+RUNNING_TYPES = frozenset({'Run', 'TrailRun', 'Treadmill'})
+
+
+# Columns of activities_to_dataframe(): (column/activity key, default when the key is missing)
+ACTIVITY_COLUMNS = (
+    ('id', None), ('name', None), ('type', None), ('start_date', None),
+    ('distance', 0), ('moving_time', 0), ('elapsed_time', 0), ('total_elevation_gain', 0),
+    ('average_speed', 0), ('max_speed', 0), ('average_heartrate', None), ('max_heartrate', None),
+    ('calories', None), ('kudos_count', 0), ('comment_count', 0), ('achievement_count', 0),
+    ('pr_count', 0), ('suffer_score', None), ('description', ''), ('gear_id', None),
+    ('trainer', False), ('commute', False), ('manual', False), ('private', False), ('flagged', False),
+)
+
+
+def _downcast_streams(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast known stream columns to STREAM_DTYPES, leaving columns whose values do not fit unchanged."""
+    for column, dtype in STREAM_DTYPES.items():
+        if column in df.columns:
+            try:
+                df[column] = df[column].astype(dtype)
+            except (TypeError, ValueError, OverflowError):
+                pass  # e.g. fractional or out-of-range values
+    return df
+
+
+def _resolve_output_format(output_format: str) -> str:
+    """Validate output_format, falling back to CSV when Parquet/Feather support is not installed."""
+    if output_format not in STREAM_FILE_FORMATS:
+        raise ValueError(f"output_format must be one of {STREAM_FILE_FORMATS}, got {output_format!r}")
+    if output_format != 'csv' and importlib.util.find_spec('pyarrow') is None:
+        print(f"{output_format.capitalize()} output needs pyarrow (pip install pyarrow); writing CSV files instead.")
+        return 'csv'
+    return output_format
+
+
+def _file_timestamp() -> str:
+    """Return the current local time as used in output file names (YYYYmmdd_HHMMSS)."""
+    return datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+def _write_streams_file(df: pd.DataFrame, base_path: str, output_format: str) -> str:
+    """Write df to base_path + extension as CSV, zstd-compressed Parquet or LZ4-compressed Feather and return the path."""
+    if output_format == 'parquet':
+        output_file = base_path + '.parquet'
+        df.to_parquet(output_file, index=False, compression='zstd')
+    elif output_format == 'feather':
+        output_file = base_path + '.feather'
+        df.to_feather(output_file, compression='lz4')
+    else:
+        output_file = base_path + '.csv'
+        df.to_csv(output_file, index=False)
+    return output_file
+
 
 class StravaDataProcessor:
     """Class to process, filter, and analyze Strava data."""
@@ -21,8 +102,7 @@ class StravaDataProcessor:
     def filter_running_activities(self, activities: Optional[List[Dict]] = None) -> List[Dict]:
         """Filter activities to only include runs."""
         source = activities if activities is not None else self.data or []
-        running_types = ['Run', 'TrailRun', 'Treadmill']
-        return [a for a in source if isinstance(a, dict) and a.get('type') in running_types]
+        return [a for a in source if isinstance(a, dict) and a.get('type') in RUNNING_TYPES]
     
     def get_activity_summary(self, df: pd.DataFrame) -> Dict:
         """Generate summary statistics for activities."""
@@ -59,9 +139,15 @@ class StravaDataProcessor:
         max_length = max(len(data) for data in stream_dict.values())
         df_data = {}
         for stream_type, data in stream_dict.items():
-            padded_data = data + [None] * (max_length - len(data))
-            df_data[stream_type] = padded_data
-        df = pd.DataFrame(df_data)
+            if len(data) == max_length:
+                # Complete numeric streams go to pandas as one array; streams with gaps
+                # (None), latlng pairs and padded streams keep pandas' list inference
+                values = np.asarray(data)
+                if values.ndim == 1 and values.dtype.kind in 'biuf':
+                    df_data[stream_type] = values
+                    continue
+            df_data[stream_type] = data + [None] * (max_length - len(data))
+        df = pd.DataFrame(df_data, copy=False)
         # if 'distance' in df.columns:
         #     df['distance_km'] = df['distance'] / 1000
         return df
@@ -71,41 +157,19 @@ class StravaDataProcessor:
         source = activities if activities is not None else self.data
         if not source:
             return pd.DataFrame()
-        data_rows = []
-        for activity in source:
-            if not isinstance(activity, dict):
-                continue
-            row = {
-                'id': activity.get('id'),
-                'name': activity.get('name'),
-                'type': activity.get('type'),
-                'start_date': activity.get('start_date'),
-                'distance': activity.get('distance', 0) / 1000,
-                'moving_time': activity.get('moving_time', 0),
-                'elapsed_time': activity.get('elapsed_time', 0),
-                'total_elevation_gain': activity.get('total_elevation_gain', 0),
-                'average_speed': activity.get('average_speed', 0) * 3.6,
-                'max_speed': activity.get('max_speed', 0) * 3.6,
-                'average_heartrate': activity.get('average_heartrate'),
-                'max_heartrate': activity.get('max_heartrate'),
-                'calories': activity.get('calories'),
-                'kudos_count': activity.get('kudos_count', 0),
-                'comment_count': activity.get('comment_count', 0),
-                'achievement_count': activity.get('achievement_count', 0),
-                'pr_count': activity.get('pr_count', 0),
-                'suffer_score': activity.get('suffer_score'),
-                'description': activity.get('description', ''),
-                'gear_id': activity.get('gear_id'),
-                'trainer': activity.get('trainer', False),
-                'commute': activity.get('commute', False),
-                'manual': activity.get('manual', False),
-                'private': activity.get('private', False),
-                'flagged': activity.get('flagged', False)
-            }
-            data_rows.append(row)
-        df = pd.DataFrame(data_rows)
+        rows = [activity for activity in source if isinstance(activity, dict)]
+        if not rows:
+            return pd.DataFrame()
+        # One list per column, so pandas builds each column directly instead of aligning row dicts
+        df = pd.DataFrame({
+            column: [activity.get(column, default) for activity in rows]
+            for column, default in ACTIVITY_COLUMNS
+        })
+        df['distance'] = df['distance'] / 1000  # km
+        for column in ('average_speed', 'max_speed'):
+            df[column] = df[column] * 3.6  # km/h
         if not df.empty:
-            df['start_date'] = pd.to_datetime(df['start_date'])
+            df['start_date'] = pd.to_datetime(df['start_date'], format='ISO8601')
             df['date'] = df['start_date'].dt.date
             df['time'] = df['start_date'].dt.time
         return df
@@ -115,6 +179,10 @@ class StravaDataProcessor:
         source = activity_details if activity_details is not None else self.data
         if not source or not isinstance(source, dict):
             return pd.DataFrame()
+        # Nested objects, looked up once (missing or empty ones give the defaults below)
+        athlete = source.get('athlete') or {}
+        gear = source.get('gear') or {}
+        photos = source.get('photos') or {}
         row = {
             'id': source.get('id'),
             'name': source.get('name'),
@@ -146,8 +214,8 @@ class StravaDataProcessor:
             'suffer_score': source.get('suffer_score'),
             'description': source.get('description', ''),
             'gear_id': source.get('gear_id'),
-            'gear_name': source.get('gear', {}).get('name', '') if source.get('gear') else '',
-            'gear_distance': source.get('gear', {}).get('distance', 0) / 1000 if source.get('gear') else 0,
+            'gear_name': gear.get('name', ''),
+            'gear_distance': gear.get('distance', 0) / 1000 if gear else 0,
             'trainer': source.get('trainer', False),
             'commute': source.get('commute', False),
             'manual': source.get('manual', False),
@@ -177,44 +245,44 @@ class StravaDataProcessor:
             'leaderboard_opt_out': source.get('leaderboard_opt_out', False),
             'perceived_exertion': source.get('perceived_exertion'),
             'prefer_perceived_exertion': source.get('prefer_perceived_exertion', False),
-            'photos': len(source.get('photos', {}).get('data', [])) if source.get('photos') else 0,
+            'photos': len(photos.get('data', [])),
             'has_photos': source.get('has_photos', False),
             'instagram_primary_photo': source.get('instagram_primary_photo'),
             'instagram_hashtags': source.get('instagram_hashtags', []),
             'resource_state': source.get('resource_state'),
-            'athlete_id': source.get('athlete', {}).get('id') if source.get('athlete') else None,
-            'athlete_username': source.get('athlete', {}).get('username', '') if source.get('athlete') else '',
-            'athlete_firstname': source.get('athlete', {}).get('firstname', '') if source.get('athlete') else '',
-            'athlete_lastname': source.get('athlete', {}).get('lastname', '') if source.get('athlete') else '',
-            'athlete_city': source.get('athlete', {}).get('city', '') if source.get('athlete') else '',
-            'athlete_state': source.get('athlete', {}).get('state', '') if source.get('athlete') else '',
-            'athlete_country': source.get('athlete', {}).get('country', '') if source.get('athlete') else '',
-            'athlete_sex': source.get('athlete', {}).get('sex', '') if source.get('athlete') else '',
-            'athlete_premium': source.get('athlete', {}).get('premium', False) if source.get('athlete') else False,
-            'athlete_summit': source.get('athlete', {}).get('summit', False) if source.get('athlete') else False,
-            'athlete_created_at': source.get('athlete', {}).get('created_at', '') if source.get('athlete') else '',
-            'athlete_updated_at': source.get('athlete', {}).get('updated_at', '') if source.get('athlete') else '',
-            'athlete_badge_type_id': source.get('athlete', {}).get('badge_type_id') if source.get('athlete') else None,
-            'athlete_weight': source.get('athlete', {}).get('weight') if source.get('athlete') else None,
-            'athlete_profile_medium': source.get('athlete', {}).get('profile_medium', '') if source.get('athlete') else '',
-            'athlete_profile': source.get('athlete', {}).get('profile', '') if source.get('athlete') else '',
-            'athlete_friend': source.get('athlete', {}).get('friend') if source.get('athlete') else None,
-            'athlete_follower': source.get('athlete', {}).get('follower') if source.get('athlete') else None,
-            'athlete_follower_count': source.get('athlete', {}).get('follower_count') if source.get('athlete') else None,
-            'athlete_friend_count': source.get('athlete', {}).get('friend_count') if source.get('athlete') else None,
-            'athlete_mutual_friend_count': source.get('athlete', {}).get('mutual_friend_count') if source.get('athlete') else None,
-            'athlete_athlete_type': source.get('athlete', {}).get('athlete_type') if source.get('athlete') else None,
-            'athlete_date_preference': source.get('athlete', {}).get('date_preference', '') if source.get('athlete') else '',
-            'athlete_measurement_preference': source.get('athlete', {}).get('measurement_preference', '') if source.get('athlete') else '',
-            'athlete_clubs': len(source.get('athlete', {}).get('clubs', [])) if source.get('athlete') else 0,
-            'athlete_ftp': source.get('athlete', {}).get('ftp') if source.get('athlete') else None,
-            'athlete_bikes': len(source.get('athlete', {}).get('bikes', [])) if source.get('athlete') else 0,
-            'athlete_shoes': len(source.get('athlete', {}).get('shoes', [])) if source.get('athlete') else 0
+            'athlete_id': athlete.get('id'),
+            'athlete_username': athlete.get('username', ''),
+            'athlete_firstname': athlete.get('firstname', ''),
+            'athlete_lastname': athlete.get('lastname', ''),
+            'athlete_city': athlete.get('city', ''),
+            'athlete_state': athlete.get('state', ''),
+            'athlete_country': athlete.get('country', ''),
+            'athlete_sex': athlete.get('sex', ''),
+            'athlete_premium': athlete.get('premium', False),
+            'athlete_summit': athlete.get('summit', False),
+            'athlete_created_at': athlete.get('created_at', ''),
+            'athlete_updated_at': athlete.get('updated_at', ''),
+            'athlete_badge_type_id': athlete.get('badge_type_id'),
+            'athlete_weight': athlete.get('weight'),
+            'athlete_profile_medium': athlete.get('profile_medium', ''),
+            'athlete_profile': athlete.get('profile', ''),
+            'athlete_friend': athlete.get('friend'),
+            'athlete_follower': athlete.get('follower'),
+            'athlete_follower_count': athlete.get('follower_count'),
+            'athlete_friend_count': athlete.get('friend_count'),
+            'athlete_mutual_friend_count': athlete.get('mutual_friend_count'),
+            'athlete_athlete_type': athlete.get('athlete_type'),
+            'athlete_date_preference': athlete.get('date_preference', ''),
+            'athlete_measurement_preference': athlete.get('measurement_preference', ''),
+            'athlete_clubs': len(athlete.get('clubs', [])),
+            'athlete_ftp': athlete.get('ftp'),
+            'athlete_bikes': len(athlete.get('bikes', [])),
+            'athlete_shoes': len(athlete.get('shoes', []))
         }
         df = pd.DataFrame([row])
         if not df.empty:
-            df['start_date'] = pd.to_datetime(df['start_date'])
-            df['start_date_local'] = pd.to_datetime(df['start_date_local'])
+            df['start_date'] = pd.to_datetime(df['start_date'], format='ISO8601')
+            df['start_date_local'] = pd.to_datetime(df['start_date_local'], format='ISO8601')
             df['date'] = df['start_date'].dt.date
             df['time'] = df['start_date'].dt.time
             df['date_local'] = df['start_date_local'].dt.date
@@ -242,6 +310,9 @@ class StravaDataProcessor:
                 df = self.streams_to_dataframe(streams)
                 
                 if not df.empty:
+                    # Shrink the bounded stream columns (less memory and smaller files)
+                    df = _downcast_streams(df)
+                    
                     # Add metadata columns
                     df['activity_id'] = activity_id
                     df['activity_name'] = activity_data.get('activity_name', '')
@@ -253,18 +324,23 @@ class StravaDataProcessor:
     
     def save_person_streams_to_files(self, activity_streams_dict: Dict[int, Dict], 
                                      person_initial: str, 
-                                     output_dir: str = "streams") -> Dict[int, pd.DataFrame]:
+                                     output_dir: str = "streams",
+                                     output_format: str = 'csv') -> Dict[int, pd.DataFrame]:
         """
-        Process and save person activity streams to individual CSV files.
+        Process and save person activity streams to individual CSV, Parquet or Feather files.
         
         Args:
             activity_streams_dict: Dictionary from get_person_activity_streams()
             person_initial: Person's initial for file naming
             output_dir: Directory to save files (default: "streams")
+            output_format: 'csv', 'parquet' (zstd-compressed) or 'feather' (LZ4-compressed, fastest
+                           to write and read); both columnar formats need pyarrow
         
         Returns:
             Dictionary mapping activity_id to DataFrame
         """
+        output_format = _resolve_output_format(output_format)
+        
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
@@ -275,18 +351,22 @@ class StravaDataProcessor:
             print("No streams to save")
             return {}
         
-        # Save each activity's streams to a separate CSV
-        print(f"\nSaving stream data to CSV files in '{output_dir}'...")
+        # Save each activity's streams to a separate file
+        print(f"\nSaving stream data to {output_format.upper()} files in '{output_dir}'...")
         for activity_id, df_streams in processed_streams.items():
-            output_file = os.path.join(output_dir, f"streams_person_{person_initial}_activity_{activity_id}.csv")
-            df_streams.to_csv(output_file, index=False)
+            output_file = _write_streams_file(
+                df_streams,
+                os.path.join(output_dir, f"streams_person_{person_initial}_activity_{activity_id}"),
+                output_format
+            )
             print(f"  ✓ Saved: {output_file} ({len(df_streams)} data points)")
         
         return processed_streams
     
     def create_streams_summary_json(self, activity_streams_dict: Dict[int, Dict],
                                    person_initial: str,
-                                   output_dir: str = "streams") -> str:
+                                   output_dir: str = "streams",
+                                   timestamp: Optional[str] = None) -> str:
         """
         Create and save a JSON summary of activity streams.
         
@@ -294,6 +374,8 @@ class StravaDataProcessor:
             activity_streams_dict: Dictionary from get_person_activity_streams()
             person_initial: Person's initial for file naming
             output_dir: Directory to save file (default: "streams")
+            timestamp: Timestamp in the file name (default: now, as YYYYmmdd_HHMMSS); pass the
+                       same value to several calls to name the files of one run alike
         
         Returns:
             Path to the saved summary file
@@ -313,27 +395,39 @@ class StravaDataProcessor:
             }
         
         # Save summary to JSON
-        summary_file = os.path.join(output_dir, f"streams_summary_person_{person_initial}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(summary_data, f, indent=2)
+        summary_file = os.path.join(output_dir, f"streams_summary_person_{person_initial}_{timestamp or _file_timestamp()}.json")
+        if orjson is not None:
+            with open(summary_file, 'wb') as f:
+                f.write(orjson.dumps(summary_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(summary_file, 'w', encoding='utf-8') as f:
+                json.dump(summary_data, f, indent=2, ensure_ascii=False)
         
         print(f"\n✓ Summary saved to: {summary_file}")
         return summary_file
     
     def combine_person_streams(self, activity_streams_dict: Dict[int, Dict],
                               person_initial: str,
-                              output_dir: str = "streams") -> Optional[pd.DataFrame]:
+                              output_dir: str = "streams",
+                              output_format: str = 'csv',
+                              timestamp: Optional[str] = None) -> Optional[pd.DataFrame]:
         """
-        Combine all person activity streams into a single DataFrame and save to CSV.
+        Combine all person activity streams into a single DataFrame and save to CSV, Parquet or Feather.
         
         Args:
             activity_streams_dict: Dictionary from get_person_activity_streams()
             person_initial: Person's initial for file naming
             output_dir: Directory to save file (default: "streams")
+            output_format: 'csv', 'parquet' (zstd-compressed) or 'feather' (LZ4-compressed, fastest
+                           to write and read); both columnar formats need pyarrow
+            timestamp: Timestamp in the file name (default: now, as YYYYmmdd_HHMMSS); pass the
+                       same value to several calls to name the files of one run alike
         
         Returns:
             Combined DataFrame, or None if no streams to combine
         """
+        output_format = _resolve_output_format(output_format)
+        
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
@@ -349,8 +443,11 @@ class StravaDataProcessor:
         combined_df = pd.concat(all_streams_list, ignore_index=True)
         
         # Save combined DataFrame
-        output_file = os.path.join(output_dir, f"combined_streams_person_{person_initial}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-        combined_df.to_csv(output_file, index=False)
+        output_file = _write_streams_file(
+            combined_df,
+            os.path.join(output_dir, f"combined_streams_person_{person_initial}_{timestamp or _file_timestamp()}"),
+            output_format
+        )
         
         print(f"\n✓ Combined streams saved to: {output_file}")
         print(f"  Total data points: {len(combined_df)}")
@@ -5,14 +5,57 @@ A Python script to connect to Strava API and retrieve activity data.
 
 import requests
 import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple
 import os
 import re
 from dataclasses import dataclass
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional: faster parsing of the (large) streams responses
+    orjson = None
 from .strava_data_processing import StravaDataProcessor
+from ._http_cache import request_cache_key, get_cached_body, get_stale_entry, renew_entry, store_body
+
+
+# Stream downloads run in parallel; this is also the size of the HTTP connection pool
+MAX_CONCURRENT_REQUESTS = 8
+
+# Requests pause until the next window when this few calls are left in Strava's
+# short-term rate limit (which resets every 15 minutes, on the quarter hour)
+RATE_LIMIT_MARGIN = 5
+RATE_LIMIT_WINDOW_SECONDS = 15 * 60
+
+# Pages of the activity list requested at once after the first full page
+ACTIVITY_PAGES_IN_PARALLEL = 4
+
+# Seconds to wait for Strava to connect/respond; 5xx responses and connection
+# errors are retried this many times with exponential backoff
+REQUEST_TIMEOUT_SECONDS = 30
+REQUEST_RETRIES = 3
+
+# Access tokens are refreshed this many seconds before they expire
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+
+
+# Activity names "(Running|Rest|Treppe) <number> (DeviceName <initial>)" or "[DeviceName <initial>]";
+# captures the person's initial
+_PERSON_NAME_RE = re.compile(
+    r'(?:Running|Rest|Treppe)\s+\d+\s+[\(\[](?:Polar|Suunto|Apple|GarminT|GarminU|FitbitU|FitbitT|Xiaomi|Huawei|Wahoo)\s+([A-Za-z]{1,2})[\)\]]',
+    re.IGNORECASE
+)
+
+def _parse_json(body: bytes):
+    """Parse a JSON response body (orjson when installed)."""
+    return orjson.loads(body) if orjson is not None else json.loads(body)
 
 
 @dataclass
@@ -22,18 +65,40 @@ class StravaConfig:
     client_secret: str
     access_token: str
     refresh_token: str
+    expires_at: Optional[int] = None  # Unix time the access token expires (known after a refresh)
 
 
 class StravaAPI:
     """Class to handle all Strava API interactions and data retrieval."""
     
-    def __init__(self, config: StravaConfig):
+    def __init__(self, config: StravaConfig, cache: bool = False):
         self.config = config
+        # cache=True answers repeated activity details/streams requests from the
+        # on-disk response cache (see _http_cache) instead of the API
+        self.cache = cache
         self.base_url = "https://www.strava.com/api/v3"
         self.headers = {
             'Authorization': f'Bearer {config.access_token}',
             'Content-Type': 'application/json'
         }
+        
+        # One session for all requests, so connections (and TLS handshakes) are reused
+        self.session = requests.Session()
+        retries = Retry(total=REQUEST_RETRIES, backoff_factor=0.5,
+                        status_forcelist=(500, 502, 503, 504), raise_on_status=False)
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=MAX_CONCURRENT_REQUESTS, max_retries=retries))
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+    
+    def close(self):
+        """Close the HTTP session and its pooled connections."""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
     
     def refresh_access_token(self) -> bool:
         """Refresh the access token using the refresh token."""
@@ -46,12 +111,13 @@ class StravaAPI:
         }
         
         try:
-            response = requests.post(url, data=data)
+            response = self.session.post(url, data=data, timeout=REQUEST_TIMEOUT_SECONDS)
             response.raise_for_status()
             
-            token_data = response.json()
+            token_data = _parse_json(response.content)
             self.config.access_token = token_data['access_token']
             self.config.refresh_token = token_data['refresh_token']
+            self.config.expires_at = token_data.get('expires_at')
             self.headers['Authorization'] = f'Bearer {self.config.access_token}'
             
             print("Access token refreshed successfully!")
@@ -60,28 +126,120 @@ class StravaAPI:
         except requests.exceptions.RequestException as e:
             print(f"Error refreshing token: {e}")
             return False
+        except ValueError as e:
+            print(f"Invalid token response: {e}")
+            return False
     
-    def make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
-        """Make a request to the Strava API with automatic token refresh."""
+    def make_request(self, endpoint: str, params: Optional[Dict] = None,
+                     cacheable: bool = False) -> Optional[Dict]:
+        """
+        Make a request to the Strava API with automatic token refresh.
+        
+        Requests marked cacheable are served from the on-disk response cache
+        when the API was created with cache=True; expired entries are revalidated
+        with their ETag and reused if the API answers 304 Not Modified.
+        """
         url = f"{self.base_url}/{endpoint}"
         
+        cache_key = None
+        stale_entry = None
+        if cacheable and self.cache:
+            cache_key = request_cache_key(self.config.client_id, endpoint, params)
+            body = get_cached_body(cache_key)
+            if body is not None:
+                return _parse_json(body)
+            stale_entry = get_stale_entry(cache_key)
+        
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            self._refresh_token_if_expiring()
+            self._wait_for_rate_limit()
+            sent_authorization = self.headers['Authorization']
+            headers = self.headers
+            if stale_entry is not None:
+                headers = {**self.headers, 'If-None-Match': stale_entry[0]}
+            response = self.session.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+            self._update_rate_limit(response)
             
-            # If token is expired, try to refresh it
+            # If token is expired, try to refresh it (once, when requests run in parallel).
+            # Tokens of unknown expiry (as configured at start-up) end up here the first time.
             if response.status_code == 401:
-                print("Token expired, attempting to refresh...")
-                if self.refresh_access_token():
-                    response = requests.get(url, headers=self.headers, params=params)
-                else:
-                    return None
+                with self._lock:
+                    if self.headers['Authorization'] == sent_authorization:
+                        print("Token expired, attempting to refresh...")
+                        if not self.refresh_access_token():
+                            return None
+                response = self.session.get(url, headers=self.headers, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+                self._update_rate_limit(response)
+            
+            # Over the rate limit: wait as long as the API asks (or for the next window) and try once more
+            if response.status_code == 429:
+                retry_after = response.headers.get('Retry-After', '')
+                self._pause_until_next_window(int(retry_after) if retry_after.isdigit() else None)
+                self._wait_for_rate_limit()
+                response = self.session.get(url, headers=self.headers, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+                self._update_rate_limit(response)
+            
+            # Cached entry is still current
+            if response.status_code == 304 and stale_entry is not None:
+                renew_entry(cache_key)
+                return _parse_json(stale_entry[1])
             
             response.raise_for_status()
-            return response.json()
+            data = _parse_json(response.content)
+            if cache_key is not None:
+                store_body(cache_key, response.content, response.headers.get('ETag'))
+            return data
             
         except requests.exceptions.RequestException as e:
             print(f"Error making request to {endpoint}: {e}")
             return None
+        except ValueError as e:
+            print(f"Invalid JSON response from {endpoint}: {e}")
+            return None
+    
+    def _refresh_token_if_expiring(self):
+        """Refresh the access token shortly before its known expiry (once, when requests run in parallel)."""
+        expires_at = self.config.expires_at
+        if expires_at is None or time.time() + TOKEN_REFRESH_MARGIN_SECONDS < expires_at:
+            return
+        with self._lock:
+            # Another request may have refreshed it while this one waited for the lock
+            if self.config.expires_at == expires_at:
+                print("Token about to expire, refreshing...")
+                self.refresh_access_token()
+    
+    def _update_rate_limit(self, response: requests.Response):
+        """Pause further requests if the X-RateLimit headers show the 15-minute limit is nearly used up."""
+        usage = response.headers.get('X-RateLimit-Usage')
+        limit = response.headers.get('X-RateLimit-Limit')
+        if not usage or not limit:
+            return
+        try:
+            # Values are "<15-minute>,<daily>"
+            short_usage = int(usage.split(',')[0])
+            short_limit = int(limit.split(',')[0])
+        except ValueError:
+            return
+        if short_limit - short_usage <= RATE_LIMIT_MARGIN:
+            self._pause_until_next_window()
+    
+    def _pause_until_next_window(self, delay: Optional[float] = None):
+        """Hold requests until Strava's next 15-minute rate limit window starts (or for delay seconds, if given)."""
+        now = time.time()
+        if delay is not None:
+            resume_at = now + delay
+        else:
+            resume_at = now - now % RATE_LIMIT_WINDOW_SECONDS + RATE_LIMIT_WINDOW_SECONDS
+        with self._lock:
+            if resume_at > self._paused_until:
+                self._paused_until = resume_at
+                print(f"Strava rate limit nearly reached, pausing requests for {resume_at - now:.0f} s...")
+    
+    def _wait_for_rate_limit(self):
+        """Sleep while requests are paused by the rate limit."""
+        delay = self._paused_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
     
     # Athlete-related methods
     def get_athlete_info(self) -> Optional[Dict]:
@@ -114,7 +272,7 @@ class StravaAPI:
     
     def get_activity_details(self, activity_id: int) -> Optional[Dict]:
         """Get detailed information about a specific activity."""
-        return self.make_request(f"activities/{activity_id}")
+        return self.make_request(f"activities/{activity_id}", cacheable=True)
     
     def get_activity_streams(self, activity_id: int, 
                            types: List[str] = None) -> Optional[Dict]:
@@ -130,7 +288,43 @@ class StravaAPI:
         
         # Strava API expects 'keys' parameter with comma-separated stream types
         params = {'keys': ','.join(types)}
-        return self.make_request(f"activities/{activity_id}/streams", params)
+        return self.make_request(f"activities/{activity_id}/streams", params, cacheable=True)
+    
+    def get_activities_streams(self, activity_ids: List[int], types: Optional[List[str]] = None,
+                               max_workers: int = MAX_CONCURRENT_REQUESTS) -> Dict[int, Optional[Dict]]:
+        """
+        Get the streams of several activities, fetching up to max_workers of them in parallel.
+        
+        Args:
+            activity_ids: The activity IDs
+            types: List of stream types (see get_activity_streams())
+            max_workers: Maximum number of requests in flight at once
+        
+        Returns:
+            Dictionary mapping activity_id to its streams (None if they could not be fetched),
+            in the order of activity_ids
+        """
+        return dict(self.iter_activities_streams(activity_ids, types, max_workers))
+    
+    def iter_activities_streams(self, activity_ids: List[int], types: Optional[List[str]] = None,
+                                max_workers: int = MAX_CONCURRENT_REQUESTS) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """
+        Yield the streams of several activities in order, as soon as each has been fetched.
+        
+        All downloads are started up front (up to max_workers in parallel), so the
+        caller can process one activity while the following ones are still downloading.
+        
+        Args:
+            activity_ids: The activity IDs
+            types: List of stream types (see get_activity_streams())
+            max_workers: Maximum number of requests in flight at once
+        
+        Yields:
+            (activity_id, streams) tuples, streams being None if they could not be fetched
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            streams = executor.map(lambda activity_id: self.get_activity_streams(activity_id, types), activity_ids)
+            yield from zip(activity_ids, streams)
     
     def get_all_activities(self, days_back: int = 365) -> List[Dict]:
         """
@@ -146,30 +340,32 @@ class StravaAPI:
         # Calculate timestamp for days_back
         after_timestamp = int((datetime.now() - timedelta(days=days_back)).timestamp())
         
-        while True:
-            print(f"Fetching page {page}...")
-            activities = self.get_activities(
-                per_page=per_page, 
-                page=page, 
-                after=after_timestamp
-            )
-            
-            if not activities:
-                break
-                
-            all_activities.extend(activities)
-            
-            # If we got fewer activities than per_page, we've reached the end
-            if len(activities) < per_page:
-                break
-                
-            page += 1
-            time.sleep(0.2)  # Rate limiting
+        def fetch_page(page_number: int) -> Optional[List[Dict]]:
+            return self.get_activities(per_page=per_page, page=page_number, after=after_timestamp)
+        
+        # The first page is fetched on its own (most people fit on one page); after a
+        # full page the next ones are requested ACTIVITY_PAGES_IN_PARALLEL at a time
+        batch_size = 1
+        last_page_reached = False
+        with ThreadPoolExecutor(max_workers=ACTIVITY_PAGES_IN_PARALLEL) as executor:
+            while not last_page_reached:
+                pages = range(page, page + batch_size)
+                print(f"Fetching page {page}..." if batch_size == 1 else f"Fetching pages {pages[0]}-{pages[-1]}...")
+                for activities in executor.map(fetch_page, pages):
+                    if activities:
+                        all_activities.extend(activities)
+                    # An empty or short page is the last one; later pages of the batch are ignored
+                    if not activities or len(activities) < per_page:
+                        last_page_reached = True
+                        break
+                page += batch_size
+                batch_size = ACTIVITY_PAGES_IN_PARALLEL
         
         print(f"Retrieved {len(all_activities)} activities")
         return all_activities
     
-    def get_activities_by_person(self, person_initial: str, days_back: int = 365) -> List[Dict]:
+    def get_activities_by_person(self, person_initial: str, days_back: int = 365,
+                                 activities: Optional[List[Dict]] = None) -> List[Dict]:
         """
         Get activities for a specific person based on their initial.
         Expects activity names in format: "ActivityType x (DeviceName y)" or "ActivityType x [DeviceName y]"
@@ -187,32 +383,23 @@ class StravaAPI:
         Args:
             person_initial: The person's initial to filter by (e.g., 'A', 'JD', 'B')
             days_back: Number of days to look back
+            activities: Activities already fetched with get_all_activities() to filter
+                        instead of fetching them again (days_back is then ignored)
         
         Returns:
             List of activities matching the person's initial
         """
         
         # Get all activities
-        all_activities = self.get_all_activities(days_back=days_back)
-        
-        # Filter activities by person initial
-        person_activities = []
-        # Pattern matches: (Running|Rest|Treppe) <number> (DeviceName <initial>) or [DeviceName <initial>]
-        # Captures the person's initial (y)
-        pattern = re.compile(
-            r'(?:Running|Rest|Treppe)\s+\d+\s+[\(\[](?:Polar|Suunto|Apple|GarminT|GarminU|FitbitU|FitbitT|Xiaomi|Huawei|Wahoo)\s+([A-Za-z]{1,2})[\)\]]',
-            re.IGNORECASE
-        )
+        all_activities = activities if activities is not None else self.get_all_activities(days_back=days_back)
         
-        for activity in all_activities:
-            activity_name = activity.get('name', '')
-            match = pattern.search(activity_name)
-            
-            if match:
-                initial = match.group(1).strip().upper()
-                # Case-insensitive comparison
-                if initial == person_initial.strip().upper():
-                    person_activities.append(activity)
+        # Filter activities by person initial (case-insensitive)
+        target_initial = person_initial.strip().upper()
+        person_activities = [
+            activity for activity in all_activities
+            if (match := _PERSON_NAME_RE.search(activity.get('name', '')))
+            and match.group(1).upper() == target_initial
+        ]
         
         print(f"Found {len(person_activities)} activities for person with initial '{person_initial}'")
         return person_activities
@@ -222,9 +409,9 @@ class StravaAPI:
         """
         Get activity streams for all activities belonging to a specific person.
         
-        This function combines get_activities_by_person() and get_activity_streams():
+        This function combines get_activities_by_person() and get_activities_streams():
         1. Finds all activities for the specified person using their initial
-        2. Iterates through each activity and retrieves its stream data
+        2. Retrieves the stream data of the activities (several requests in parallel)
         
         Args:
             person_initial: The person's initial to filter by (e.g., 'A', 'JD', 'B')
@@ -249,18 +436,22 @@ class StravaAPI:
         
         print(f"\nRetrieving streams for {total_activities} activities...")
         
+        # Fetch the streams of all activities at once (rate limits are honored by make_request)
+        all_streams = self.get_activities_streams(
+            [activity['id'] for activity in person_activities if activity.get('id')],
+            types=stream_types
+        )
+        
         for idx, activity in enumerate(person_activities, 1):
             activity_id = activity.get('id')
             activity_name = activity.get('name', 'Unknown')
             
+            # Only problems are reported per activity; the rest is in the summary below
             if not activity_id:
                 print(f"[{idx}/{total_activities}] Skipping activity with no ID")
                 continue
             
-            print(f"[{idx}/{total_activities}] Fetching streams for activity {activity_id}: {activity_name}")
-            
-            # Get streams for this activity
-            streams = self.get_activity_streams(activity_id, types=stream_types)
+            streams = all_streams.get(activity_id)
             
             if streams:
                 activity_streams[activity_id] = {
@@ -270,12 +461,8 @@ class StravaAPI:
                     'moving_time': activity.get('moving_time'),
                     'streams': streams
                 }
-                print(f"    ✓ Retrieved {len(streams)} stream types")
             else:
-                print(f"    ✗ No streams available")
-            
-            # Rate limiting - be nice to Strava's API
-            time.sleep(0.3)
+                print(f"[{idx}/{total_activities}] ✗ No streams available for activity {activity_id}: {activity_name}")
         
         print(f"\n{'='*60}")
         print(f"Summary: Retrieved streams for {len(activity_streams)}/{total_activities} activities")
@@ -349,11 +536,11 @@ def setup_strava_config() -> StravaConfig:
     print("You'll need to create a Strava app at https://www.strava.com/settings/api")
     print("and get your Client ID, Client Secret, and generate tokens.")
     
-    # Try to get from environment variables first
-    client_id = 168193
-    client_secret = "ENTER-YOUR-CLIENT-SECRET-KEY-HERE"
-    access_token = "ENTER-YOUR-ACCESS-TOKEN-HERE"
-    refresh_token = "ENTER-YOUR-REFRESH-TOKEN-HERE"
+    # Try to get from environment variables first, then fall back to the values below
+    client_id = os.getenv('STRAVA_CLIENT_ID') or 168193
+    client_secret = os.getenv('STRAVA_CLIENT_SECRET') or "ENTER-YOUR-CLIENT-SECRET-KEY-HERE"
+    access_token = os.getenv('STRAVA_ACCESS_TOKEN') or "ENTER-YOUR-ACCESS-TOKEN-HERE"
+    refresh_token = os.getenv('STRAVA_REFRESH_TOKEN') or "ENTER-YOUR-REFRESH-TOKEN-HERE"
     
     if not all([client_id, client_secret, access_token, refresh_token]):
         print("\nPlease provide your Strava API credentials:")
@@ -370,8 +557,24 @@ def setup_strava_config() -> StravaConfig:
     )
 
 
+@lru_cache(maxsize=1)
+def get_default_api() -> StravaAPI:
+    """
+    Return the StravaAPI shared by the examples, creating it on first use.
+
+    Running several examples in one process then reads the configuration,
+    opens the HTTP session and refreshes the access token only once.
+
+    Returns:
+        StravaAPI with the disk response cache enabled
+    """
+    return StravaAPI(setup_strava_config(), cache=True)
+
+
 def main():
     """Main function to demonstrate usage."""
+    # One timestamp for all files written by this run
+    run_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     try:
         # Setup configuration
         config = setup_strava_config()
@@ -400,7 +603,7 @@ def main():
         # You can change 'A' to any person's initial (e.g., 'B', 'JD', etc.)
         person_initial = 'An'
         print(f"\nFetching activities for person with initial '{person_initial}'...")
-        person_activities = api.get_activities_by_person(person_initial, days_back=365)
+        person_activities = api.get_activities_by_person(person_initial, activities=all_activities)
         
         if person_activities:
             print(f"Processing {len(person_activities)} activities for person {person_initial}...")
@@ -408,7 +611,7 @@ def main():
             person_df = person_processor.activities_to_dataframe()
             
             # Save person-specific activities to CSV
-            person_output_file = f"strava_person_{person_initial.lower()}_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            person_output_file = f"strava_person_{person_initial.lower()}_data_{run_timestamp}.csv"
             person_df.to_csv(person_output_file, index=False)
             print(f"Person-specific data saved to: {person_output_file}")
             
@@ -442,26 +645,24 @@ def main():
         else:
             print(f"Retrieved activity details data with {len(activity_details)} details")
 
-        # Initialize data processor with activities list (can re-instantiate for other data types)
+        # One data processor for all conversions; each method gets its source data as argument
         processor = StravaDataProcessor(all_activities)
         
         # Filter for running activities
-        running_activities = processor.filter_running_activities(all_activities)
+        running_activities = processor.filter_running_activities()
         
         if not running_activities:
             print("No running activities found.")
             return
         
-        # Convert to DataFrame via processor (source data provided in constructor or args)
-        running_df = StravaDataProcessor(running_activities).activities_to_dataframe()
+        # Convert to DataFrame
+        running_df = processor.activities_to_dataframe(running_activities)
         
         # Convert activity details to DataFrame if available
-        if activity_details:
-            df_details = StravaDataProcessor(activity_details).activity_details_to_dataframe()
+        df_details = processor.activity_details_to_dataframe(activity_details) if activity_details else pd.DataFrame()
         
         # Convert stream data to DataFrame if available
-        if activity_streams:
-            df_streams = StravaDataProcessor(activity_streams).streams_to_dataframe()
+        df_streams = processor.streams_to_dataframe(activity_streams) if activity_streams else pd.DataFrame()
         
         # Generate summary
         summary = processor.get_activity_summary(running_df)
@@ -478,13 +679,13 @@ def main():
         print(f"Date range: {summary['date_range']['first_activity'].date()} to {summary['date_range']['last_activity'].date()}")
         
         # Save to CSV
-        output_file = f"strava_running_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        output_file = f"strava_running_data_{run_timestamp}.csv"
         running_df.to_csv(output_file, index=False)
         print(f"\nData saved to: {output_file}")
 
         # Save activity details if available
         if not df_details.empty:
-            output_file_details = f"strava_details_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            output_file_details = f"strava_details_data_{run_timestamp}.csv"
             df_details.to_csv(output_file_details, index=False)
             print(f"Activity details saved to: {output_file_details}")
             print(f"Activity details shape: {df_details.shape}")
@@ -495,7 +696,7 @@ def main():
         # Save stream data if available
         if not df_streams.empty:
             print(df_streams)
-            output_streams = f"strava_streams_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            output_streams = f"strava_streams_data_{run_timestamp}.csv"
             df_streams.to_csv(output_streams, index=False)
             print(f"Stream data saved to: {output_streams}")
             print(f"Stream data shape: {df_streams.shape}")
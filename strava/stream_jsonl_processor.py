@@ -3,27 +3,52 @@ Stream JSONL Processor
 Functions for processing Strava activity streams into JSON/JSONL format.
 """
 
-from typing import List, Dict, Optional, Any, Tuple, Callable
+from typing import List, Dict, Optional, Any, Tuple, Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress, repeat
 import json
+import os
 import random
+import re
+import shutil
+import tempfile
 import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSONL reading and writing
+    orjson = None
 
 # Constants
 QUANTILE_LEVELS = [5, 25, 50, 75, 95]
 CADENCE_MULTIPLIER = 2  # Strava cadence is for cycling, running cadence should be doubled
 
+# Activity metadata fields and stream quantile levels averaged by summarize_jsonl_by_group()
+SUMMARY_FIELDS = ['distance_m', 'moving_time_s', 'elapsed_time_s', 'total_elevation_gain_m',
+                  'average_speed_ms', 'max_speed_ms', 'average_heartrate_bpm', 'max_heartrate_bpm']
+SUMMARY_QUANTILE_LEVELS = ['5', '50', '95']
+
+# Activities sent to a worker process at once by combine_activities_to_jsonl(max_workers > 1)
+JSONL_ACTIVITIES_PER_TASK = 16
+
+# Write buffer of save_jsonl_file (bytes); lines are collected up to this size per write call
+JSONL_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Quantile keys of the Strava streams (other streams keep their own name)
+STREAM_QUANTILE_KEYS = {
+    'heartrate': 'hr_bpm',
+    'altitude': 'altitude_m',
+    'distance': 'distance_m',
+    'velocity_smooth': 'velocity_smooth_ms',
+    'cadence': 'cadence_spm',
+    'time': 'time_s'
+}
+
 
 def _stream_key_for_quantiles(stream_type: str) -> str:
     """Convert Strava stream name to the corresponding quantile key."""
-    mapping = {
-        'heartrate': 'hr_bpm',
-        'altitude': 'altitude_m',
-        'distance': 'distance_m',
-        'velocity_smooth': 'velocity_smooth_ms',
-        'cadence': 'cadence_spm',
-        'time': 'time_s'
-    }
-    return mapping.get(stream_type, stream_type)
+    return STREAM_QUANTILE_KEYS.get(stream_type, stream_type)
 
 
 def _is_running_activity(activity_name: Optional[str]) -> bool:
@@ -40,14 +65,51 @@ def _is_rest_activity(activity_name: Optional[str]) -> bool:
     return activity_name.strip().lower().startswith("rest")
 
 
+def _dumps_line(obj: Dict[str, Any]) -> bytes:
+    """Serialize one JSONL object as compact UTF-8 JSON (orjson when installed)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bit; the standard library handles these
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# Parses one JSONL line (str or bytes)
+_loads_line = orjson.loads if orjson is not None else json.loads
+
+
+def _activity_group(activity_name: Optional[str]) -> str:
+    """Return the protocol group of an activity (running pace subtype, Treppe, Rest or Other)."""
+    name = (activity_name or '').strip().lower()
+    if _is_running_activity(name):
+        # Odd numbered runs are the lower paced, even numbered the higher paced ones
+        match = re.match(r'running\D*(\d+)', name)
+        if match is None:
+            return 'Running'
+        return 'Running (higher pace)' if int(match.group(1)) % 2 == 0 else 'Running (lower pace)'
+    if _is_rest_activity(name):
+        return 'Rest'
+    if 'treppe' in name:
+        return 'Treppe'
+    return 'Other'
+
+
 def _is_numeric_value(value: Any) -> bool:
     """Check if a value is numeric (int or float) and not None/empty."""
     return value is not None and value != "" and isinstance(value, (int, float))
 
 
-def _extract_numeric_values(data: List[Any]) -> List[float]:
-    """Extract numeric values from a list, filtering out None/empty values."""
-    return [float(value) for value in data if _is_numeric_value(value)]
+def _extract_numeric_values(data: List[Any]) -> np.ndarray:
+    """Extract numeric values from a list as a float array, filtering out None/empty values."""
+    try:
+        # Streams without gaps (the usual case) convert in one step
+        values = np.asarray(data)
+        if values.ndim == 1 and values.dtype.kind in 'biuf':
+            return values.astype(np.float64)
+    except (ValueError, TypeError):
+        pass  # e.g. ragged lists
+    return np.array([float(value) for value in data if _is_numeric_value(value)], dtype=np.float64)
 
 
 def _convert_streams_to_dict(streams_data: List[Dict]) -> Dict[str, List[Any]]:
@@ -71,15 +133,12 @@ def _filter_by_moving(streams_dict: Dict[str, List[Any]]) -> Dict[str, List[Any]
     if not any(value not in (None, "") for value in moving_data):
         return streams_dict
     
-    valid_indices = [idx for idx, value in enumerate(moving_data) if bool(value)]
-    if not valid_indices:
+    if not any(moving_data):
         return {}
     
-    def filter_data(data: List[Any]) -> List[Any]:
-        return [data[i] for i in valid_indices if i < len(data)]
-    
+    # Keep the samples whose moving flag is truthy (streams longer than moving are cut to its length)
     filtered_streams = {
-        stream_type: filter_data(data)
+        stream_type: list(compress(data, moving_data))
         for stream_type, data in streams_dict.items()
     }
     return filtered_streams
@@ -88,6 +147,14 @@ def _filter_by_moving(streams_dict: Dict[str, List[Any]]) -> Dict[str, List[Any]
 def _double_cadence_values(streams_dict: Dict[str, List[Any]]) -> None:
     """Double cadence values (Strava cadence is for cycling, running cadence should be doubled)."""
     if 'cadence' in streams_dict and isinstance(streams_dict['cadence'], list):
+        try:
+            # Streams without gaps (the usual case) are doubled in one step, keeping ints as ints
+            values = np.asarray(streams_dict['cadence'])
+            if values.ndim == 1 and values.dtype.kind in 'biuf':
+                streams_dict['cadence'] = (values * CADENCE_MULTIPLIER).tolist()
+                return
+        except (ValueError, TypeError):
+            pass  # e.g. ragged lists
         streams_dict['cadence'] = [
             value * CADENCE_MULTIPLIER if _is_numeric_value(value) else value
             for value in streams_dict['cadence']
@@ -104,18 +171,18 @@ def _calculate_quantiles(streams_dict: Dict[str, List[Any]],
             continue
         
         numeric_values = _extract_numeric_values(data)
-        if not numeric_values:
+        if numeric_values.size == 0:
             continue
         
-        percentile_values = np.percentile(numeric_values, QUANTILE_LEVELS)
         key_name = _stream_key_for_quantiles(stream_type)
         
         # Skip velocity_smooth quantiles if we are not including velocity data
         if key_name == 'velocity_smooth_ms' and not include_velocity:
             continue
         
+        percentile_values = np.percentile(numeric_values, QUANTILE_LEVELS).round(6).tolist()
         quantiles_result[key_name] = {
-            str(level): float(np.round(percentile_values[idx], 6))
+            str(level): percentile_values[idx]
             for idx, level in enumerate(QUANTILE_LEVELS)
         }
     
@@ -125,31 +192,25 @@ def _calculate_quantiles(streams_dict: Dict[str, List[Any]],
 def _calculate_pace_quantiles(time_data: List[float], 
                                distance_data: List[Any]) -> Optional[Dict[str, float]]:
     """Calculate pace quantiles from time and distance data."""
-    raw_pace_values: List[float] = []
+    n = min(len(time_data), len(distance_data))
+    if n < 2:
+        return None
     
-    for i in range(1, len(time_data)):
-        dt = time_data[i] - time_data[i-1]
-        if dt <= 0:
-            continue
-        
-        if (i >= len(distance_data) or 
-            distance_data[i] is None or 
-            distance_data[i-1] is None):
-            continue
-        
-        dd = distance_data[i] - distance_data[i-1]
-        if dd <= 0:
-            continue
-        
-        pace = (dt / dd) * 1000  # seconds per km
-        raw_pace_values.append(pace)
+    time_arr = np.asarray(time_data[:n], dtype=np.float64)
+    distance_arr = np.array([np.nan if d is None else d for d in distance_data[:n]], dtype=np.float64)
+    dt = np.diff(time_arr)
+    dd = np.diff(distance_arr)
     
-    if not raw_pace_values:
+    # Skip pauses, missing distances (NaN) and non-increasing distance
+    valid = (dt > 0) & (dd > 0)
+    raw_pace_values = (dt[valid] / dd[valid]) * 1000  # seconds per km
+    
+    if raw_pace_values.size == 0:
         return None
     
-    percentile_values = np.percentile(raw_pace_values, QUANTILE_LEVELS)
+    percentile_values = np.percentile(raw_pace_values, QUANTILE_LEVELS).round(6).tolist()
     return {
-        str(level): float(np.round(percentile_values[idx], 6))
+        str(level): percentile_values[idx]
         for idx, level in enumerate(QUANTILE_LEVELS)
     }
 
@@ -167,79 +228,71 @@ def _find_sampling_indices(time_data: List[float],
         target_times.append(current_time)
         current_time += interval_seconds
     
-    # Find closest index for each target time
-    sampled_indices = []
-    for target_time in target_times:
-        closest_idx = min(
-            range(len(time_data)),
-            key=lambda i: abs(time_data[i] - target_time)
-        )
-        sampled_indices.append(closest_idx)
-    
+    # Find closest index for each target time (the earliest one on ties).
+    # Time streams are non-decreasing, so a binary search finds it; otherwise
+    # fall back to scanning the whole stream for each target.
+    times = np.asarray(time_data, dtype=np.float64)
+    targets = np.asarray(target_times, dtype=np.float64)
+    if len(times) == 1:
+        return [0]
+    if np.all(times[1:] >= times[:-1]):
+        right = np.clip(np.searchsorted(times, targets), 1, len(times) - 1)
+        left = right - 1
+        closest = np.where(np.abs(times[left] - targets) <= np.abs(times[right] - targets), left, right)
+        # Repeated timestamps: use the first sample with the chosen time
+        sampled_indices = np.searchsorted(times, times[closest])
+        # Indices are non-decreasing here, so duplicates are adjacent
+        keep = np.concatenate(([True], sampled_indices[1:] != sampled_indices[:-1]))
+        return sampled_indices[keep].tolist()
+    
+    sampled_indices = [int(np.argmin(np.abs(times - target))) for target in targets]
     # Remove duplicates while preserving order
-    seen = set()
-    unique_indices = []
-    for idx in sampled_indices:
-        if idx not in seen:
-            seen.add(idx)
-            unique_indices.append(idx)
-    
-    return unique_indices
+    return list(dict.fromkeys(sampled_indices))
 
 
 def _calculate_pace_values(sampled_time: List[float], 
                           sampled_distance: List[Optional[float]]) -> List[str]:
     """Calculate pace (seconds per km) for each sampled interval."""
-    pace_values = []
-    
-    for i in range(len(sampled_time)):
-        if i == 0:
-            # First point: calculate from current to next point
-            if (len(sampled_time) > 1 and 
-                sampled_distance[0] is not None and 
-                sampled_distance[1] is not None):
-                dt = sampled_time[1] - sampled_time[0]
-                dd = sampled_distance[1] - sampled_distance[0]
-                if dd > 0 and dt > 0:
-                    pace = (dt / dd) * 1000
-                    pace_values.append(str(int(round(pace))))
-                else:
-                    pace_values.append("")
-            else:
-                pace_values.append("")
-        else:
-            # Calculate pace from previous point to current point
-            dt = sampled_time[i] - sampled_time[i-1]
-            if (sampled_distance[i] is not None and 
-                sampled_distance[i-1] is not None):
-                dd = sampled_distance[i] - sampled_distance[i-1]
-                if dd > 0 and dt > 0:
-                    pace = (dt / dd) * 1000
-                    pace_values.append(str(int(round(pace))))
-                else:
-                    pace_values.append("")
-            else:
-                pace_values.append("")
-    
+    n = len(sampled_time)
+    if n < 2:
+        return [""] * n
+    
+    time_arr = np.asarray(sampled_time, dtype=np.float64)
+    distance_arr = np.array([np.nan if d is None else d for d in sampled_distance], dtype=np.float64)
+    
+    # Pace from the previous point to each point; the first point uses the
+    # interval to the next point instead
+    segment = np.concatenate(([0], np.arange(n - 1)))
+    dt = np.diff(time_arr)[segment]
+    dd = np.diff(distance_arr)[segment]
+    valid = (dd > 0) & (dt > 0)  # also skips missing distances (NaN)
+    pace = np.rint((dt[valid] / dd[valid]) * 1000)
+    
+    pace_values = [""] * n
+    for idx, value in zip(np.flatnonzero(valid).tolist(), pace.tolist()):
+        pace_values[idx] = str(int(value))
     return pace_values
 
 
 def _sample_stream_data(data: List[Any], indices: List[int]) -> List[Any]:
-    """Sample data at specified indices."""
-    return [
-        data[i] if i < len(data) and data[i] is not None else None
-        for i in indices
-    ]
+    """Sample data at specified indices (None past the end of data)."""
+    n = len(data)
+    return [data[i] if i < n else None for i in indices]
 
 
-def _format_sampled_values(values: List[Any], 
-                          format_func: Optional[Callable[[Any], str]] = None) -> str:
-    """Format sampled values as CSV string."""
-    if format_func is None:
-        format_func = lambda v: str(int(round(v))) if v is not None else ""
-    
-    formatted = [format_func(v) if v is not None else "" for v in values]
-    return ",".join(formatted)
+def _format_rounded(value: Any) -> str:
+    """Format a sampled value rounded to an integer."""
+    return str(int(round(value)))
+
+
+def _sample_and_format(data: List[Any], indices: List[int],
+                       format_func: Callable[[Any], str] = _format_rounded) -> str:
+    """Sample data at specified indices and format the samples as CSV string (missing values stay empty)."""
+    n = len(data)
+    return ",".join([
+        format_func(data[i]) if i < n and data[i] is not None else ""
+        for i in indices
+    ])
 
 
 def _sample_streams_common(streams_data: List[Dict],
@@ -272,9 +325,9 @@ def _sample_streams_common(streams_data: List[Dict],
     
     time_data = streams_dict['time']
     
-    # Rebase time to start at zero
-    time_offset = time_data[0] if time_data else 0
-    time_data = [float(t) - float(time_offset) for t in time_data]
+    # Rebase time to start at zero (the other helpers work on the list)
+    time_arr = np.asarray(time_data, dtype=np.float64)
+    time_data = (time_arr - time_arr[0]).tolist()
     streams_dict['time'] = time_data
     
     # Calculate quantiles
@@ -314,29 +367,23 @@ def _sample_streams_common(streams_data: List[Dict],
     
     # Add heart rate
     if 'heartrate' in streams_dict:
-        sampled_hr = _sample_stream_data(streams_dict['heartrate'], unique_indices)
-        result["hr_bpm_csv"] = _format_sampled_values(sampled_hr)
+        result["hr_bpm_csv"] = _sample_and_format(streams_dict['heartrate'], unique_indices)
     
     # Add altitude
     if 'altitude' in streams_dict:
-        sampled_alt = _sample_stream_data(streams_dict['altitude'], unique_indices)
-        result["alt_m_csv"] = _format_sampled_values(sampled_alt)
+        result["alt_m_csv"] = _sample_and_format(streams_dict['altitude'], unique_indices)
     
     # Add velocity_smooth
     if include_velocity and 'velocity_smooth' in streams_dict:
-        sampled_velocity = _sample_stream_data(
+        result["velocity_smooth_ms_csv"] = _sample_and_format(
             streams_dict['velocity_smooth'], 
-            unique_indices
-        )
-        result["velocity_smooth_ms_csv"] = _format_sampled_values(
-            sampled_velocity, 
-            format_func=lambda v: f"{float(v):.2f}" if v is not None else ""
+            unique_indices,
+            format_func=lambda v: f"{float(v):.2f}"
         )
     
     # Add cadence
     if 'cadence' in streams_dict:
-        sampled_cadence = _sample_stream_data(streams_dict['cadence'], unique_indices)
-        result["cadence_spm_csv"] = _format_sampled_values(sampled_cadence)
+        result["cadence_spm_csv"] = _sample_and_format(streams_dict['cadence'], unique_indices)
     
     return result, quantiles_result
 
@@ -513,19 +560,27 @@ def create_activity_jsonl_object(activity_data: Dict,
     return jsonl_obj
 
 
-def save_jsonl_file(jsonl_objects: List[Dict[str, Any]],
-                   filepath: str) -> None:
+def save_jsonl_file(jsonl_objects: Iterable[Dict[str, Any]],
+                   filepath: str) -> int:
     """
-    Save a list of JSON objects to a JSONL file (one JSON object per line).
+    Save JSON objects to a JSONL file (one JSON object per line).
+
+    Objects are written as they are produced, so passing a generator such as
+    iter_activities_jsonl() never holds the whole dataset in memory.
 
     Args:
-        jsonl_objects: List of dictionaries to save
+        jsonl_objects: List (or any iterable) of dictionaries to save
         filepath: Path to output JSONL file
+
+    Returns:
+        Number of objects written
     """
-    with open(filepath, 'w', encoding='utf-8') as f:
+    count = 0
+    with open(filepath, 'wb', buffering=JSONL_WRITE_BUFFER_SIZE) as f:
         for obj in jsonl_objects:
-            json_line = json.dumps(obj, ensure_ascii=False)
-            f.write(json_line + '\n')
+            f.write(_dumps_line(obj) + b'\n')
+            count += 1
+    return count
 
 
 def load_jsonl_file(filepath: str) -> List[Dict[str, Any]]:
@@ -539,43 +594,176 @@ def load_jsonl_file(filepath: str) -> List[Dict[str, Any]]:
         List of dictionaries
     """
     jsonl_objects = []
-    with open(filepath, 'r', encoding='utf-8') as f:
+    with open(filepath, 'rb') as f:
         for line in f:
             line = line.strip()
             if line:
-                jsonl_objects.append(json.loads(line))
+                jsonl_objects.append(_loads_line(line))
     return jsonl_objects
 
 
-def combine_activities_to_jsonl(activities: List[Dict],
-                                streams_dict: Optional[Dict[int, List[Dict]]] = None,
-                                interval_seconds: float = 5.0) -> List[Dict[str, Any]]:
+def sample_jsonl_lines(filepath: str, sample_size: int,
+                       seed: Optional[int] = None) -> Tuple[int, List[str]]:
     """
-    Combine multiple activities into a list of JSONL objects.
+    Count the lines of a JSONL file and draw a uniform random sample of them in one pass.
+
+    Uses reservoir sampling (Algorithm R), so memory stays at sample_size lines
+    however large the file is. The sampled lines keep their order in the file.
 
     Args:
-        activities: List of activity dictionaries
-        streams_dict: Optional dictionary mapping activity_id to streams data
-        interval_seconds: Sampling interval for streams (default: 5.0)
+        filepath: Path to JSONL file
+        sample_size: Maximum number of lines to keep
+        seed: Optional random seed for a reproducible sample
 
     Returns:
-        List of JSONL objects ready to be saved
+        Tuple of (total number of non-empty lines, sampled lines)
     """
-    jsonl_objects = []
+    rng = random.Random(seed)
+    reservoir: List[Tuple[int, str]] = []
+    total = 0
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if total < sample_size:
+                reservoir.append((total, line))
+            else:
+                j = rng.randint(0, total)
+                if j < sample_size:
+                    reservoir[j] = (total, line)
+            total += 1
+    reservoir.sort()
+    return total, [line for _, line in reservoir]
+
+
+def summarize_jsonl_by_group(filepath: str) -> pd.DataFrame:
+    """
+    Aggregate a JSONL file into one row per activity group, parsing each line once.
+
+    Each row holds the number of activities, the mean of the SUMMARY_FIELDS
+    metadata and the mean of the SUMMARY_QUANTILE_LEVELS stream quantiles
+    (e.g. hr_bpm_p50) of the activities in the group.
+
+    Args:
+        filepath: Path to JSONL file
+
+    Returns:
+        DataFrame with an 'activity_group' column and one row per group (empty if the file has no activities)
+    """
+    rows = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = _loads_line(line)
+            row = {'activity_group': _activity_group(obj.get('name'))}
+            for field in SUMMARY_FIELDS:
+                row[field] = obj.get(field)
+            for stream_key, levels in (obj.get('quantiles') or {}).items():
+                for level in SUMMARY_QUANTILE_LEVELS:
+                    if level in levels:
+                        row[f"{stream_key}_p{level}"] = levels[level]
+            rows.append(row)
+
+    if not rows:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(rows)
+    grouped = df.groupby('activity_group', sort=True)
+    summary = grouped.mean(numeric_only=True).round(2).dropna(axis=1, how='all')
+    summary.insert(0, 'activities', grouped.size())
+    return summary.reset_index()
+
+
+def iter_activities_jsonl(activities: Iterable[Dict],
+                          streams_dict: Optional[Dict[int, List[Dict]]] = None,
+                          interval_seconds: float = 5.0) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the JSONL object of each activity, one at a time.
+
+    Args:
+        activities: Activity dictionaries
+        streams_dict: Optional dictionary mapping activity_id to streams data
+        interval_seconds: Sampling interval for streams (default: 5.0)
 
+    Yields:
+        JSONL objects ready to be saved
+    """
     for activity in activities:
         activity_id = activity.get('id')
         streams_data = streams_dict.get(activity_id) if streams_dict else None
 
-        jsonl_obj = create_activity_jsonl_object(
+        yield create_activity_jsonl_object(
             activity_data=activity,
             streams_data=streams_data,
             interval_seconds=interval_seconds
         )
 
-        jsonl_objects.append(jsonl_obj)
 
-    return jsonl_objects
+def combine_activities_to_jsonl(activities: List[Dict],
+                                streams_dict: Optional[Dict[int, List[Dict]]] = None,
+                                interval_seconds: float = 5.0,
+                                max_workers: int = 1) -> List[Dict[str, Any]]:
+    """
+    Combine multiple activities into a list of JSONL objects.
+
+    With max_workers > 1 the activities are converted in that many worker
+    processes (call it under an ``if __name__ == "__main__":`` guard then).
+
+    Args:
+        activities: List of activity dictionaries
+        streams_dict: Optional dictionary mapping activity_id to streams data
+        interval_seconds: Sampling interval for streams (default: 5.0)
+        max_workers: Number of processes converting activities (default: 1, no extra processes)
+
+    Returns:
+        List of JSONL objects ready to be saved, in the order of activities
+    """
+    if max_workers <= 1 or len(activities) < 2 * JSONL_ACTIVITIES_PER_TASK:
+        return list(iter_activities_jsonl(activities, streams_dict, interval_seconds))
+
+    # Each task gets only its activities' own streams, not the whole streams_dict
+    activity_streams = [
+        streams_dict.get(activity.get('id')) if streams_dict else None
+        for activity in activities
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(create_activity_jsonl_object, activities, activity_streams,
+                                 repeat(interval_seconds), chunksize=JSONL_ACTIVITIES_PER_TASK))
+
+
+def _set_abnormal_heartrate(obj: Dict[str, Any], rng: np.random.Generator,
+                            min_hr: int, hr_strings: np.ndarray) -> Dict[str, Any]:
+    """
+    Replace the heart rate samples of one JSONL object with random values.
+    
+    hr_strings holds the formatted values min_hr, min_hr + 1, ..., max_hr, so
+    the samples are drawn as indices into it and not converted one by one.
+    """
+    hr_csv = obj.get('streams_compact', {}).get('hr_bpm_csv')
+    if not hr_csv:
+        return obj
+    
+    # Replace each value with a random value in the abnormal range
+    sample_count = sum(1 for val in hr_csv.split(',') if val.strip())
+    if not sample_count:
+        obj['streams_compact']['hr_bpm_csv'] = ''
+        return obj
+    offsets = rng.integers(len(hr_strings), size=sample_count)
+    obj['streams_compact']['hr_bpm_csv'] = ','.join(hr_strings[offsets])
+    new_hr = offsets + min_hr
+    
+    # Recalculate quantiles, average and max from the new values
+    percentile_values = np.percentile(new_hr, QUANTILE_LEVELS).round(6).tolist()
+    obj.setdefault('quantiles', {})['hr_bpm'] = {
+        str(level): percentile_values[idx]
+        for idx, level in enumerate(QUANTILE_LEVELS)
+    }
+    if 'average_heartrate_bpm' in obj:
+        obj['average_heartrate_bpm'] = int(np.mean(new_hr))
+    if 'max_heartrate_bpm' in obj:
+        obj['max_heartrate_bpm'] = int(new_hr.max())
+    return obj
 
 
 def modify_heartrate_to_abnormal(jsonl_filepath: str, output_filepath: str,
@@ -604,58 +792,32 @@ def modify_heartrate_to_abnormal(jsonl_filepath: str, output_filepath: str,
     if min_hr >= max_hr:
         raise ValueError(f"min_hr ({min_hr}) must be less than max_hr ({max_hr})")
     
-    modified_objects = []
-    
+    rng = np.random.default_rng()
+    hr_strings = np.array([str(hr) for hr in range(min_hr, max_hr + 1)], dtype=object)
     try:
-        with open(jsonl_filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                obj = json.loads(line)
-                modified_obj = obj.copy()
-                
-                # Modify streams_compact.hr_bpm_csv if present
-                if 'streams_compact' in modified_obj and 'hr_bpm_csv' in modified_obj['streams_compact']:
-                    hr_csv = modified_obj['streams_compact']['hr_bpm_csv']
-                    
-                    # Parse CSV string, replace each value with random abnormal value
-                    if hr_csv:
-                        hr_values = [val.strip() for val in hr_csv.split(',') if val.strip()]
-                        # Replace each value with a random value in the abnormal range
-                        new_hr_values = [str(random.randint(min_hr, max_hr)) for _ in hr_values]
-                        modified_obj['streams_compact']['hr_bpm_csv'] = ','.join(new_hr_values)
-                        
-                        # Recalculate quantiles from new values
-                        numeric_hr = [int(val) for val in new_hr_values]
-                        if numeric_hr:
-                            percentile_values = np.percentile(numeric_hr, QUANTILE_LEVELS)
-                            
-                            # Update or create quantiles.hr_bpm
-                            if 'quantiles' not in modified_obj:
-                                modified_obj['quantiles'] = {}
-                            
-                            modified_obj['quantiles']['hr_bpm'] = {
-                                str(level): float(np.round(percentile_values[idx], 6))
-                                for idx, level in enumerate(QUANTILE_LEVELS)
-                            }
-                            
-                            # Update average_heartrate_bpm and max_heartrate_bpm
-                            avg_hr = int(np.mean(numeric_hr))
-                            max_hr_value = max(numeric_hr)
-                            
-                            if 'average_heartrate_bpm' in modified_obj:
-                                modified_obj['average_heartrate_bpm'] = avg_hr
-                            if 'max_heartrate_bpm' in modified_obj:
-                                modified_obj['max_heartrate_bpm'] = max_hr_value
-                
-                modified_objects.append(modified_obj)
+        f = open(jsonl_filepath, 'rb')
     except FileNotFoundError:
         raise FileNotFoundError(f"Input file not found: {jsonl_filepath}")
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Invalid JSON in file {jsonl_filepath}: {e}")
     
-    # Save modified objects to new file
-    save_jsonl_file(modified_objects, output_filepath)
-    print(f"Modified {len(modified_objects)} activities. Saved to: {output_filepath}")
+    # Activities are rewritten as they are read, so the file is never held in memory.
+    # They go to a temporary file that replaces output_filepath only once all are
+    # written, so an in-place rewrite works and invalid input leaves no partial output.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_filepath)), suffix='.tmp')
+    os.close(fd)
+    try:
+        with f:
+            modified_objects = (
+                _set_abnormal_heartrate(_loads_line(line), rng, min_hr, hr_strings)
+                for line in f if line.strip()
+            )
+            count = save_jsonl_file(modified_objects, tmp_path)
+        # Keep the permissions of the replaced file (or of the input), not mkstemp's 0600
+        shutil.copymode(output_filepath if os.path.exists(output_filepath) else jsonl_filepath, tmp_path)
+        os.replace(tmp_path, output_filepath)
+    except BaseException as e:
+        os.remove(tmp_path)
+        if isinstance(e, json.JSONDecodeError):
+            raise ValueError(f"Invalid JSON in file {jsonl_filepath}: {e}")
+        raise
+    
+    print(f"Modified {count} activities. Saved to: {output_filepath}")